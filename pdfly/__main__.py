@@ -1,6 +1,20 @@
 """Execute pdfly as a module."""
 
-from pdfly.cli import entry_point
+import sys
+
+from pdfly.daemon import forward
+
+
+def main() -> None:
+    """Run pdfly, in a daemon worker if one is available."""
+    exit_code = forward(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    from pdfly.cli import entry_point
 
-if __name__ == "__main__":
     entry_point()
+
+
+if __name__ == "__main__":
+    main()
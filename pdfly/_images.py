@@ -0,0 +1,328 @@
+"""
+Recompress & downsample the images of a document with Pillow.
+
+Images drawn at a higher resolution than needed are downsampled: the
+effective resolution of an image is computed from the size at which it is
+drawn by the content streams of the pages, following their transformation
+matrices and the form XObjects drawing it. JPEG images can be encoded again
+at a lower quality. Images deflated without loss are converted to JPEG only
+on request, and only if they look like photos: line art, screenshots and
+scanned text, with few colours or a skewed histogram, are kept lossless.
+The new encoding of an image is kept only if it is smaller.
+
+Only images with 8 bits per component, in gray or RGB, are handled.
+"""
+
+import math
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from io import BytesIO
+from typing import Any, NamedTuple
+
+from PIL import Image
+from pypdf import PageObject, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    ContentStream,
+    DictionaryObject,
+    EncodedStreamObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+)
+
+# Quality of the JPEG images downsampled without a quality given
+DEFAULT_JPEG_QUALITY = 75
+
+Matrix = tuple[float, float, float, float, float, float]
+_IDENTITY: Matrix = (1, 0, 0, 1, 0, 0)
+# Form XObjects drawing other form XObjects, beyond which they are ignored
+_MAX_FORM_DEPTH = 16
+_MODES = {"/DeviceGray": "L", "/DeviceRGB": "RGB"}
+# Images in RGB with at most this many colours are drawings or screenshots
+_MAX_DRAWING_COLORS = 4096
+# Entropy, in bits, of the luminance histogram of photos at least:
+# drawings & scanned text are mostly made of their background colour
+_MIN_PHOTO_ENTROPY = 6.0
+
+
+class ImageOptions(NamedTuple):
+    quality: int | None = None  # JPEG quality of the images encoded again
+    max_resolution: float | None = None  # in pixels per inch
+    photos_to_jpeg: bool = False  # convert the lossless photos to JPEG
+
+
+def optimize_images(
+    writer: PdfWriter,
+    options: ImageOptions,
+    run: Callable[..., Iterable[Any]] = map,
+) -> int:
+    """
+    Recompress & downsample the images of a writer, and return the number
+    of images replaced. The work is done by run, a map() function.
+    """
+    resolutions = (
+        image_resolutions(writer.pages)
+        if options.max_resolution is not None
+        else {}
+    )
+    images = [
+        (number, stream)
+        for number, stream in enumerate(writer._objects, 1)
+        if isinstance(stream, StreamObject)
+        and stream.get("/Subtype") == "/Image"
+    ]
+    # The soft masks of images are downsampled like them, but never
+    # converted to JPEG
+    masks = {}
+    for number, image in images:
+        mask = image.raw_get("/SMask") if "/SMask" in image else None
+        if isinstance(mask, IndirectObject):
+            masks[mask.idnum] = resolutions.get(number, 0) * _width_ratio(
+                mask.get_object(), image
+            )
+    tasks = [
+        (image, max(resolutions.get(number, 0), masks.get(number, 0)))
+        for number, image in images
+    ]
+    results = run(
+        partial(_optimize_image, options=options),
+        [image for image, _resolution in tasks],
+        [resolution for _image, resolution in tasks],
+        [number in masks for number, _image in images],
+    )
+    replaced = 0
+    for (number, _image), optimized in zip(images, results, strict=True):
+        if optimized is not None:
+            writer._replace_object(number, optimized)
+            replaced += 1
+    return replaced
+
+
+def image_resolutions(pages: Iterable[PageObject]) -> dict[int, float]:
+    """
+    Return the highest effective resolution, in pixels per inch, at which
+    each image is drawn by the pages, by object number.
+
+    Images drawn with a different resolution along their width & height
+    get the lowest of the two, so that downsampling does not go below
+    the resolution needed in either direction.
+    """
+    resolutions: dict[int, float] = {}
+    for page in pages:
+        contents = page.get_contents()
+        if contents is None:
+            continue
+        resources = _resolve(page.get("/Resources"))
+        for number, image, matrix in _iter_drawn_images(
+            contents, resources, _IDENTITY, 0
+        ):
+            # The image is the unit square, transformed by the matrix
+            a, b, c, d, _e, _f = matrix
+            width, height = math.hypot(a, b), math.hypot(c, d)
+            if width == 0 or height == 0:
+                continue
+            resolution = min(
+                image.get("/Width", 0) * 72 / width,
+                image.get("/Height", 0) * 72 / height,
+            )
+            resolutions[number] = max(resolutions.get(number, 0), resolution)
+    return resolutions
+
+
+def _iter_drawn_images(
+    contents: ContentStream,
+    resources: PdfObject | None,
+    matrix: Matrix,
+    depth: int,
+) -> Iterator[tuple[int, StreamObject, Matrix]]:
+    """
+    Yield the object number, the stream & the transformation matrix
+    of each image drawn by a content stream.
+    """
+    stack: list[Matrix] = []
+    xobjects = (
+        _resolve(resources.get("/XObject"))
+        if isinstance(resources, DictionaryObject)
+        else None
+    )
+    for operands, operator in contents.operations:
+        if operator == b"q":
+            stack.append(matrix)
+        elif operator == b"Q" and stack:
+            matrix = stack.pop()
+        elif operator == b"cm" and len(operands) == 6:
+            matrix = _multiply(tuple(map(float, operands)), matrix)
+        elif (
+            operator == b"Do"
+            and operands
+            and isinstance(xobjects, DictionaryObject)
+            and operands[0] in xobjects
+        ):
+            reference = xobjects.raw_get(operands[0])
+            xobject = reference.get_object()
+            if not isinstance(reference, IndirectObject) or not isinstance(
+                xobject, StreamObject
+            ):
+                continue
+            if xobject.get("/Subtype") == "/Image":
+                yield reference.idnum, xobject, matrix
+            elif (
+                xobject.get("/Subtype") == "/Form" and depth < _MAX_FORM_DEPTH
+            ):
+                form_matrix = _resolve(xobject.get("/Matrix"))
+                form_resources = _resolve(xobject.get("/Resources"))
+                yield from _iter_drawn_images(
+                    ContentStream(xobject, reference.pdf),
+                    resources if form_resources is None else form_resources,
+                    _multiply(
+                        (
+                            tuple(map(float, form_matrix))
+                            if isinstance(form_matrix, ArrayObject)
+                            else _IDENTITY
+                        ),
+                        matrix,
+                    ),
+                    depth + 1,
+                )
+
+
+def _resolve(obj: PdfObject | None) -> PdfObject | None:
+    """Return the object an indirect reference points to, or the object."""
+    return obj.get_object() if obj is not None else None
+
+
+def _multiply(m: tuple[float, ...], n: Matrix) -> Matrix:
+    """Return the product of two transformation matrices, m times n."""
+    return (
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    )
+
+
+def _width_ratio(mask: PdfObject | None, image: StreamObject) -> float:
+    if not isinstance(mask, StreamObject) or not image.get("/Width"):
+        return 0
+    return mask.get("/Width", 0) / image["/Width"]
+
+
+def _optimize_image(
+    stream: StreamObject,
+    resolution: float,
+    mask: bool,
+    options: ImageOptions,
+) -> EncodedStreamObject | None:
+    """
+    Return an image downsampled to the maximum resolution, and encoded
+    again as JPEG if it is a JPEG image or a photo to convert, or None if
+    that is not smaller. Soft masks are never encoded as JPEG.
+    """
+    scale = 1.0
+    if options.max_resolution is not None and resolution > 0:
+        scale = min(scale, options.max_resolution / resolution)
+    jpeg = stream.get("/Filter") in ("/DCTDecode", ["/DCTDecode"])
+    reencode = jpeg and not mask and options.quality is not None
+    convert = not jpeg and not mask and options.photos_to_jpeg
+    if scale == 1 and not reencode and not convert:
+        return None
+    try:
+        image = _decode(stream, jpeg)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        image = None  # not an image that Pillow can read
+    if image is None:
+        return None
+    convert = convert and _is_photo(image)
+    if scale == 1 and not reencode and not convert:
+        return None
+    if scale < 1:
+        image = image.resize(
+            (
+                max(1, round(image.width * scale)),
+                max(1, round(image.height * scale)),
+            ),
+            Image.Resampling.LANCZOS,
+        )
+    candidates = []
+    if not jpeg and scale < 1:
+        candidates.append(
+            (zlib.compress(image.tobytes(), 9), NameObject("/FlateDecode"))
+        )
+    if (jpeg and not mask) or convert:
+        buffer = BytesIO()
+        image.save(
+            buffer,
+            "JPEG",
+            quality=options.quality or DEFAULT_JPEG_QUALITY,
+            optimize=True,
+        )
+        candidates.append((buffer.getvalue(), NameObject("/DCTDecode")))
+    if not candidates:
+        return None
+    data, image_filter = min(candidates, key=lambda item: len(item[0]))
+    if len(data) >= len(stream._data):
+        return None
+    optimized = EncodedStreamObject()
+    optimized.update(stream)
+    optimized.pop("/DecodeParms", None)
+    optimized[NameObject("/Filter")] = image_filter
+    optimized[NameObject("/Width")] = NumberObject(image.width)
+    optimized[NameObject("/Height")] = NumberObject(image.height)
+    optimized._data = data
+    return optimized
+
+
+def _is_photo(image: Image.Image) -> bool:
+    """
+    Return whether an image looks like a photo, with many colours spread
+    over its histogram, rather than line art, a screenshot or scanned text,
+    which JPEG would blur.
+    """
+    if image.mode == "RGB" and image.getcolors(_MAX_DRAWING_COLORS):
+        return False
+    return image.convert("L").entropy() >= _MIN_PHOTO_ENTROPY
+
+
+def _decode(stream: StreamObject, jpeg: bool) -> Image.Image | None:
+    """Return the Pillow image of an image stream, or None."""
+    if (
+        stream.get("/BitsPerComponent") != 8
+        or stream.get("/ImageMask")
+        or "/Mask" in stream
+        or "/Decode" in stream
+    ):
+        return None
+    mode = _mode(stream.get("/ColorSpace"))
+    width, height = stream.get("/Width"), stream.get("/Height")
+    if (
+        mode is None
+        or not isinstance(width, int)
+        or not isinstance(height, int)
+    ):
+        return None
+    if jpeg:
+        image = Image.open(BytesIO(stream._data))
+        image.load()
+        return image if image.mode == mode else None
+    if stream.get("/Filter") not in (None, "/FlateDecode", ["/FlateDecode"]):
+        return None
+    data = stream.get_data()
+    if len(data) != width * height * len(mode):
+        return None
+    return Image.frombytes(mode, (width, height), data)
+
+
+def _mode(color_space: PdfObject | None) -> str | None:
+    """Return the Pillow mode of a gray or RGB colour space, or None."""
+    if isinstance(color_space, ArrayObject) and color_space:
+        if color_space[0] != "/ICCBased" or len(color_space) < 2:
+            return None
+        components = color_space[1].get_object().get("/N")
+        return {1: "L", 3: "RGB"}.get(components)
+    return _MODES.get(str(color_space))
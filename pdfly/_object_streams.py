@@ -0,0 +1,173 @@
+"""
+Write the objects of a pypdf.PdfWriter packed into object streams.
+
+pypdf writes every object on its own, followed by a cross-reference table
+in text. Since PDF 1.5, objects other than streams can be stored together
+in compressed object streams, the file ending with a cross-reference
+stream, in binary, locating both the objects written on their own and the
+objects in object streams. Documents with many small objects, like the
+structure of tagged PDFs or form fields, are much smaller this way.
+
+pypdf has no API to write its objects another way: the writer relies on
+private attributes of PdfWriter, checked before writing so that a pypdf
+release changing them fails with a clear error.
+"""
+
+import zlib
+from io import BytesIO
+from typing import IO
+
+import pypdf
+from pypdf import PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    NameObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+)
+
+# Like qpdf
+DEFAULT_OBJECTS_PER_STREAM = 100
+
+_MIN_VERSION = (1, 5)
+# The PdfWriter attributes used, private but for generate_file_identifiers
+_WRITER_ATTRIBUTES = (
+    "_objects",
+    "_resolve_links",
+    "_info",
+    "_ID",
+    "_encryption",
+    "generate_file_identifiers",
+)
+
+
+def write_object_streams(
+    writer: PdfWriter,
+    stream: IO[bytes],
+    objects_per_stream: int = DEFAULT_OBJECTS_PER_STREAM,
+    level: int = -1,
+) -> None:
+    """
+    Write the document of a writer, with its objects other than streams
+    packed by objects_per_stream into object streams deflated at a zlib
+    level, and a cross-reference stream.
+    """
+    missing = [
+        name for name in _WRITER_ATTRIBUTES if not hasattr(writer, name)
+    ]
+    if missing:
+        raise RuntimeError(
+            f"object streams are not supported with pypdf "
+            f"{pypdf.__version__}, whose PdfWriter has no {', '.join(missing)}"
+        )
+    if writer._encryption is not None:
+        raise ValueError("an encrypted PDF cannot use object streams")
+    # Like the trailer of a file written by pypdf, with an /ID in any case
+    if writer._ID is None:
+        writer.generate_file_identifiers()
+    writer._resolve_links()
+    start = stream.tell()
+    stream.write(_header(writer.pdf_header) + b"\n%\xe2\xe3\xcf\xd3\n")
+    size = len(writer._objects) + 1
+    # Type, and offset or object stream number, and generation or index
+    # of each object, see the table 18 of ISO 32000-2
+    entries: list[tuple[int, int, int]] = [(0, 0, 65535)] * size
+    packed: list[tuple[int, PdfObject]] = []
+    for number, obj in enumerate(writer._objects, 1):
+        if obj is None:
+            continue
+        if isinstance(obj, StreamObject):
+            entries[number] = (1, stream.tell() - start, 0)
+            _write_object(stream, number, obj)
+        else:
+            packed.append((number, obj))
+    for first in range(0, len(packed), objects_per_stream):
+        group = packed[first : first + objects_per_stream]
+        object_stream_number = len(entries)
+        entries.append((1, stream.tell() - start, 0))
+        for index, (number, _obj) in enumerate(group):
+            entries[number] = (2, object_stream_number, index)
+        _write_object(
+            stream, object_stream_number, _object_stream(group, level)
+        )
+    xref_number = len(entries)
+    entries.append((1, stream.tell() - start, 0))
+    _write_object(stream, xref_number, _xref_stream(writer, entries, level))
+    stream.write(b"startxref\n%d\n%%%%EOF\n" % entries[xref_number][1])
+
+
+def _header(pdf_header: str) -> bytes:
+    """Return the PDF header, for version 1.5 at least."""
+    try:
+        version = tuple(int(part) for part in pdf_header[5:].split("."))
+    except ValueError:
+        version = ()
+    if version >= _MIN_VERSION:
+        return pdf_header.encode()
+    return b"%%PDF-%d.%d" % _MIN_VERSION
+
+
+def _object_stream(
+    group: list[tuple[int, PdfObject]], level: int
+) -> StreamObject:
+    """Return an object stream holding objects, by object number."""
+    offsets = []
+    bodies = BytesIO()
+    for number, obj in group:
+        offsets.append(b"%d %d" % (number, bodies.tell()))
+        obj.write_to_stream(bodies)
+        bodies.write(b"\n")
+    first = b" ".join(offsets) + b"\n"
+    object_stream = StreamObject()
+    object_stream._data = zlib.compress(first + bodies.getvalue(), level)
+    object_stream.update(
+        {
+            NameObject("/Type"): NameObject("/ObjStm"),
+            NameObject("/N"): NumberObject(len(group)),
+            NameObject("/First"): NumberObject(len(first)),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+        }
+    )
+    return object_stream
+
+
+def _xref_stream(
+    writer: PdfWriter, entries: list[tuple[int, int, int]], level: int
+) -> StreamObject:
+    """Return the cross-reference stream, holding the trailer entries."""
+    widths = [
+        1,
+        max(1, (max(entry[1] for entry in entries).bit_length() + 7) // 8),
+        max(2, (max(entry[2] for entry in entries).bit_length() + 7) // 8),
+    ]
+    data = b"".join(
+        b"".join(
+            field.to_bytes(width, "big")
+            for field, width in zip(entry, widths, strict=True)
+        )
+        for entry in entries
+    )
+    xref_stream = StreamObject()
+    xref_stream._data = zlib.compress(data, level)
+    xref_stream.update(
+        {
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/Size"): NumberObject(len(entries)),
+            NameObject("/W"): ArrayObject(
+                NumberObject(width) for width in widths
+            ),
+            NameObject("/Root"): writer.root_object.indirect_reference,
+            NameObject("/ID"): writer._ID,
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+        }
+    )
+    if writer._info is not None:
+        xref_stream[NameObject("/Info")] = writer._info.indirect_reference
+    return xref_stream
+
+
+def _write_object(stream: IO[bytes], number: int, obj: PdfObject) -> None:
+    stream.write(b"%d 0 obj\n" % number)
+    obj.write_to_stream(stream)
+    stream.write(b"\nendobj\n")
@@ -0,0 +1,79 @@
+"""
+Read input files ahead of their use, in background threads.
+
+On slow or network filesystems, reading the next input files while the
+current one is being parsed keeps the CPU busy instead of waiting on I/O.
+The files are read whole into memory, in the order they will be used,
+within a bound on their count and on their total size.
+"""
+
+from collections import deque
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO
+
+DEFAULT_MEMORY = 256 * 1024 * 1024  # in bytes
+
+
+class Prefetcher:
+    """
+    Read the next files of a sequence in background threads.
+
+    open() must be called in the order of the first use of each file.
+    Files larger than the memory budget, and files opened again,
+    are not read ahead: the caller opens them as usual.
+    """
+
+    def __init__(
+        self,
+        filepaths: Iterable[Path],
+        count: int,
+        max_bytes: int = DEFAULT_MEMORY,
+    ) -> None:
+        self.count = count
+        self.max_bytes = max_bytes
+        self._queue = deque(dict.fromkeys(filepaths))
+        self._pending: dict[Path, tuple[Future[bytes], int]] = {}
+        self._pending_bytes = 0
+        self._pool = ThreadPoolExecutor(
+            max_workers=count, thread_name_prefix="pdfly-prefetch"
+        )
+        self._fill()
+
+    def open(self, filepath: Path) -> BinaryIO | None:
+        """Return the content of a file, once read, or None if not read."""
+        if self._queue and self._queue[0] == filepath:
+            self._queue.popleft()
+        pending = self._pending.pop(filepath, None)
+        if pending is None:
+            self._fill()
+            return None
+        future, size = pending
+        self._pending_bytes -= size
+        self._fill()
+        return BytesIO(future.result())
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
+
+    def _fill(self) -> None:
+        while self._queue and len(self._pending) < self.count:
+            filepath = self._queue[0]
+            try:
+                size = filepath.stat().st_size
+            except OSError:  # reported when the file is opened
+                size = self.max_bytes + 1
+            if size > self.max_bytes:
+                self._queue.popleft()
+                continue
+            if self._pending_bytes + size > self.max_bytes:
+                return
+            self._queue.popleft()
+            self._pending[filepath] = (
+                self._pool.submit(filepath.read_bytes),
+                size,
+            )
+            self._pending_bytes += size
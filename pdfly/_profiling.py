@@ -0,0 +1,187 @@
+"""
+Profiling of pdfly commands, enabled by the --profile option.
+
+The default, deterministic mode uses cProfile and writes its statistics in
+the pstats format, that can be explored with e.g. snakeviz, as well as a
+flame graph in the speedscope format (https://www.speedscope.app).
+cProfile only records statistics per caller/callee pair, so the stacks of
+the flame graph are rebuilt by splitting the time of each function between
+its callers, in proportion of the time spent in each call site.
+
+The sampling mode has a much lower overhead, suited for long runs:
+a thread records the stack of the main thread at regular intervals,
+and only a speedscope file is written.
+"""
+
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+DEFAULT_SAMPLING_INTERVAL = 0.005  # in seconds
+
+# Stacks weighting less than this fraction of the total time are not
+# rebuilt further, so that the size of the flame graph stays reasonable.
+_MIN_STACK_FRACTION = 1e-4
+_MAX_STACK_DEPTH = 256
+
+Function = tuple[str, int, str]  # filename, line number, name, as in pstats
+Stack = tuple[Function, ...]  # from the outermost call
+
+
+class Profiler:
+    """Deterministic profiler of a command, based on cProfile."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> list[Path]:
+        """Stop profiling, write the profiles, and return their paths."""
+        self.profile.disable()
+        stats = pstats.Stats(self.profile)
+        pstats_path = self.path.with_name(self.path.name + ".pstats")
+        stats.dump_stats(pstats_path)
+        speedscope_path = _speedscope_path(self.path)
+        samples = rebuild_stacks(stats.stats)  # type: ignore[attr-defined]
+        write_speedscope(speedscope_path, samples, self.path.name)
+        return [pstats_path, speedscope_path]
+
+
+class SamplingProfiler:
+    """Statistical profiler of the main thread."""
+
+    def __init__(
+        self, path: Path, interval: float = DEFAULT_SAMPLING_INTERVAL
+    ) -> None:
+        self.path = path
+        self.interval = interval
+        self.samples: dict[Stack, float] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="pdfly-profiler", daemon=True
+        )
+        self._target_id = threading.main_thread().ident
+
+    def start(self) -> None:
+        self._target_id = threading.get_ident()
+        self._thread.start()
+
+    def stop(self) -> list[Path]:
+        """Stop profiling, write the profile, and return its path."""
+        self._stopped.set()
+        self._thread.join()
+        speedscope_path = _speedscope_path(self.path)
+        write_speedscope(speedscope_path, self.samples, self.path.name)
+        return [speedscope_path]
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self._target_id or 0)
+            if frame is not None:
+                stack = _frame_stack(frame)
+                self.samples[stack] = self.samples.get(stack, 0) + now - last
+            last = now
+
+
+def rebuild_stacks(
+    stats: dict[Function, tuple[Any, ...]],
+) -> dict[Stack, float]:
+    """
+    Rebuild call stacks, weighted by their own time in seconds,
+    from the statistics of a pstats.Stats object.
+    """
+    samples: dict[Stack, float] = {}
+    min_weight = _MIN_STACK_FRACTION * sum(stat[2] for stat in stats.values())
+
+    def visit(stack: Stack, fraction: float) -> None:
+        func = stack[-1]
+        _cc, _nc, own_time, _total_time, _callers = stats[func]
+        if own_time * fraction > 0:
+            samples[stack] = samples.get(stack, 0) + own_time * fraction
+        if len(stack) >= _MAX_STACK_DEPTH:
+            return
+        for callee in callees.get(func, []):
+            if callee in stack:  # recursion is flattened
+                continue
+            callee_total_time = stats[callee][3]
+            edge_total_time = stats[callee][4][func][3]
+            if callee_total_time <= 0:
+                continue
+            callee_fraction = fraction * edge_total_time / callee_total_time
+            if callee_total_time * callee_fraction >= min_weight:
+                visit((*stack, callee), callee_fraction)
+
+    callees: dict[Function, list[Function]] = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in stats.items():
+        for caller in callers:
+            if caller != func:
+                callees.setdefault(caller, []).append(func)
+    for func, (_cc, _nc, _tt, _ct, callers) in stats.items():
+        if not callers or callers.keys() == {func}:
+            visit((func,), 1.0)
+    return samples
+
+
+def write_speedscope(
+    path: Path, samples: dict[Stack, float], name: str
+) -> None:
+    """Write weighted stacks as a sampled profile in the speedscope format."""
+    frames: list[dict[str, Any]] = []
+    frame_indexes: dict[Function, int] = {}
+    stacks, weights = [], []
+    for stack, weight in samples.items():
+        indexes = []
+        for func in stack:
+            if func not in frame_indexes:
+                frame_indexes[func] = len(frames)
+                filename, line, func_name = func
+                frame: dict[str, Any] = {"name": func_name}
+                if filename != "~":  # built-in functions
+                    frame.update(file=filename, line=line)
+                frames.append(frame)
+            indexes.append(frame_indexes[func])
+        stacks.append(indexes)
+        weights.append(weight)
+    document = {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            }
+        ],
+        "name": name,
+        "exporter": "pdfly",
+    }
+    path.write_text(json.dumps(document), encoding="utf-8")
+
+
+def _frame_stack(frame: FrameType | None) -> Stack:
+    functions = []
+    while frame is not None:
+        code = frame.f_code
+        functions.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(functions))
+
+
+def _speedscope_path(path: Path) -> Path:
+    return path.with_name(path.name + ".speedscope.json")
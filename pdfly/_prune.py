@@ -0,0 +1,213 @@
+"""
+Prune the references to the pages removed from a document.
+
+The objects used only by the removed pages, like images & fonts, are not
+copied to the output, unless they are still reachable from the pages kept:
+through links to the removed pages, through the annotations of the removed
+pages listed by the fields of a form they share with the pages kept, or
+through any other reference to a removed page, which would copy the removed
+page and everything it uses.
+
+Pruning drops these annotations, and replaces the other references to the
+removed pages by null, in the objects of the reader, which are modified
+in memory. It reports the bytes of the input no longer reachable.
+"""
+
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    PdfObject,
+)
+
+from pdfly._raw import RawObjectReader, Ref
+
+# Objects of the document structure, not copied with the pages
+_STRUCTURE_TYPES = ("/Pages", "/Catalog")
+
+
+class PruneResult(NamedTuple):
+    annotations: int  # annotations dropped
+    references: int  # other references to removed pages, replaced by null
+    size: int  # bytes of the objects of the input no longer reachable
+    modified: set[Ref]  # objects of the input modified
+
+
+def prune_removed_pages(
+    reader: PdfReader, removed_page_nums: Iterable[int]
+) -> PruneResult:
+    """Prune the references to removed pages from the pages kept."""
+    pages = reader.pages
+    removed = {
+        _ref(pages[num].indirect_reference) for num in removed_page_nums
+    }
+    if not removed:
+        return PruneResult(0, 0, 0, set())
+    kept = [
+        page for page in pages if _ref(page.indirect_reference) not in removed
+    ]
+    reachable_before = _reachable(kept)
+    pruner = _Pruner(reader, removed)
+    for page in kept:
+        pruner.prune_page(page)
+    raw_reader = RawObjectReader(reader)
+    size = sum(
+        raw_reader.size(ref) for ref in reachable_before - _reachable(kept)
+    )
+    return PruneResult(
+        pruner.annotations, pruner.references, size, pruner.modified
+    )
+
+
+class _Pruner:
+    def __init__(self, reader: PdfReader, removed: set[Ref]) -> None:
+        self.reader = reader
+        self.removed = removed
+        self.annotations = 0
+        self.references = 0
+        self.modified: set[Ref] = set()
+        self._seen: set[Ref] = set()
+        self._named_destinations: dict[str, PdfObject] | None = None
+
+    def prune_page(self, page: DictionaryObject) -> None:
+        self._seen.add(_ref(page.indirect_reference))
+        annotations = _resolve(page.get("/Annots"))
+        if isinstance(annotations, ArrayObject):
+            kept = [
+                annotation
+                for annotation in annotations
+                if not self._is_removed_annotation(annotation)
+            ]
+            if len(kept) != len(annotations):
+                self.annotations += len(annotations) - len(kept)
+                page[NameObject("/Annots")] = ArrayObject(kept)
+        for key in page:
+            if key != "/Parent":
+                page[key] = self._prune(page.raw_get(key), None)
+
+    def _prune(self, value: PdfObject, owner: Ref | None) -> PdfObject:
+        """Prune a value, and return it, or null if it is a removed page."""
+        if isinstance(value, IndirectObject):
+            ref = _ref(value)
+            if ref in self.removed:
+                self.references += 1
+                if owner is not None:
+                    self.modified.add(owner)
+                return NullObject()
+            if ref not in self._seen:
+                self._seen.add(ref)
+                target = value.get_object()
+                if target is not None and not (
+                    isinstance(target, DictionaryObject)
+                    and target.get("/Type") in _STRUCTURE_TYPES
+                ):
+                    self._prune(target, ref)
+        elif isinstance(value, DictionaryObject):
+            for key in value:
+                value[key] = self._prune(value.raw_get(key), owner)
+        elif isinstance(value, ArrayObject):
+            items = [
+                item
+                for item in value
+                if not self._is_removed_annotation(item, annotation_only=True)
+            ]
+            if len(items) != len(value):
+                self.annotations += len(value) - len(items)
+                if owner is not None:
+                    self.modified.add(owner)
+            value[:] = [self._prune(item, owner) for item in items]
+        return value
+
+    def _is_removed_annotation(
+        self, value: PdfObject, annotation_only: bool = False
+    ) -> bool:
+        """
+        Whether a value is an annotation of a removed page,
+        or a link to a removed page, unless annotation_only.
+        """
+        annotation = value.get_object()
+        if not isinstance(annotation, DictionaryObject):
+            return False
+        page = _raw_get(annotation, "/P")
+        if isinstance(page, IndirectObject) and _ref(page) in self.removed:
+            return True
+        if annotation_only:
+            return False
+        destination = _resolve(annotation.get("/Dest"))
+        action = _resolve(annotation.get("/A"))
+        if (
+            destination is None
+            and isinstance(action, DictionaryObject)
+            and action.get("/S") == "/GoTo"
+        ):
+            destination = _resolve(action.get("/D"))
+        page = self._destination_page(destination)
+        return page is not None and _ref(page) in self.removed
+
+    def _destination_page(
+        self, destination: PdfObject | None
+    ) -> IndirectObject | None:
+        if isinstance(destination, str):  # a named destination
+            if self._named_destinations is None:
+                self._named_destinations = {
+                    name: _raw_get(named, "/Page")
+                    for name, named in self.reader.named_destinations.items()
+                }
+            page = self._named_destinations.get(destination)
+            return page if isinstance(page, IndirectObject) else None
+        if isinstance(destination, DictionaryObject):
+            destination = _resolve(destination.get("/D"))
+        if isinstance(destination, ArrayObject) and destination:
+            page = destination[0]
+            return page if isinstance(page, IndirectObject) else None
+        return None
+
+
+def _reachable(pages: Iterable[DictionaryObject]) -> set[Ref]:
+    """
+    Return the objects reachable from pages, but the document structure,
+    including the removed pages reached & the objects they use.
+    """
+    reachable: set[Ref] = set()
+    stack: list[PdfObject] = [
+        page.raw_get(key) for page in pages for key in page if key != "/Parent"
+    ]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, IndirectObject):
+            ref = _ref(value)
+            if ref in reachable:
+                continue
+            target = value.get_object()
+            if target is None or (
+                isinstance(target, DictionaryObject)
+                and target.get("/Type") in _STRUCTURE_TYPES
+            ):
+                continue
+            reachable.add(ref)
+            stack.append(target)
+        elif isinstance(value, DictionaryObject):
+            stack.extend(value.raw_get(key) for key in value)
+        elif isinstance(value, ArrayObject):
+            stack.extend(value)
+    return reachable
+
+
+def _resolve(value: PdfObject | None) -> PdfObject | None:
+    """Return the object an indirect reference points to, or the value."""
+    return value.get_object() if value is not None else None
+
+
+def _raw_get(dictionary: DictionaryObject, key: str) -> PdfObject | None:
+    return dictionary.raw_get(key) if key in dictionary else None
+
+
+def _ref(reference: IndirectObject | None) -> Ref:
+    assert reference is not None
+    return reference.idnum, reference.generation
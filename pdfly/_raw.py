@@ -0,0 +1,262 @@
+"""
+Copy the objects of a PDF file from their original bytes.
+
+Objects that an operation does not modify, like images & fonts, do not need
+to be parsed into pypdf objects and serialized again: their bytes are copied
+from the input file, only their references to other objects being located,
+so that they can be renumbered. The data of streams is copied as is,
+without being parsed nor decoded.
+
+Objects that cannot be copied this way are left to pypdf: the objects of
+encrypted files, objects compressed in object streams, and objects that
+are not where the cross-reference table says they are.
+"""
+
+import re
+from array import array
+from bisect import bisect_right
+from collections.abc import Callable
+from typing import NamedTuple
+
+from pypdf import PdfReader
+from pypdf.generic import IndirectObject
+
+Ref = tuple[int, int]  # object number & generation in the input document
+
+# Bytes read at once from the start of an object, to find its end
+_CHUNK_SIZE = 64 * 1024
+
+_SPACE = rb"[\x00\t\n\x0c\r ]"
+_HEADER = re.compile(
+    _SPACE + rb"*(\d+)" + _SPACE + rb"+(\d+)" + _SPACE + rb"+obj"
+)
+_TOKEN = re.compile(
+    rb"""
+    (?P<space>[\x00\t\n\x0c\r ]+)
+    | (?P<comment>%[^\r\n]*)
+    | (?P<open><<|\[)
+    | (?P<close>>>|\])
+    | (?P<hex><[^>]*>)
+    | (?P<string>\()
+    | (?P<name>/[^\x00\t\n\x0c\r ()<>\[\]{}/%]*)
+    | (?P<regular>[^\x00\t\n\x0c\r ()<>\[\]{}/%]+)
+    """,
+    re.VERBOSE,
+)
+_STRING_DELIMITER = re.compile(rb"[()\\]")
+_INTEGER = re.compile(rb"\d+")
+
+
+class RawObject(NamedTuple):
+    """
+    An object copied from the bytes of a file, split around its references.
+
+    The chunks of a stream object stop after its dictionary,
+    the data of the stream being read when the object is written.
+    """
+
+    chunks: list[bytes]
+    refs: list[Ref]
+    type: str | None  # the /Type of a dictionary
+    stream: tuple[int, int] | None  # offset & length of the stream data
+
+
+class _IncompleteError(Exception):
+    """The end of an object is beyond the bytes read."""
+
+
+class RawObjectReader:
+    """Read the objects of the file of a reader from their bytes."""
+
+    def __init__(self, reader: PdfReader) -> None:
+        self.reader = reader
+        self.stream = reader.stream
+        # Offsets of all the objects, to bound the bytes of each object
+        offsets = {
+            offset for xref in reader.xref.values() for offset in xref.values()
+        }
+        offsets.add(self.stream.seek(0, 2))
+        self._offsets = array("Q", sorted(offsets))
+
+    @property
+    def enabled(self) -> bool:
+        """Whether objects can be copied: encrypted objects cannot."""
+        return not self.reader.is_encrypted
+
+    def read(self, ref: Ref) -> RawObject | None:
+        """
+        Locate the bytes of an object, and the references they hold.
+        Returns None if the object cannot be copied.
+        """
+        number, generation = ref
+        offset = self.reader.xref.get(generation, {}).get(number)
+        if offset is None or number in self.reader.xref_objStm:
+            return None
+        index = bisect_right(self._offsets, offset)
+        if index == len(self._offsets):
+            return None
+        end = self._offsets[index]
+        self.stream.seek(offset)
+        data = self.stream.read(min(_CHUNK_SIZE, end - offset))
+        try:
+            return _lex_object(data, ref, offset, self._length)
+        except _IncompleteError:
+            if len(data) == end - offset:
+                return None
+        self.stream.seek(offset)
+        data = self.stream.read(end - offset)
+        try:
+            return _lex_object(data, ref, offset, self._length)
+        except _IncompleteError:
+            return None
+
+    def size(self, ref: Ref) -> int:
+        """
+        Return the number of bytes of an object in the file,
+        or 0 for an object compressed in an object stream.
+        """
+        number, generation = ref
+        offset = self.reader.xref.get(generation, {}).get(number)
+        if offset is None or number in self.reader.xref_objStm:
+            return 0
+        index = bisect_right(self._offsets, offset)
+        if index == len(self._offsets):
+            return 0
+        return self._offsets[index] - offset
+
+    def stream_data(self, raw_object: RawObject) -> bytes | None:
+        """
+        Read the data of a stream object.
+        Returns None if the data does not end where its length says.
+        """
+        assert raw_object.stream is not None
+        offset, length = raw_object.stream
+        self.stream.seek(offset)
+        data = self.stream.read(length)
+        end = self.stream.read(32)
+        if len(data) < length or not end.lstrip().startswith(b"endstream"):
+            return None
+        return data
+
+    def _length(self, value: int | Ref) -> int | None:
+        if isinstance(value, int):
+            return value
+        length = self.reader.get_object(IndirectObject(*value, self.reader))
+        return length if isinstance(length, int) else None
+
+
+def _lex_object(
+    data: bytes,
+    ref: Ref,
+    offset: int,
+    get_length: Callable[[int | Ref], int | None],
+) -> RawObject | None:
+    """
+    Split the bytes of an object around its references.
+
+    Returns None if the bytes are not those of the object.
+    Raises _IncompleteError if the bytes stop before the end of the object.
+    """
+    header = _HEADER.match(data)
+    if header is None or (int(header[1]), int(header[2])) != ref:
+        return None
+    chunks: list[bytes] = []
+    refs: list[Ref] = []
+    start = chunk_start = header.end()
+    # Integers just before the current token, that may start a reference
+    integers: list[tuple[int, int]] = []  # (position, value)
+    depth = 0
+    # Keys & values of the top-level dictionary, to find its type & length
+    in_dict = expect_key = False
+    key = obj_type = None
+    length: int | Ref | None = None
+    length_position = -1
+    position = start
+    while True:
+        token = _TOKEN.match(data, position)
+        if token is None:
+            if position >= len(data):
+                raise _IncompleteError
+            return None  # not a PDF token
+        position = token.end()
+        kind = token.lastgroup
+        if kind in {"space", "comment"}:
+            continue
+        value = token[0]
+        if kind == "string":
+            position = _skip_string(data, position)
+        if kind == "regular" and value == b"R" and len(integers) == 2:
+            (ref_start, number), (_position, generation) = integers
+            chunks.append(data[chunk_start:ref_start])
+            refs.append((number, generation))
+            chunk_start = position
+            if ref_start == length_position:
+                length = (number, generation)
+        if (
+            depth == 0
+            and kind == "regular"
+            and value
+            in {
+                b"endobj",
+                b"stream",
+            }
+        ):
+            break
+        if kind == "regular" and _INTEGER.fullmatch(value):
+            integers = [*integers[-1:], (token.start(), int(value))]
+        else:
+            integers = []
+        if kind == "open":
+            depth += 1
+            if depth == 1 and value == b"<<":
+                in_dict = expect_key = True
+                continue
+        elif kind == "close":
+            depth -= 1
+            if depth < 0:
+                return None
+        if depth != 1 or not in_dict or kind == "open":
+            continue
+        # A key, or a value of the top-level dictionary, is complete
+        if expect_key:
+            key = value
+        elif key == b"/Type" and kind == "name":
+            obj_type = value.decode("latin-1")
+        elif key == b"/Length" and integers:
+            length = integers[-1][1]
+            length_position = token.start()
+        expect_key = not expect_key
+    body_end = token.start()
+    chunks.append(data[chunk_start:body_end].rstrip())
+    chunks[0] = chunks[0].lstrip()
+    if value == b"endobj":
+        return RawObject(chunks, refs, obj_type, None)
+    # The stream data starts after the end of line following "stream"
+    data_start = position
+    if data[data_start : data_start + 2] == b"\r\n":
+        data_start += 2
+    elif data[data_start : data_start + 1] in {b"\r", b"\n"}:
+        data_start += 1
+    stream_length = None if length is None else get_length(length)
+    if stream_length is None:
+        return None
+    return RawObject(
+        chunks, refs, obj_type, (offset + data_start, stream_length)
+    )
+
+
+def _skip_string(data: bytes, position: int) -> int:
+    """Return the position after a literal string, opened before position."""
+    nesting = 1
+    while nesting:
+        delimiter = _STRING_DELIMITER.search(data, position)
+        if delimiter is None:
+            raise _IncompleteError
+        position = delimiter.end()
+        if delimiter[0] == b"\\":
+            position += 1
+        elif delimiter[0] == b"(":
+            nesting += 1
+        else:
+            nesting -= 1
+    return position
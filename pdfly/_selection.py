@@ -0,0 +1,146 @@
+"""
+Selection of the pages of a document with page ranges.
+
+Page ranges are compiled into a PageSet: a bitmap holding one byte per page,
+on which unions, intersections, differences and complements are computed in
+a single pass, whatever the number of page ranges. Iterating over a PageSet
+yields its page numbers in increasing order.
+"""
+
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import compress
+
+from pypdf import PageRange
+
+# A page range, or page ranges to combine, like the page ranges
+# removed together from a file by rm
+PageSelection = PageRange | Sequence[PageRange]
+
+
+class PageSet:
+    """A set of page numbers of a document, stored as a bitmap."""
+
+    def __init__(self, num_pages: int, bits: bytes | None = None) -> None:
+        self.num_pages = num_pages
+        self._bits = bytearray(num_pages) if bits is None else bytearray(bits)
+        if len(self._bits) != num_pages:
+            raise ValueError("The bitmap must hold one byte per page")
+
+    @classmethod
+    def from_ranges(
+        cls, num_pages: int, page_ranges: Iterable[PageRange]
+    ) -> "PageSet":
+        """Return the union of the pages selected by page ranges."""
+        page_set = cls(num_pages)
+        for page_range in page_ranges:
+            page_set.add_range(page_range)
+        return page_set
+
+    def add_range(self, page_range: PageRange) -> None:
+        pages = range(*page_range.indices(self.num_pages))
+        if not pages:
+            return
+        if pages.step < 0:
+            pages = pages[::-1]
+        self._bits[pages.start : pages.stop : pages.step] = b"\x01" * len(
+            pages
+        )
+
+    def __contains__(self, page_num: object) -> bool:
+        return (
+            isinstance(page_num, int)
+            and 0 <= page_num < self.num_pages
+            and self._bits[page_num] == 1
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        return compress(range(self.num_pages), self._bits)
+
+    def __len__(self) -> int:
+        return self._bits.count(1)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PageSet):
+            return NotImplemented
+        return self.num_pages == other.num_pages and self._bits == other._bits
+
+    def __or__(self, other: "PageSet") -> "PageSet":
+        return self._from_int(self._to_int() | other._to_int())
+
+    def __and__(self, other: "PageSet") -> "PageSet":
+        return self._from_int(self._to_int() & other._to_int())
+
+    def __sub__(self, other: "PageSet") -> "PageSet":
+        return self._from_int(self._to_int() & ~other._to_int())
+
+    def __invert__(self) -> "PageSet":
+        """Return the pages of the document that are not in the set."""
+        ones = int.from_bytes(b"\x01" * self.num_pages, "big")
+        return self._from_int(self._to_int() ^ ones)
+
+    # Each byte being 0 or 1, bitwise operations on the bitmaps as integers
+    # give the bitmaps of the results, computed in C in a single pass.
+    def _to_int(self) -> int:
+        return int.from_bytes(self._bits, "big")
+
+    def _from_int(self, value: int) -> "PageSet":
+        return PageSet(self.num_pages, value.to_bytes(self.num_pages, "big"))
+
+
+def select_pages(
+    num_pages: int,
+    selection: PageSelection,
+    inverted_page_selection: bool = False,
+) -> tuple[list[int], bool]:
+    """
+    Return the page numbers selected, and whether all the page ranges
+    are in bounds.
+
+    The pages of each page range are selected in turn, in their order.
+    With inverted_page_selection, the pages not selected by any of the
+    page ranges are selected instead, in increasing order.
+    """
+    page_ranges = (
+        [selection] if isinstance(selection, PageRange) else selection
+    )
+    in_bounds = all(
+        is_in_bounds(num_pages, page_range) for page_range in page_ranges
+    )
+    if inverted_page_selection:
+        return list(~PageSet.from_ranges(num_pages, page_ranges)), in_bounds
+    page_nums = [
+        page_num
+        for page_range in page_ranges
+        for page_num in range(*page_range.indices(num_pages))
+    ]
+    return page_nums, in_bounds
+
+
+def selected_by_all(
+    num_pages: int, selections: Iterable[PageSelection]
+) -> PageSet:
+    """Return the pages selected by every one of the selections."""
+    pages = ~PageSet(num_pages)
+    for selection in selections:
+        page_ranges = (
+            [selection] if isinstance(selection, PageRange) else selection
+        )
+        pages &= PageSet.from_ranges(num_pages, page_ranges)
+    return pages
+
+
+def is_in_bounds(num_pages: int, page_range: PageRange) -> bool:
+    start, end, _step = page_range.indices(num_pages)
+    return not (
+        start < 0
+        or end < 0
+        or start >= num_pages
+        or end > num_pages
+        or start > end
+    )
+
+
+def format_selection(selection: PageSelection) -> str:
+    if isinstance(selection, PageRange):
+        return str(selection)
+    return " ".join(str(page_range) for page_range in selection)
@@ -0,0 +1,210 @@
+"""
+Performance statistics of pdfly commands, enabled by the --stats option.
+
+The run time of a command is split into exclusive phases:
+
+    import     importing modules, mostly the dependencies of the command
+    parse      reading PDF files with pypdf (PdfReader)
+    write      serializing PDF files with pypdf (PdfWriter.write)
+    transform  everything else, i.e. the work of the command itself
+
+The parse & write phases, and the bytes read & written by pypdf,
+are measured by wrapping a few pypdf methods while statistics are collected,
+so that all sub-commands are covered. Sub-commands reading or writing
+files without pypdf report them with count_read() & count_written(),
+and can measure other phases with the phase() context manager.
+
+Only the thread starting the collection moves between phases: the time of
+worker threads, like those of compress --jobs or cat --prefetch, runs
+concurrently and is counted in the phase of the main thread waiting on
+them, while their bytes read & written are still counted.
+
+The peak memory is measured with tracemalloc, which slows down the command:
+timings are more accurate without it, with trace_memory=False.
+"""
+
+import builtins
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from io import BytesIO
+from typing import IO, Any
+
+DEFAULT_PHASE = "transform"
+
+_current: "Stats | None" = None
+
+
+class Stats:
+    def __init__(self, command: str | None, trace_memory: bool = True) -> None:
+        self.command = command
+        self.trace_memory = trace_memory
+        self.phases: dict[str, float] = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._stack = [DEFAULT_PHASE]
+        self._started = self._since = 0.0
+        self._duration = 0.0
+        self._peak_memory: int | None = None
+        self._thread: int | None = None
+        self._restore: list[tuple[object, str, object]] = []
+
+    def start(self) -> None:
+        global _current
+        if _current is not None:
+            raise RuntimeError("Statistics are already being collected")
+        _current = self
+        self._thread = threading.get_ident()
+        if self.trace_memory:
+            tracemalloc.start()
+        self._started = self._since = time.perf_counter()
+        self._patch(builtins, "__import__", self._wrap_import)
+        # Imported after wrapping __import__ to be measured
+        from pypdf import PdfReader, PdfWriter
+
+        self._patch(PdfReader, "read", self._wrap_read)
+        self._patch(PdfReader, "get_object", self._wrap_phase("parse"))
+        self._patch(PdfWriter, "write_stream", self._wrap_write_stream)
+
+    def stop(self) -> dict[str, Any]:
+        """Stop collecting statistics, and return them."""
+        global _current
+        now = time.perf_counter()
+        self._add_time(now)
+        self._duration = now - self._started
+        for owner, name, original in reversed(self._restore):
+            setattr(owner, name, original)
+        self._restore.clear()
+        if self.trace_memory:
+            self._peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        _current = None
+        return self.to_dict()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "command": self.command,
+            "duration": round(self._duration, 6),
+            "phases": {
+                name: round(duration, 6)
+                for name, duration in sorted(self.phases.items())
+            },
+            "peak_memory": self._peak_memory,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+    def enter(self, name: str) -> None:
+        if threading.get_ident() != self._thread:
+            return
+        self._add_time(time.perf_counter())
+        self._stack.append(name)
+
+    def exit(self) -> None:
+        if threading.get_ident() != self._thread:
+            return
+        self._add_time(time.perf_counter())
+        self._stack.pop()
+
+    def _add_time(self, now: float) -> None:
+        name = self._stack[-1]
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._since
+        self._since = now
+
+    def _patch(
+        self,
+        owner: object,
+        name: str,
+        wrapper: Callable[[Callable[..., Any]], Callable[..., Any]],
+    ) -> None:
+        original = getattr(owner, name)
+        self._restore.append((owner, name, original))
+        setattr(owner, name, wrapper(original))
+
+    def _wrap_phase(
+        self, phase_name: str
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        def wrapper(func: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapped(*args: object, **kwargs: object) -> object:
+                self.enter(phase_name)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.exit()
+
+            return wrapped
+
+        return wrapper
+
+    def _wrap_read(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        def read(reader: object, stream: IO[bytes]) -> None:
+            self.enter("parse")
+            try:
+                func(reader, stream)
+                position = stream.tell()
+                self.bytes_read += stream.seek(0, 2)
+                stream.seek(position)
+            finally:
+                self.exit()
+
+        return read
+
+    def _wrap_write_stream(
+        self, func: Callable[..., Any]
+    ) -> Callable[..., Any]:
+        def write_stream(writer: object, stream: IO[bytes]) -> None:
+            self.enter("write")
+            try:
+                start = stream.tell()
+                func(writer, stream)
+                # Documents written in memory are reported by the command
+                # when, and if, they are written to an output.
+                if not isinstance(stream, BytesIO):
+                    self.bytes_written += stream.tell() - start
+            finally:
+                self.exit()
+
+        return write_stream
+
+    def _wrap_import(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapped_import(
+            name: str, *args: object, **kwargs: object
+        ) -> object:
+            if name in sys.modules:  # nothing to measure
+                return func(name, *args, **kwargs)
+            self.enter("import")
+            try:
+                return func(name, *args, **kwargs)
+            finally:
+                self.exit()
+
+        return wrapped_import
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the time spent in this context to a phase."""
+    stats = _current
+    if stats is None:
+        yield
+        return
+    stats.enter(name)
+    try:
+        yield
+    finally:
+        stats.exit()
+
+
+def count_read(size: int) -> None:
+    """Report bytes read from inputs without pypdf."""
+    if _current is not None:
+        _current.bytes_read += size
+
+
+def count_written(size: int) -> None:
+    """Report bytes written to outputs without pypdf."""
+    if _current is not None:
+        _current.bytes_written += size
@@ -0,0 +1,688 @@
+"""
+Write the pages of PDF documents to an output as soon as they are added.
+
+Unlike pypdf.PdfWriter, which keeps every page and every object in memory
+until the document is written, StreamingPdfWriter serializes the objects
+of the pages right away. Only the offsets of the objects and the page tree
+references are kept in memory, and the callers keep the object numbers
+assigned to the objects of the inputs still in use.
+
+Objects are serialized into templates: the bytes of the object, split
+around its references to other objects. Templates only hold bytes and
+tuples of ints, so they can be built in other processes, and the object
+numbers of the output are only assigned when they are written.
+
+The objects used by the pages can also be copied from the bytes of the input
+file, see pdfly._raw, instead of being parsed by pypdf and serialized again.
+"""
+
+import hashlib
+from array import array
+from collections import deque
+from collections.abc import (
+    Callable,
+    Container,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from io import BytesIO
+from typing import IO, NamedTuple
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    PdfObject,
+    StreamObject,
+)
+
+from pdfly._raw import RawObject, RawObjectReader, Ref
+
+# Placeholder for the reference to the page tree, in the /Parent of pages
+PAGE_TREE_REF: Ref = (0, 0)
+
+# Like pypdf.PdfWriter.add_page()
+EXCLUDED_PAGE_KEYS = ("/Parent", "/StructParents")
+# Objects that must not be reached from the pages of another document
+EXCLUDED_TYPES = ("/Page", "/Pages", "/Catalog")
+
+_HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+
+
+class ObjectTemplate(NamedTuple):
+    """A serialized object, whose refs go between its chunks."""
+
+    chunks: list[bytes]
+    refs: list[Ref]
+
+
+class PageObjects(NamedTuple):
+    """An object reachable from selected pages, or one of these pages."""
+
+    ref: Ref
+    template: ObjectTemplate
+    is_page: bool
+
+
+def iter_page_objects(
+    reader: PdfReader,
+    page_indices: Sequence[int],
+    known: Callable[[Ref], bool] = lambda _: False,
+    raw: bool = False,
+    modified: Container[Ref] = (),
+) -> Iterator[PageObjects]:
+    """
+    Serialize the selected pages of a reader, then the objects they use.
+
+    The objects for which known() returns True are not serialized,
+    nor the objects they use: they must have been written already.
+    References to pages that are not selected, nor known, are replaced
+    by null, so that the rest of the document is not copied.
+    If raw is True, the objects used by the pages are copied from the bytes
+    of the file where possible, the pages themselves, and the objects
+    modified in memory, being serialized.
+    """
+    pages = [reader.pages[index] for index in page_indices]
+    page_refs = {_ref(page.indirect_reference) for page in pages}
+    seen: set[Ref] = set()
+    queue: deque[Ref] = deque()
+    raw_reader = RawObjectReader(reader) if raw else None
+    if raw_reader is not None and not raw_reader.enabled:
+        raw_reader = None
+    raw_objects: dict[Ref, RawObject] = {}  # read, but not yet serialized
+
+    def resolve(reference: IndirectObject) -> Ref | None:
+        ref = _ref(reference)
+        if ref in page_refs or ref in seen or known(ref):
+            return ref
+        raw_object = (
+            None
+            if raw_reader is None or ref in modified
+            else raw_reader.read(ref)
+        )
+        if raw_object is not None:
+            target_type = raw_object.type
+        else:
+            target = reference.get_object()
+            target_type = (
+                target.get("/Type")
+                if isinstance(target, DictionaryObject)
+                else None
+            )
+        if target_type in EXCLUDED_TYPES:
+            return None
+        seen.add(ref)
+        queue.append(ref)
+        if raw_object is not None:
+            raw_objects[ref] = raw_object
+        return ref
+
+    for page in pages:
+        yield PageObjects(
+            _ref(page.indirect_reference),
+            serialize(page, resolve, is_page=True),
+            True,
+        )
+    while queue:
+        ref = queue.popleft()
+        raw_object = raw_objects.pop(ref, None)
+        template = None
+        if raw_object is not None:
+            assert raw_reader is not None
+            template = copy_raw_object(raw_reader, raw_object, resolve)
+        if template is None:
+            obj = reader.get_object(IndirectObject(*ref, reader))
+            template = serialize(obj, resolve)
+        yield PageObjects(ref, template, False)
+
+
+def copy_raw_object(
+    raw_reader: RawObjectReader,
+    raw_object: RawObject,
+    resolve: Callable[[IndirectObject], Ref | None],
+) -> ObjectTemplate | None:
+    """
+    Make a template of an object from its bytes, like serialize() does,
+    or return None if the data of its stream cannot be read.
+    """
+    chunks = [raw_object.chunks[0]]
+    refs: list[Ref] = []
+    for ref, chunk in zip(raw_object.refs, raw_object.chunks[1:]):
+        resolved = resolve(IndirectObject(*ref, raw_reader.reader))
+        if resolved is None:
+            chunks[-1] += b"null" + chunk
+        else:
+            refs.append(resolved)
+            chunks.append(chunk)
+    if raw_object.stream is not None:
+        data = raw_reader.stream_data(raw_object)
+        if data is None:
+            return None
+        chunks[-1] = b"".join(
+            (chunks[-1], b"\nstream\n", data, b"\nendstream")
+        )
+    return ObjectTemplate(chunks, refs)
+
+
+def serialize(
+    obj: PdfObject | None,
+    resolve: Callable[[IndirectObject], Ref | None],
+    is_page: bool = False,
+) -> ObjectTemplate:
+    """
+    Serialize an object into a template.
+
+    resolve() gives the reference to write for each indirect object,
+    or None to write null instead.
+    """
+    buffer = BytesIO()
+    chunks: list[bytes] = []
+    refs: list[Ref] = []
+
+    def write_ref(ref: Ref) -> None:
+        chunks.append(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        refs.append(ref)
+
+    def write_dict(
+        dictionary: DictionaryObject, excluded: Iterable[str]
+    ) -> None:
+        buffer.write(b"<<\n")
+        for key, value in dictionary.items():
+            if key in excluded or (
+                len(key) > 2 and key[1] == "%" and key[-1] == "%"
+            ):
+                continue
+            key.write_to_stream(buffer)
+            buffer.write(b" ")
+            write(value)
+            buffer.write(b"\n")
+
+    def write(value: PdfObject | None) -> None:
+        if value is None:
+            buffer.write(b"null")
+        elif isinstance(value, IndirectObject):
+            ref = resolve(value)
+            if ref is None:
+                buffer.write(b"null")
+            else:
+                write_ref(ref)
+        elif isinstance(value, StreamObject):
+            write_dict(value, ("/Length",))
+            buffer.write(b"/Length %d\n>>\nstream\n" % len(value._data))
+            buffer.write(value._data)
+            buffer.write(b"\nendstream")
+        elif isinstance(value, DictionaryObject):
+            write_dict(value, ())
+            buffer.write(b">>")
+        elif isinstance(value, ArrayObject):
+            buffer.write(b"[")
+            for item in value:
+                buffer.write(b" ")
+                write(item)
+            buffer.write(b" ]")
+        else:
+            value.write_to_stream(buffer)
+
+    if is_page:
+        assert isinstance(obj, DictionaryObject)
+        write_dict(obj, EXCLUDED_PAGE_KEYS)
+        NameObject("/Parent").write_to_stream(buffer)
+        buffer.write(b" ")
+        write_ref(PAGE_TREE_REF)
+        buffer.write(b"\n>>")
+    else:
+        write(obj)
+    chunks.append(buffer.getvalue())
+    return ObjectTemplate(chunks, refs)
+
+
+class StreamingPdfWriter:
+    """
+    Write pages to an output stream as soon as they are added.
+
+    close() must be called to write the page tree and the trailer.
+    The output stream does not need to be seekable.
+    """
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        deduplicate: bool = False,
+        *,
+        position: int = 0,
+        first_number: int = 1,
+    ) -> None:
+        """
+        Start writing at the given position in a file,
+        numbering the new objects from first_number.
+        The PDF header is only written at the start of the file.
+        """
+        self.stream = stream
+        self.position = position
+        # Offset of each object from first_number, 0 if not written yet
+        self._first_number = first_number
+        self._offsets = array("Q")
+        self._kids = array("Q")  # page object numbers
+        # Object number of each object written, by hash of its content
+        self._hashes: dict[bytes, int] | None = {} if deduplicate else None
+        if position == 0:
+            self._write(_HEADER)
+        self.page_tree_number = self._new_number()
+
+    @property
+    def page_count(self) -> int:
+        return len(self._kids)
+
+    def write_objects(
+        self, objects: Iterable[PageObjects], numbers: dict[Ref, int]
+    ) -> None:
+        """
+        Write serialized pages and objects.
+
+        numbers maps the references of a document to the object numbers
+        assigned in the output, and is updated with the new objects.
+        """
+        if self._hashes is not None:
+            self._write_deduplicated(objects, numbers, self._hashes)
+            return
+        for ref, template, is_page in objects:
+            if is_page:
+                self._write_page(ref, template, numbers)
+            elif not self._is_written(numbers, ref):
+                number = numbers.get(ref) or self._assign(numbers, ref)
+                self._write_object(number, self._body(template, numbers))
+
+    def _write_deduplicated(
+        self,
+        objects: Iterable[PageObjects],
+        numbers: dict[Ref, int],
+        hashes: dict[bytes, int],
+    ) -> None:
+        """
+        Write objects identical to an object already written only once.
+
+        Objects are written after the objects they use, so that their
+        content, including the numbers of the objects they use,
+        is known when they are hashed.
+        """
+        pages: list[PageObjects] = []
+        templates: dict[Ref, ObjectTemplate] = {}
+        for page_object in objects:
+            if page_object.is_page:
+                pages.append(page_object)
+            elif not self._is_written(numbers, page_object.ref):
+                templates[page_object.ref] = page_object.template
+        while templates:
+            # Depth-first traversal, writing objects in post-order
+            root = next(iter(templates))
+            stack = [(root, templates.pop(root), 0)]
+            while stack:
+                ref, template, index = stack[-1]
+                for child in template.refs[index:]:
+                    index += 1
+                    if child in templates:
+                        stack[-1] = (ref, template, index)
+                        stack.append((child, templates.pop(child), 0))
+                        break
+                else:
+                    stack.pop()
+                    body = self._body(template, numbers)
+                    number = numbers.get(ref)
+                    if number is None:
+                        digest = hashlib.sha256(body).digest()
+                        number = hashes.get(digest)
+                        if number is not None:  # identical object written
+                            numbers[ref] = number
+                            continue
+                        number = numbers[ref] = hashes[digest] = (
+                            self._new_number()
+                        )
+                    # else: part of a reference cycle, not deduplicated
+                    self._write_object(number, body)
+        for ref, template, _is_page in pages:
+            self._write_page(ref, template, numbers)
+
+    def _write_page(
+        self, ref: Ref, template: ObjectTemplate, numbers: dict[Ref, int]
+    ) -> None:
+        number = numbers.get(ref)
+        if number is None or self._offset(number):
+            # The same page can be added again
+            number = numbers[ref] = self._new_number()
+        self._write_object(number, self._body(template, numbers))
+        self._kids.append(number)
+
+    def _body(
+        self, template: ObjectTemplate, numbers: dict[Ref, int]
+    ) -> bytes:
+        body = [template.chunks[0]]
+        for child, chunk in zip(template.refs, template.chunks[1:]):
+            if child == PAGE_TREE_REF:
+                child_number = self.page_tree_number
+            else:
+                child_number = numbers.get(child) or self._assign(
+                    numbers, child
+                )
+            body.append(b"%d 0 R" % child_number)
+            body.append(chunk)
+        return b"".join(body)
+
+    def _is_written(self, numbers: dict[Ref, int], ref: Ref) -> bool:
+        number = numbers.get(ref)
+        return number is not None and self._offset(number) != 0
+
+    def close(self) -> None:
+        catalog_number = self._new_number()
+        self._write_object(self.page_tree_number, self._page_tree(b""))
+        self._write_object(
+            catalog_number,
+            b"<<\n/Type /Catalog\n/Pages %d 0 R\n>>" % self.page_tree_number,
+        )
+        xref_offset = self.position
+        self._write(b"xref\n0 %d\n" % self.size)
+        self._write(b"0000000000 65535 f \n")
+        self._write_xref_entries()
+        self._write(
+            b"trailer\n<<\n/Size %d\n/Root %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n"
+            % (self.size, catalog_number, xref_offset)
+        )
+
+    @property
+    def size(self) -> int:
+        """The highest object number written, plus one."""
+        return self._first_number + len(self._offsets)
+
+    def _page_tree(self, extra_entries: bytes) -> bytes:
+        kids = b" ".join(b"%d 0 R" % number for number in self._kids)
+        return b"<<\n/Type /Pages\n%s/Count %d\n/Kids [ %s ]\n>>" % (
+            extra_entries,
+            len(self._kids),
+            kids,
+        )
+
+    def _write_xref_entries(self) -> None:
+        """Write the xref table entries of the objects written."""
+        for offset in self._offsets:
+            if offset:
+                self._write(b"%010d 00000 n \n" % offset)
+            else:  # referenced, but missing from the input
+                self._write(b"0000000000 00000 f \n")
+
+    def _assign(self, numbers: dict[Ref, int], ref: Ref) -> int:
+        number = numbers[ref] = self._new_number()
+        return number
+
+    def _new_number(self) -> int:
+        self._offsets.append(0)
+        return self.size - 1
+
+    def _offset(self, number: int) -> int:
+        return self._offsets[number - self._first_number]
+
+    def _write_object(self, number: int, body: bytes) -> None:
+        self._offsets[number - self._first_number] = self.position
+        # Written apart, not to copy the bodies holding large streams
+        self._write(b"%d 0 obj\n" % number)
+        self._write(body)
+        self._write(b"\nendobj\n")
+
+    def _write(self, data: bytes) -> None:
+        self.stream.write(data)
+        self.position += len(data)
+
+
+class IncrementalUpdate:
+    """
+    The state of a PDF file being updated incrementally: objects are
+    appended to the file, followed by a new xref section listing them
+    and referring to the previous one. The rest of the file is untouched.
+    """
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        """Read the PDF file to update, given opened for reading & writing."""
+        self.stream = stream
+        self.reader = PdfReader(stream)
+        if self.reader.is_encrypted:
+            raise ValueError("an encrypted PDF cannot be updated")
+        trailer = self.reader.trailer
+        self.size = int(trailer["/Size"])  # type: ignore[call-overload]
+        self._trailer_entries = b"".join(
+            key.encode()
+            + b" "
+            + _fill_refs(serialize(trailer.raw_get(key), _ref))
+            + b"\n"
+            for key in ("/Root", "/Info", "/ID")
+            if key in trailer
+        )
+        self._prev, self._xref_stream = _last_xref(stream)
+        self.initial_size = stream.seek(0, 2)
+        stream.seek(-1, 2)
+        # Written before the update, if the file does not end with a newline
+        self._separator = b"" if stream.read(1) in b"\r\n" else b"\n"
+
+    def start(self) -> int:
+        """Start writing the update, and return the position reached."""
+        self.stream.seek(self.initial_size)
+        self.stream.write(self._separator)
+        return self.initial_size + len(self._separator)
+
+    def replace_objects(self, objects: Iterable[tuple[Ref, PdfObject]]) -> int:
+        """
+        Write new versions of objects of the file, keeping their references
+        to other objects, and the xref section listing them.
+
+        Returns the number of bytes written, nothing being written
+        if there are no objects.
+        """
+        position = 0
+        entries: list[tuple[int, int, int]] = []
+        for (number, generation), obj in objects:
+            if not entries:
+                position = self.start()
+            body = _fill_refs(serialize(obj, _ref))
+            data = b"%d %d obj\n%s\nendobj\n" % (number, generation, body)
+            self.stream.write(data)
+            entries.append((number, position, generation))
+            position += len(data)
+        if not entries:
+            return 0
+        xref_section = self.xref_section(position, entries, self.size)
+        self.stream.write(xref_section)
+        return position + len(xref_section) - self.initial_size
+
+    def xref_section(
+        self, position: int, entries: Iterable[tuple[int, int, int]], size: int
+    ) -> bytes:
+        """
+        Return the xref section of the update, and its trailer,
+        to be written at position.
+
+        entries are the object number, offset & generation of the objects
+        written, an offset of 0 marking a free object. size is the highest
+        object number, plus one.
+        The xref section is a stream if the previous one is a stream.
+        """
+        if self._xref_stream:
+            return self._xref_stream_section(position, list(entries), size)
+        lines = [b"xref\n0 1\n0000000000 65535 f \n"]
+        for subsection in _subsections(entries):
+            lines.append(b"%d %d\n" % (subsection[0][0], len(subsection)))
+            lines.extend(
+                (
+                    b"%010d %05d n \n" % (offset, generation)
+                    if offset
+                    else b"0000000000 00000 f \n"
+                )
+                for _number, offset, generation in subsection
+            )
+        lines.append(
+            b"trailer\n<<\n/Size %d\n%s/Prev %d\n>>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, self._trailer_entries, self._prev, position)
+        )
+        return b"".join(lines)
+
+    def _xref_stream_section(
+        self, position: int, entries: list[tuple[int, int, int]], size: int
+    ) -> bytes:
+        """Return the xref section as a stream, being object number size."""
+        xref_number = size
+        entries.append((xref_number, position, 0))
+        width = max(1, (position.bit_length() + 7) // 8)
+        subsections = _subsections(entries)
+        index = b" ".join(
+            b"%d %d" % (subsection[0][0], len(subsection))
+            for subsection in subsections
+        )
+        data = b"".join(
+            (b"\x01" if offset else b"\x00")
+            + offset.to_bytes(width, "big")
+            + generation.to_bytes(2, "big")
+            for subsection in subsections
+            for _number, offset, generation in subsection
+        )
+        return (
+            b"%d 0 obj\n<<\n/Type /XRef\n/Size %d\n/Index [ %s ]\n"
+            b"/W [ 1 %d 2 ]\n%s/Prev %d\n/Length %d\n>>\nstream\n%s\n"
+            b"endstream\nendobj\nstartxref\n%d\n%%%%EOF\n"
+            % (
+                xref_number,
+                size + 1,
+                index,
+                width,
+                self._trailer_entries,
+                self._prev,
+                len(data),
+                data,
+                position,
+            )
+        )
+
+    def abort(self) -> None:
+        """Remove what was written, leaving the file as it was."""
+        self.stream.truncate(self.initial_size)
+
+
+class IncrementalPdfWriter(StreamingPdfWriter):
+    """
+    Append pages to an existing PDF file, as an incremental update.
+
+    Only the new objects, a page tree node holding the new pages,
+    the updated root of the page tree and a new xref section are written,
+    at the end of the file. The rest of the file is left untouched.
+    """
+
+    def __init__(self, stream: IO[bytes], deduplicate: bool = False) -> None:
+        """Open the PDF file to update, given opened for reading & writing."""
+        self.update = IncrementalUpdate(stream)
+        catalog = self.update.reader.trailer["/Root"].get_object()
+        assert isinstance(catalog, DictionaryObject)
+        page_tree_reference = catalog.raw_get("/Pages")
+        if not isinstance(page_tree_reference, IndirectObject):
+            raise ValueError("the page tree of the PDF is not an object")
+        self._root_ref = _ref(page_tree_reference)
+        page_tree = page_tree_reference.get_object()
+        assert isinstance(page_tree, DictionaryObject)
+        self._root_count = int(page_tree.get("/Count", 0))
+        # Entries of the root of the page tree, but its kids & count
+        self._root_entries = _fill_refs(
+            serialize(
+                DictionaryObject(
+                    {
+                        key: page_tree.raw_get(key)
+                        for key in page_tree
+                        if key not in {"/Kids", "/Count"}
+                    }
+                ),
+                _ref,
+            )
+        )[: -len(b">>")]
+        self._root_kids = b" ".join(
+            b"%d %d R" % _ref(kid)
+            for kid in page_tree.get("/Kids", [])
+            if isinstance(kid, IndirectObject)
+        )
+        super().__init__(
+            stream,
+            deduplicate,
+            position=self.update.start(),
+            first_number=self.update.size,
+        )
+
+    def close(self) -> None:
+        root_number, root_generation = self._root_ref
+        self._write_object(
+            self.page_tree_number,
+            self._page_tree(b"/Parent %d %d R\n" % self._root_ref),
+        )
+        root_offset = self.position
+        self._write(
+            b"%d %d obj\n%s/Count %d\n/Kids [ %s %d 0 R ]\n>>\nendobj\n"
+            % (
+                root_number,
+                root_generation,
+                self._root_entries,
+                self._root_count + self.page_count,
+                self._root_kids,
+                self.page_tree_number,
+            )
+        )
+        entries = [(root_number, root_offset, root_generation)]
+        entries += [
+            (number, offset, 0)
+            for number, offset in enumerate(self._offsets, self._first_number)
+        ]
+        self._write(
+            self.update.xref_section(self.position, entries, self.size)
+        )
+
+    def abort(self) -> None:
+        """Remove what was written, leaving the file as it was."""
+        self.update.abort()
+
+
+def _fill_refs(template: ObjectTemplate) -> bytes:
+    """Join a template, keeping the references of the input document."""
+    body = [template.chunks[0]]
+    for ref, chunk in zip(template.refs, template.chunks[1:]):
+        body.append(b"%d %d R" % ref)
+        body.append(chunk)
+    return b"".join(body)
+
+
+def _subsections(
+    entries: Iterable[tuple[int, int, int]],
+) -> list[list[tuple[int, int, int]]]:
+    """Group xref entries into runs of consecutive object numbers."""
+    subsections: list[list[tuple[int, int, int]]] = []
+    for entry in sorted(entries):
+        if subsections and subsections[-1][-1][0] + 1 == entry[0]:
+            subsections[-1].append(entry)
+        else:
+            subsections.append([entry])
+    return subsections
+
+
+def _last_xref(stream: IO[bytes]) -> tuple[int, bool]:
+    """
+    Return the offset of the last xref section of a PDF file,
+    and whether it is an xref stream.
+    """
+    size = stream.seek(0, 2)
+    stream.seek(max(0, size - 1024))
+    tail = stream.read()
+    index = tail.rfind(b"startxref")
+    if index < 0:
+        raise ValueError("startxref not found at the end of the PDF")
+    offset = int(tail[index + len(b"startxref") :].split()[0])
+    stream.seek(offset)
+    return offset, not stream.read(4).startswith(b"xref")
+
+
+def _ref(reference: IndirectObject | None) -> Ref:
+    assert reference is not None
+    return reference.idnum, reference.generation
@@ -0,0 +1,255 @@
+"""
+Asynchronous versions of the pdfly.api functions.
+
+The operations are CPU-bound, so they run in a shared pool of processes
+instead of blocking the event loop. The number of operations submitted to
+the pool is bounded: once the limit is reached, callers wait for a slot
+before their operation is submitted, which applies backpressure to the
+producers of work instead of queuing an unbounded amount of documents.
+
+Documents given as streams or PdfReader instances are read into bytes
+before being sent to the pool, and results always hold the resulting PDF
+as bytes in their data attribute.
+
+Cancelling a call, or reaching its timeout, cancels the operation if it
+has not started yet. An operation already running in a worker process is
+left to complete, its result is discarded, and its slot is only released
+at that point, so that the bound on the pool load always holds.
+
+Example:
+    from pdfly import aio
+
+    aio.configure(max_workers=4, max_pending=16)
+    result = await aio.compress(upload, timeout=30)
+    ...
+    aio.shutdown()
+
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, TypeVar
+
+from pypdf import PdfReader
+
+from pdfly import api
+from pdfly.api import CompressResult, Source, WriteResult, X2PdfResult
+from pdfly.metadata import MetaInfo
+from pdfly.pagemeta import PageMeta
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_max_workers: int | None = None
+_max_pending: int | None = None
+_pool: ProcessPoolExecutor | None = None
+# asyncio semaphores can only be used from a single event loop,
+# so each event loop gets its own bound on the submitted operations.
+_slots: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, asyncio.Semaphore
+] = weakref.WeakKeyDictionary()
+
+
+def configure(
+    max_workers: int | None = None, max_pending: int | None = None
+) -> None:
+    """
+    Set the size of the shared pool, and the bound on submitted operations.
+
+    max_workers defaults to the number of CPUs, and max_pending to twice
+    max_workers, so that workers never wait for the event loop.
+    Must be called before the first operation, or after shutdown().
+    """
+    global _max_workers, _max_pending
+    if max_workers is not None and max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    if max_pending is not None and max_pending < 1:
+        raise ValueError("max_pending must be at least 1")
+    with _lock:
+        if _pool is not None:
+            raise RuntimeError("The pdfly process pool is already running")
+        _max_workers = max_workers
+        _max_pending = max_pending
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the shared pool, cancelling the operations not started yet."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+        _slots.clear()
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+async def cat(
+    inputs: Sequence[Source | tuple[Source, str]],
+    password: str | None = None,
+    timeout: float | None = None,
+) -> WriteResult:
+    """Asynchronous version of pdfly.api.cat()."""
+    items = [
+        (
+            (_to_picklable(item[0]), item[1])
+            if isinstance(item, tuple)
+            else _to_picklable(item)
+        )
+        for item in inputs
+    ]
+    return await _run(timeout, api.cat, items, None, password)
+
+
+async def rm(
+    source: Source,
+    page_ranges: Sequence[str],
+    password: str | None = None,
+    timeout: float | None = None,
+) -> WriteResult:
+    """Asynchronous version of pdfly.api.rm()."""
+    return await _run(
+        timeout,
+        api.rm,
+        _to_picklable(source),
+        list(page_ranges),
+        None,
+        password,
+    )
+
+
+async def rotate(
+    source: Source,
+    degrees: int,
+    page_range: str = ":",
+    password: str | None = None,
+    timeout: float | None = None,
+) -> WriteResult:
+    """Asynchronous version of pdfly.api.rotate()."""
+    return await _run(
+        timeout,
+        api.rotate,
+        _to_picklable(source),
+        degrees,
+        page_range,
+        None,
+        password,
+    )
+
+
+async def compress(
+    source: Source,
+    password: str | None = None,
+    timeout: float | None = None,
+) -> CompressResult:
+    """Asynchronous version of pdfly.api.compress()."""
+    return await _run(
+        timeout, api.compress, _to_picklable(source), None, password
+    )
+
+
+async def uncompress(
+    source: Source,
+    password: str | None = None,
+    timeout: float | None = None,
+) -> WriteResult:
+    """Asynchronous version of pdfly.api.uncompress()."""
+    return await _run(
+        timeout, api.uncompress, _to_picklable(source), None, password
+    )
+
+
+async def x2pdf(
+    sources: Sequence[bytes | BinaryIO | Path],
+    timeout: float | None = None,
+) -> X2PdfResult:
+    """Asynchronous version of pdfly.api.x2pdf()."""
+    items = [
+        source if isinstance(source, (bytes, Path)) else source.read()
+        for source in sources
+    ]
+    return await _run(timeout, api.x2pdf, items)
+
+
+async def meta(
+    source: Source,
+    password: str | None = None,
+    timeout: float | None = None,
+) -> MetaInfo:
+    """Asynchronous version of pdfly.api.meta()."""
+    return await _run(timeout, api.meta, _to_picklable(source), password)
+
+
+async def pagemeta(
+    source: Source,
+    page_index: int,
+    password: str | None = None,
+    timeout: float | None = None,
+) -> PageMeta:
+    """Asynchronous version of pdfly.api.pagemeta()."""
+    return await _run(
+        timeout, api.pagemeta, _to_picklable(source), page_index, password
+    )
+
+
+async def sign(
+    source: Source,
+    p12: bytes,
+    p12_password: str | None = None,
+    timeout: float | None = None,
+) -> WriteResult:
+    """Asynchronous version of pdfly.api.sign()."""
+    return await _run(
+        timeout, api.sign, _to_picklable(source), p12, p12_password
+    )
+
+
+async def _run(
+    timeout: float | None, func: Callable[..., T], *args: object
+) -> T:
+    loop = asyncio.get_running_loop()
+    pool, slots = _get_pool(loop)
+    await slots.acquire()
+    try:
+        future = pool.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+
+    def release_slot(_future: object) -> None:
+        try:
+            loop.call_soon_threadsafe(slots.release)
+        except RuntimeError:  # the event loop is closed
+            pass
+
+    # The slot is held until the operation has really completed,
+    # even if the caller stopped waiting for it.
+    future.add_done_callback(release_slot)
+    # Cancelling the wrapping future cancels the pool future,
+    # which only succeeds if the operation has not started yet.
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+
+def _get_pool(
+    loop: asyncio.AbstractEventLoop,
+) -> tuple[ProcessPoolExecutor, asyncio.Semaphore]:
+    global _pool
+    with _lock:
+        max_workers = _max_workers or os.cpu_count() or 1
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+        if loop not in _slots:
+            _slots[loop] = asyncio.Semaphore(_max_pending or 2 * max_workers)
+        return _pool, _slots[loop]
+
+
+def _to_picklable(source: Source) -> bytes | Path:
+    if isinstance(source, (bytes, Path)):
+        return source
+    stream = source.stream if isinstance(source, PdfReader) else source
+    if stream.seekable():
+        stream.seek(0)
+    return stream.read()
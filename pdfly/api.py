@@ -0,0 +1,280 @@
+"""
+Functions performing pdfly operations without going through files.
+
+The inputs can be given as bytes, binary streams, PdfReader instances
+or paths. The resulting PDF is either written into a caller-supplied
+binary stream, or returned as bytes in the result object. Results are
+pydantic models, and nothing is printed.
+
+Example:
+    from pdfly import api
+
+    result = api.cat([upload, (other_upload, "0:3")])
+    compressed = api.compress(result.data)
+    send(compressed.data)
+
+"""
+
+from collections.abc import Sequence
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Union
+
+from pydantic import BaseModel
+from pypdf import PageRange, PasswordType, PdfReader, PdfWriter
+
+from pdfly._selection import select_pages
+from pdfly.cat import add_reader_pages
+from pdfly.compress import compressed_writer
+from pdfly.metadata import MetaInfo, add_os_info, get_meta_info
+from pdfly.pagemeta import PageMeta, get_page_meta
+from pdfly.rotate import rotate_pages
+from pdfly.uncompress import uncompressed_writer
+
+Source = Union[bytes, BinaryIO, PdfReader, Path]
+
+
+class WriteResult(BaseModel):
+    pages: int
+    size: int  # in bytes
+    data: bytes | None = None  # set when no output stream was given
+    warnings: list[str] = []
+
+
+class CompressResult(WriteResult):
+    original_size: int | None = None  # in bytes, if it could be known
+    compressed: bool = True  # False if the original was kept
+
+
+class X2PdfResult(WriteResult):
+    errors: list[str] = []
+
+
+def cat(
+    inputs: Sequence[Source | tuple[Source, str]],
+    output: BinaryIO | None = None,
+    password: str | None = None,
+) -> WriteResult:
+    """
+    Concatenate the pages of several documents.
+
+    Each input is either a document, meaning all of its pages,
+    or a (document, page range) pair.
+    """
+    writer = PdfWriter()
+    warnings = []
+    for item in inputs:
+        source, page_range = item if isinstance(item, tuple) else (item, ":")
+        reader = _reader(source, password)
+        if not add_reader_pages(writer, reader, PageRange(page_range)):
+            warnings.append(f"Page range {page_range} is out of bounds")
+    size, data = _write(writer, output)
+    return WriteResult(
+        pages=len(writer.pages), size=size, data=data, warnings=warnings
+    )
+
+
+def rm(
+    source: Source,
+    page_ranges: Sequence[str],
+    output: BinaryIO | None = None,
+    password: str | None = None,
+) -> WriteResult:
+    """Remove the pages selected by any of the page ranges."""
+    reader = _reader(source, password)
+    page_nums, _in_bounds = select_pages(
+        len(reader.pages),
+        [PageRange(page_range) for page_range in page_ranges],
+        inverted_page_selection=True,
+    )
+    writer = PdfWriter()
+    for page_num in page_nums:
+        writer.add_page(reader.pages[page_num])
+    size, data = _write(writer, output)
+    return WriteResult(pages=len(writer.pages), size=size, data=data)
+
+
+def rotate(
+    source: Source,
+    degrees: int,
+    page_range: str = ":",
+    output: BinaryIO | None = None,
+    password: str | None = None,
+) -> WriteResult:
+    """Rotate the pages selected by the page range, clockwise."""
+    reader = _reader(source, password)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    rotate_pages(writer, degrees, page_range)
+    size, data = _write(writer, output)
+    return WriteResult(pages=len(writer.pages), size=size, data=data)
+
+
+def compress(
+    source: Source,
+    output: BinaryIO | None = None,
+    password: str | None = None,
+) -> CompressResult:
+    """
+    Compress the content streams of all pages.
+
+    Like pdfly compress, the original document is kept
+    if the compressed one would be larger and the original bytes are known.
+    """
+    reader = _reader(source, password)
+    buffer = BytesIO()
+    compressed_writer(reader).write(buffer)
+    original = _original_bytes(source)
+    if original is not None and len(original) <= buffer.tell():
+        compressed, pdf_bytes = False, original
+    else:
+        compressed, pdf_bytes = True, buffer.getvalue()
+    size, data = _write_bytes(pdf_bytes, output)
+    return CompressResult(
+        pages=len(reader.pages),
+        size=size,
+        data=data,
+        original_size=len(original) if original is not None else None,
+        compressed=compressed,
+    )
+
+
+def uncompress(
+    source: Source,
+    output: BinaryIO | None = None,
+    password: str | None = None,
+) -> WriteResult:
+    """Decompress the content streams of all pages."""
+    writer = uncompressed_writer(_reader(source, password))
+    size, data = _write(writer, output)
+    return WriteResult(pages=len(writer.pages), size=size, data=data)
+
+
+def x2pdf(
+    sources: Sequence[bytes | BinaryIO | Path],
+    output: BinaryIO | None = None,
+) -> X2PdfResult:
+    """
+    Convert PDF documents and images into a single PDF, one page per image.
+
+    Inputs that cannot be converted are reported in the result errors.
+    """
+    from pdfly.x2pdf import insert_image, insert_pdf
+
+    writer = PdfWriter()
+    errors = []
+    for index, source in enumerate(sources):
+        stream = BytesIO(source) if isinstance(source, bytes) else source
+        try:
+            if _is_pdf(stream):
+                insert_pdf(writer, stream)
+            else:
+                insert_image(writer, stream)
+        except Exception as error:
+            errors.append(f"Input {index}: {error}")
+    size, data = _write(writer, output)
+    return X2PdfResult(
+        pages=len(writer.pages), size=size, data=data, errors=errors
+    )
+
+
+def meta(source: Source, password: str | None = None) -> MetaInfo:
+    """
+    Return the metadata of a document.
+
+    The operating system information is only set for paths.
+    """
+    info = get_meta_info(_reader(source, password))
+    if isinstance(source, Path):
+        add_os_info(info, source)
+    return info
+
+
+def pagemeta(
+    source: Source, page_index: int, password: str | None = None
+) -> PageMeta:
+    """Return the details of a single page."""
+    return get_page_meta(_reader(source, password).pages[page_index])
+
+
+def sign(
+    source: Source,
+    p12: bytes,
+    p12_password: str | None = None,
+    output: BinaryIO | None = None,
+) -> WriteResult:
+    """Sign a document with a PKCS12 certificate archive."""
+    import typer
+
+    from pdfly.sign import _sign_pdf_contents, pdf_is_unsigned_or_raise
+
+    reader = _reader(source)
+    try:
+        pdf_is_unsigned_or_raise(reader)
+    except typer.BadParameter as error:
+        raise ValueError(error.message) from error
+    buffer = BytesIO()
+    _sign_pdf_contents(reader, buffer, p12, p12_password)
+    size, data = _write_bytes(buffer.getvalue(), output)
+    return WriteResult(pages=len(reader.pages), size=size, data=data)
+
+
+def _reader(source: Source, password: str | None = None) -> PdfReader:
+    if isinstance(source, PdfReader):
+        reader = source
+    elif isinstance(source, bytes):
+        reader = PdfReader(BytesIO(source))
+    else:
+        reader = PdfReader(source)
+    if (
+        password is not None
+        and reader.is_encrypted
+        and reader.decrypt(password) == PasswordType.NOT_DECRYPTED
+    ):
+        raise ValueError("The decrypting password provided is invalid")
+    return reader
+
+
+def _original_bytes(source: Source) -> bytes | None:
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, Path):
+        return source.read_bytes()
+    stream = source.stream if isinstance(source, PdfReader) else source
+    if not stream.seekable():
+        return None
+    stream.seek(0)
+    return stream.read()
+
+
+def _is_pdf(stream: BinaryIO | Path) -> bool:
+    if isinstance(stream, Path):
+        return stream.name.endswith(".pdf")
+    position = stream.tell()
+    is_pdf = stream.read(5) == b"%PDF-"
+    stream.seek(position)
+    return is_pdf
+
+
+def _write(
+    writer: PdfWriter, output: BinaryIO | None
+) -> tuple[int, bytes | None]:
+    """Write a document, returning its size, and its bytes if no output."""
+    # The writer stores absolute offsets in the cross-reference table,
+    # so it can only write directly at the start of a seekable stream.
+    if output is not None and output.seekable() and output.tell() == 0:
+        writer.write(output)
+        return output.tell(), None
+    buffer = BytesIO()
+    writer.write(buffer)
+    return _write_bytes(buffer.getvalue(), output)
+
+
+def _write_bytes(
+    data: bytes, output: BinaryIO | None
+) -> tuple[int, bytes | None]:
+    if output is None:
+        return len(data), data
+    output.write(data)
+    return len(data), None
@@ -0,0 +1,249 @@
+"""
+Run many operations, listed in a JSON Lines manifest, in a pool of processes.
+
+Each line of the manifest describes one job: the name of a pdfly command,
+and the arguments of the main() function of its module, e.g.
+
+    {"id": "a", "command": "compress", "args": {"pdf": "a.pdf", "output": "b.pdf"}}
+    {"command": "rotate", "args": {"filename": "c.pdf", "output": "d.pdf", "degrees": 90, "page_range": ":"}}
+    {"command": "cat", "args": {"filename": "e.pdf", "fn_pgrgs": ["0:3"], "output": "f.pdf"}}
+
+Jobs with the largest input files are started first.
+For each job, a JSON line giving its status, duration in seconds,
+output size in bytes and captured standard output & error
+is written as soon as it completes.
+
+Examples
+    pdfly batch jobs.jsonl --jobs 8 -o results.jsonl
+
+        Run the jobs of jobs.jsonl on 8 processes.
+
+"""
+
+import contextlib
+import inspect
+import io
+import json
+import sys
+import time
+import traceback
+import types
+import typing
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from enum import Enum
+from importlib import import_module
+from pathlib import Path
+from typing import IO, Any
+
+# Maps command names to their module and to the name of the argument
+# of their main() function giving the output file, if any.
+COMMANDS: dict[str, tuple[str, str | None]] = {
+    "2-up": ("pdfly.up2", "out"),
+    "booklet": ("pdfly.booklet", "output"),
+    "cat": ("pdfly.cat", "output"),
+    "check-sign": ("pdfly.check_sign", None),
+    "compress": ("pdfly.compress", "output"),
+    "extract-annotated-pages": ("pdfly.extract_annotated_pages", "output_pdf"),
+    "extract-images": ("pdfly.extract_images", None),
+    "meta": ("pdfly.metadata", None),
+    "pagemeta": ("pdfly.pagemeta", None),
+    "rm": ("pdfly.rm", "output"),
+    "rotate": ("pdfly.rotate", "output"),
+    "sign": ("pdfly.sign", "output"),
+    "uncompress": ("pdfly.uncompress", "output"),
+    "update-offsets": ("pdfly.update_offsets", "file_out"),
+    "x2pdf": ("pdfly.x2pdf", "out_filepath"),
+}
+
+
+class Job(typing.NamedTuple):
+    id: Any
+    command: str
+    args: dict[str, Any]
+
+
+def main(manifest: Path, jobs: int, output: Path | None) -> int:
+    """Run all the jobs of the manifest, and return the number of failures."""
+    with _open_text(manifest, "r") as manifest_fh:
+        entries = list(parse_manifest(manifest_fh))
+    valid_jobs = [entry for entry in entries if isinstance(entry, Job)]
+    valid_jobs.sort(key=input_size, reverse=True)
+    failures = 0
+    with _open_text(output, "w") as results_fh:
+
+        def emit(result: dict[str, Any]) -> None:
+            nonlocal failures
+            if result["status"] != "ok":
+                failures += 1
+            results_fh.write(json.dumps(result) + "\n")
+            results_fh.flush()
+
+        for entry in entries:
+            if not isinstance(entry, Job):
+                emit(entry)
+        if jobs == 1:
+            for job in valid_jobs:
+                emit(run_job(job))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = {
+                    executor.submit(run_job, job): job for job in valid_jobs
+                }
+                for future in as_completed(futures):
+                    emit(job_result(future, futures[future]))
+    return failures
+
+
+def job_result(future: Future[dict[str, Any]], job: Job) -> dict[str, Any]:
+    """Return the result of a job run by a worker, even if the worker died."""
+    try:
+        return future.result()
+    except Exception as error:  # e.g. BrokenProcessPool
+        return {
+            "id": job.id,
+            "command": job.command,
+            "status": "error",
+            "error": "".join(
+                traceback.format_exception_only(type(error), error)
+            ).strip(),
+        }
+
+
+def parse_manifest(
+    lines: typing.Iterable[str],
+) -> Iterator[Job | dict[str, Any]]:
+    """Yield a Job for each valid line, or an error result for invalid ones."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        job_id: Any = line_number
+        try:
+            entry = json.loads(line)
+            if not isinstance(entry, dict):
+                raise ValueError("a job must be a JSON object")
+            job_id = entry.get("id", line_number)
+            command = entry["command"]
+            if command not in COMMANDS:
+                raise ValueError(f"unknown command: {command}")
+            args = entry.get("args", {})
+            if not isinstance(args, dict):
+                raise ValueError("args must be a JSON object")
+        except (KeyError, ValueError) as error:
+            yield {
+                "id": job_id,
+                "status": "error",
+                "error": f"Invalid job on line {line_number}: {error!r}",
+            }
+            continue
+        yield Job(job_id, command, args)
+
+
+def input_size(job: Job) -> int:
+    """Return the total size of the input files of a job."""
+    _module_name, output_arg = COMMANDS[job.command]
+    size = 0
+    for name, value in job.args.items():
+        if name == output_arg:
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str):
+                try:
+                    size += Path(item).stat().st_size
+                except (OSError, ValueError):
+                    pass
+    return size
+
+
+def run_job(job: Job) -> dict[str, Any]:
+    """Run a job, and describe its outcome as a JSON-serializable dict."""
+    module_name, output_arg = COMMANDS[job.command]
+    result: dict[str, Any] = {"id": job.id, "command": job.command}
+    stdout, stderr = io.StringIO(), io.StringIO()
+    start = time.perf_counter()
+    try:
+        main_func = import_module(module_name).main
+        kwargs = convert_args(main_func, job.args)
+        with (
+            contextlib.redirect_stdout(stdout),
+            contextlib.redirect_stderr(stderr),
+        ):
+            exit_code = main_func(**kwargs)
+        if exit_code:  # x2pdf returns an exit code
+            raise SystemExit(exit_code)
+        result["status"] = "ok"
+    except SystemExit as error:
+        result["status"] = "ok" if error.code in (None, 0) else "error"
+        if result["status"] == "error":
+            result["error"] = f"exited with code {error.code}"
+    except Exception as error:
+        result["status"] = "error"
+        result["error"] = "".join(
+            traceback.format_exception_only(type(error), error)
+        ).strip()
+    result["duration"] = round(time.perf_counter() - start, 6)
+    output = job.args.get(output_arg) if output_arg else None
+    if isinstance(output, str) and Path(output).is_file():
+        result["output_size"] = Path(output).stat().st_size
+    else:
+        result["output_size"] = None
+    result["stdout"] = stdout.getvalue()
+    result["stderr"] = stderr.getvalue()
+    return result
+
+
+def convert_args(
+    main_func: Callable[..., object], args: dict[str, Any]
+) -> dict[str, Any]:
+    """
+    Convert JSON values to the types expected by a main() function.
+
+    Missing optional and boolean arguments default to None and False.
+    """
+    hints = typing.get_type_hints(main_func)
+    kwargs = {}
+    for name, param in inspect.signature(main_func).parameters.items():
+        hint = hints.get(name)
+        if name in args:
+            kwargs[name] = _convert(args[name], hint)
+        elif param.default is inspect.Parameter.empty:
+            if hint is bool:
+                kwargs[name] = False
+            elif type(None) in typing.get_args(hint):
+                kwargs[name] = None
+            else:
+                raise TypeError(f"missing argument: {name}")
+    unknown_args = set(args) - set(kwargs)
+    if unknown_args:
+        raise TypeError(
+            f"unknown arguments: {', '.join(sorted(unknown_args))}"
+        )
+    return kwargs
+
+
+def _convert(value: object, hint: object) -> object:
+    if value is None:
+        return None
+    origin = typing.get_origin(hint)
+    if origin in (typing.Union, types.UnionType):
+        non_none = [
+            arg for arg in typing.get_args(hint) if arg is not type(None)
+        ]
+        return _convert(value, non_none[0]) if len(non_none) == 1 else value
+    if origin is list and isinstance(value, list):
+        (item_hint,) = typing.get_args(hint)
+        return [_convert(item, item_hint) for item in value]
+    if hint is Path:
+        return Path(str(value))
+    if isinstance(hint, type) and issubclass(hint, Enum):
+        return hint(value)
+    return value
+
+
+@contextlib.contextmanager
+def _open_text(path: Path | None, mode: str) -> Iterator[IO[str]]:
+    if path is None or str(path) == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+    else:
+        with open(path, mode, encoding="utf-8") as fh:
+            yield fh
@@ -48,96 +48,581 @@ Examples
 
 import os
 import sys
+from collections.abc import Generator, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
+from typing import IO, NoReturn
 
-from pypdf import (
-    PageRange,
-    PasswordType,
-    PdfReader,
-    PdfWriter,
-    parse_filename_page_ranges,
-)
+from pypdf import PageRange, PasswordType, PdfReader, PdfWriter
 from rich.console import Console
 
+from pdfly._prefetch import DEFAULT_MEMORY as DEFAULT_PREFETCH_MEMORY
+from pdfly._prefetch import Prefetcher
+from pdfly._prune import prune_removed_pages
+from pdfly._selection import (
+    PageSelection,
+    format_selection,
+    select_pages,
+    selected_by_all,
+)
+from pdfly._stats import count_written
+from pdfly._streaming import (
+    IncrementalPdfWriter,
+    PageObjects,
+    Ref,
+    StreamingPdfWriter,
+    iter_page_objects,
+)
+
+# Input files kept open at once, the other inputs are read into memory
+# or reopened when needed, so that default file descriptor limits are enough.
+DEFAULT_MAX_OPEN_FILES = 256
+
 
 def main(
-    filename: Path,
+    filename: Path | None,
     fn_pgrgs: list[str] | None,
     output: Path,
     verbose: bool,
+    *,
     inverted_page_selection: bool = False,
     password: str | None = None,
+    stream: bool = False,
+    jobs: int = 1,
+    dedup: bool = False,
+    from_list: Path | None = None,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    prefetch: int = 0,
+    prefetch_memory: int = DEFAULT_PREFETCH_MEMORY,
+    append: bool = False,
+    raw: bool = False,
 ) -> None:
     console = Console()
-    filename_page_ranges = parse_filepaths_and_pagerange_args(
-        console, filename, fn_pgrgs
+    if from_list is not None:
+        fn_pgrgs = [*(fn_pgrgs or []), *read_args_list(from_list)]
+    filename_page_ranges: Sequence[tuple[Path, PageSelection]]
+    if inverted_page_selection:
+        # The page ranges following a file are removed together
+        filename_page_ranges = parse_filepaths_and_pagerange_groups(
+            console, filename, fn_pgrgs
+        )
+    else:
+        filename_page_ranges = parse_filepaths_and_pagerange_args(
+            console, filename, fn_pgrgs
+        )
+    if not filename_page_ranges:
+        console.print("[red]Error: no input file provided")
+        sys.exit(2)
+    if append and any(
+        filepath.resolve() == output.resolve()
+        for filepath, _page_range in filename_page_ranges
+    ):
+        # Its pages would be appended again, after those already there
+        console.print(
+            f"[red]Error: the --append output {output} is also an input"
+        )
+        sys.exit(2)
+    filename = filename_page_ranges[0][0]
+    # Worker processes read their own files
+    prefetch_paths = (
+        [filepath for filepath, _page_range in filename_page_ranges]
+        if prefetch and jobs == 1
+        else []
     )
-    if output:
+    # Started once the output is open, and closed with it
+    prefetcher: Prefetcher | None = None
+    output_fh: IO[bytes]
+    if append:
+        output_fh = open(output, "r+b")
+    elif output:
         output_fh = open(output, "wb")
     else:
         sys.stdout.flush()
         output_fh = os.fdopen(sys.stdout.fileno(), "wb")
 
-    writer = PdfWriter()
-    in_fs = {}
-    try:
-        for filepath, page_range in filename_page_ranges:  # type: ignore
-            if verbose:
-                print(filepath, page_range, file=sys.stderr)
-            if filepath not in in_fs:
-                in_fs[filepath] = open(filepath, "rb")
-
-            reader = PdfReader(in_fs[filepath])
-            if (
-                password is not None
-                and reader.decrypt(password) == PasswordType.NOT_DECRYPTED
-            ):
-                console.print(
-                    "[red]Error: the decrypting password provided is invalid"
+    if append or stream or raw or jobs > 1:
+        streaming_writer: StreamingPdfWriter | None = None
+        completed = False
+        try:
+            if prefetch_paths:
+                prefetcher = Prefetcher(
+                    prefetch_paths, prefetch, prefetch_memory
                 )
-                sys.exit(1)
-            num_pages = len(reader.pages)
-            start, end, _step = page_range.indices(num_pages)
-            if (
-                start < 0
-                or end < 0
-                or start >= num_pages
-                or end > num_pages
-                or start > end
-            ):
-                print(
-                    f"WARNING: Page range {page_range} is out of bounds",
-                    file=sys.stderr,
+            if append:
+                streaming_writer = open_incremental_writer(
+                    output_fh, console, dedup
                 )
-            if inverted_page_selection:
-                all_page_nums = set(range(len(reader.pages)))
-                page_nums = set(range(*page_range.indices(len(reader.pages))))
-                inverted_page_nums = all_page_nums - page_nums
-                for page_num in inverted_page_nums:
-                    writer.add_page(reader.pages[page_num])
             else:
-                for page_num in range(*page_range.indices(len(reader.pages))):
-                    writer.add_page(reader.pages[page_num])
+                streaming_writer = StreamingPdfWriter(
+                    output_fh, deduplicate=dedup
+                )
+            start = streaming_writer.position
+            stream_pages(
+                streaming_writer,
+                filename_page_ranges,
+                console,
+                verbose=verbose,
+                inverted_page_selection=inverted_page_selection,
+                password=password,
+                jobs=jobs,
+                max_open_files=max_open_files,
+                prefetcher=prefetcher,
+                raw=raw,
+            )
+            streaming_writer.close()
+            completed = True
+            count_written(streaming_writer.position - start)
+        except Exception as error:
+            raise RuntimeError(f"Error while reading {filename}") from error
+        finally:
+            # Also on sys.exit() & KeyboardInterrupt, not caught above
+            if not completed and isinstance(
+                streaming_writer, IncrementalPdfWriter
+            ):
+                streaming_writer.abort()
+            output_fh.close()
+            if prefetcher is not None:
+                prefetcher.close()
+        return
+
+    writer = PdfWriter()
+    readers: dict[Path, PdfReader] = {}
+    try:
+        if prefetch_paths:
+            prefetcher = Prefetcher(prefetch_paths, prefetch, prefetch_memory)
+        add_pages(
+            writer,
+            filename_page_ranges,
+            readers,
+            console,
+            verbose=verbose,
+            inverted_page_selection=inverted_page_selection,
+            password=password,
+            max_open_files=max_open_files,
+            prefetcher=prefetcher,
+        )
+        if dedup:
+            writer.compress_identical_objects()
         writer.write(output_fh)
     except Exception as error:
         raise RuntimeError(f"Error while reading {filename}") from error
     finally:
         output_fh.close()
+        if prefetcher is not None:
+            prefetcher.close()
     # In 3.0, input files must stay open until output is written.
-    # Not closing the in_fs because this script exits now.
+    # Not closing the readers streams because this script exits now.
+
+
+def add_pages(
+    writer: PdfWriter,
+    filename_page_ranges: Sequence[tuple[Path, PageSelection]],
+    readers: dict[Path, PdfReader],
+    console: Console,
+    *,
+    verbose: bool = False,
+    inverted_page_selection: bool = False,
+    password: str | None = None,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    prefetcher: Prefetcher | None = None,
+) -> None:
+    """
+    Add the selected pages of the given files to a writer.
+
+    The input files are parsed once, into readers that are cached by path
+    and must stay open until the writer output is written.
+    Reusing a reader lets the writer copy the objects shared by
+    several page ranges of a file, like fonts & images, only once.
+    Beyond max_open_files readers, the files are read into memory.
+    With inverted_page_selection, the references to the pages removed
+    from a file are pruned, see prune_file().
+    """
+    for filepath, page_range in filename_page_ranges:
+        if verbose:
+            print(filepath, format_selection(page_range), file=sys.stderr)
+        if filepath not in readers:
+            readers[filepath] = open_reader(
+                filepath,
+                console,
+                password,
+                in_memory=len(readers) >= max_open_files,
+                prefetcher=prefetcher,
+            )
+            if inverted_page_selection:
+                prune_file(
+                    readers[filepath],
+                    filepath,
+                    [
+                        selection
+                        for other_filepath, selection in filename_page_ranges
+                        if other_filepath == filepath
+                    ],
+                )
+        reader = readers[filepath]
+        if not add_reader_pages(
+            writer, reader, page_range, inverted_page_selection
+        ):
+            print(
+                f"WARNING: Page range {format_selection(page_range)} is out of bounds",
+                file=sys.stderr,
+            )
+
+
+def stream_pages(
+    writer: StreamingPdfWriter,
+    filename_page_ranges: Sequence[tuple[Path, PageSelection]],
+    console: Console,
+    *,
+    verbose: bool = False,
+    inverted_page_selection: bool = False,
+    password: str | None = None,
+    jobs: int = 1,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    prefetcher: Prefetcher | None = None,
+    raw: bool = False,
+) -> None:
+    """
+    Write the selected pages of the given files as soon as they are read.
+    The writer must be closed afterwards.
+
+    Each input file is closed after its last page range,
+    so that memory usage does not grow with the number of inputs.
+    Beyond max_open_files files, the least recently used file is closed,
+    and reopened for its next page range.
+    With several jobs, the input files are parsed and their pages serialized
+    in worker processes, ahead of the page ranges being written.
+    With raw, the objects used by the pages are copied from the bytes
+    of the files, see iter_page_objects().
+    """
+    page_ranges: dict[Path, list[PageSelection]] = {}
+    last_uses: dict[Path, int] = {}
+    for index, (filepath, page_range) in enumerate(filename_page_ranges):
+        page_ranges.setdefault(filepath, []).append(page_range)
+        last_uses[filepath] = index
+    sources: dict[Path, Generator[tuple[Iterable[PageObjects], bool]]] = {}
+    numbers: dict[Path, dict[Ref, int]] = {}
+    serialized: dict[Path, set[Ref]] = {}
+    used: dict[Path, int] = {}  # page ranges already written
+    # Files parsed by the pool, in the order of their first page range
+    to_submit = iter(page_ranges)
+    submitted: dict[
+        Path, Future[list[tuple[list[PageObjects], bool]] | None]
+    ] = {}
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+
+    def open_source(
+        filepath: Path,
+    ) -> Generator[tuple[Iterable[PageObjects], bool]]:
+        if pool is None:
+            return read_file_pages(
+                filepath,
+                page_ranges[filepath][used.get(filepath, 0) :],
+                console,
+                inverted_page_selection=inverted_page_selection,
+                password=password,
+                serialized=serialized.setdefault(filepath, set()),
+                prefetcher=prefetcher,
+                raw=raw,
+            )
+        # Keep the workers busy with the next files
+        while filepath not in submitted or len(submitted) < 2 * jobs:
+            next_filepath = next(to_submit, None)
+            if next_filepath is None:
+                break
+            submitted[next_filepath] = pool.submit(
+                parse_file_pages,
+                next_filepath,
+                page_ranges[next_filepath],
+                inverted_page_selection,
+                password,
+                raw,
+            )
+        return receive_file_pages(submitted.pop(filepath), console)
+
+    try:
+        for index, (filepath, page_range) in enumerate(filename_page_ranges):
+            if verbose:
+                print(filepath, format_selection(page_range), file=sys.stderr)
+            if filepath in sources:  # now the most recently used
+                sources[filepath] = sources.pop(filepath)
+            else:
+                if pool is None and len(sources) >= max_open_files:
+                    sources.pop(next(iter(sources))).close()
+                sources[filepath] = open_source(filepath)
+            objects, in_bounds = next(sources[filepath])
+            if not in_bounds:
+                print(
+                    f"WARNING: Page range {format_selection(page_range)} is out of bounds",
+                    file=sys.stderr,
+                )
+            writer.write_objects(objects, numbers.setdefault(filepath, {}))
+            used[filepath] = used.get(filepath, 0) + 1
+            if last_uses[filepath] == index:
+                sources.pop(filepath).close()
+                for state in (numbers, serialized, used):
+                    state.pop(filepath, None)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def open_incremental_writer(
+    output_fh: IO[bytes], console: Console, dedup: bool = False
+) -> IncrementalPdfWriter:
+    try:
+        return IncrementalPdfWriter(output_fh, deduplicate=dedup)
+    except ValueError as error:
+        console.print(f"[red]Error: {error}")
+        sys.exit(1)
+
+
+def read_file_pages(
+    filepath: Path,
+    page_ranges: list[PageSelection],
+    console: Console,
+    *,
+    inverted_page_selection: bool = False,
+    password: str | None = None,
+    serialized: set[Ref] | None = None,
+    prefetcher: Prefetcher | None = None,
+    raw: bool = False,
+) -> Generator[tuple[Iterable[PageObjects], bool]]:
+    """
+    Open a file when its first page range is needed,
+    and close it when the generator is closed.
+    """
+    reader = open_reader(filepath, console, password, prefetcher=prefetcher)
+    try:
+        modified = (
+            prune_file(reader, filepath, page_ranges)
+            if inverted_page_selection
+            else set()
+        )
+        yield from iter_file_pages(
+            reader,
+            page_ranges,
+            inverted_page_selection,
+            serialized,
+            raw=raw,
+            modified=modified,
+        )
+    finally:
+        reader.stream.close()
+
+
+def parse_file_pages(
+    filepath: Path,
+    page_ranges: list[PageSelection],
+    inverted_page_selection: bool = False,
+    password: str | None = None,
+    raw: bool = False,
+) -> list[tuple[list[PageObjects], bool]] | None:
+    """
+    Serialize the pages of a file selected by each page range,
+    in a worker process. Returns None if the password is invalid.
+    """
+    with open(filepath, "rb") as stream:
+        reader = PdfReader(stream)
+        if not decrypt(reader, password):
+            return None
+        modified = (
+            prune_file(reader, filepath, page_ranges)
+            if inverted_page_selection
+            else set()
+        )
+        return [
+            (list(objects), in_bounds)
+            for objects, in_bounds in iter_file_pages(
+                reader,
+                page_ranges,
+                inverted_page_selection,
+                raw=raw,
+                modified=modified,
+            )
+        ]
+
+
+def receive_file_pages(
+    future: Future[list[tuple[list[PageObjects], bool]] | None],
+    console: Console,
+) -> Generator[tuple[Iterable[PageObjects], bool]]:
+    """Wait for the pages of a file parsed by parse_file_pages()."""
+    result = future.result()
+    if result is None:
+        exit_invalid_password(console)
+    yield from result
+
+
+def iter_file_pages(
+    reader: PdfReader,
+    page_ranges: list[PageSelection],
+    inverted_page_selection: bool = False,
+    serialized: set[Ref] | None = None,
+    *,
+    raw: bool = False,
+    modified: set[Ref] | None = None,
+) -> Iterator[tuple[Iterator[PageObjects], bool]]:
+    """
+    Serialize the pages selected by each page range of a file,
+    and whether the page range is in bounds.
+
+    The objects used by the pages of a page range are only serialized
+    if they were not used by the pages of a previous page range,
+    and are added to serialized.
+    Each iterator of objects must be consumed before the next one is read.
+    The objects modified in memory are not copied from the bytes of the file.
+    """
+    if serialized is None:
+        serialized = set()
+
+    def iter_new_objects(page_nums: list[int]) -> Iterator[PageObjects]:
+        for page_object in iter_page_objects(
+            reader,
+            page_nums,
+            serialized.__contains__,
+            raw=raw,
+            modified=modified or (),
+        ):
+            if not page_object.is_page:
+                serialized.add(page_object.ref)
+            yield page_object
+
+    for page_range in page_ranges:
+        page_nums, in_bounds = select_pages(
+            len(reader.pages), page_range, inverted_page_selection
+        )
+        yield iter_new_objects(page_nums), in_bounds
+
+
+def prune_file(
+    reader: PdfReader,
+    filepath: Path,
+    page_ranges: Sequence[PageSelection],
+) -> set[Ref]:
+    """
+    Prune the references to the pages of a file removed by all its page
+    ranges, like links to them, and report what was pruned to stderr.
+
+    Returns the objects of the file modified.
+    """
+    removed = selected_by_all(len(reader.pages), page_ranges)
+    result = prune_removed_pages(reader, removed)
+    if result.annotations or result.references:
+        print(
+            f"{filepath}: dropped {result.annotations} annotation(s) and "
+            f"{result.references} reference(s) to removed pages, "
+            f"reclaiming {result.size} bytes",
+            file=sys.stderr,
+        )
+    return result.modified
+
+
+def open_reader(
+    filepath: Path,
+    console: Console,
+    password: str | None = None,
+    in_memory: bool = False,
+    prefetcher: Prefetcher | None = None,
+) -> PdfReader:
+    """
+    Open a PDF file, exiting if the password is invalid.
+
+    If in_memory is True, the file is read and closed right away.
+    With a prefetcher, the file may have been read already.
+    """
+    prefetched = prefetcher.open(filepath) if prefetcher is not None else None
+    if prefetched is not None:
+        reader = PdfReader(prefetched)
+    else:
+        reader = PdfReader(filepath if in_memory else open(filepath, "rb"))
+    if not decrypt(reader, password):
+        exit_invalid_password(console)
+    return reader
+
+
+def decrypt(reader: PdfReader, password: str | None) -> bool:
+    """Decrypt a reader if a password is given, and return False if invalid."""
+    return (
+        password is None
+        or reader.decrypt(password) != PasswordType.NOT_DECRYPTED
+    )
+
+
+def exit_invalid_password(console: Console) -> NoReturn:
+    console.print("[red]Error: the decrypting password provided is invalid")
+    sys.exit(1)
+
+
+def add_reader_pages(
+    writer: PdfWriter,
+    reader: PdfReader,
+    page_range: PageSelection,
+    inverted_page_selection: bool = False,
+) -> bool:
+    """
+    Add the pages of a reader selected by a page range to a writer.
+
+    Returns False if a page range is out of bounds.
+    """
+    page_nums, in_bounds = select_pages(
+        len(reader.pages), page_range, inverted_page_selection
+    )
+    for page_num in page_nums:
+        writer.add_page(reader.pages[page_num])
+    return in_bounds
+
+
+def read_args_list(path: Path) -> list[str]:
+    """
+    Read filenames and page ranges from a file, or stdin if path is -.
+
+    Each non-empty line holds a filename or a page range,
+    like the arguments of the command line.
+    """
+    if str(path) == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    return [line for line in lines if line.strip()]
 
 
 def parse_filepaths_and_pagerange_args(
-    console: Console, filename: Path, fn_pgrgs: list[str] | None
+    console: Console, filename: Path | None, fn_pgrgs: list[str] | None
 ) -> list[tuple[Path, PageRange]]:
+    return [
+        (filepath, page_range)
+        for filepath, page_ranges in parse_filepaths_and_pagerange_groups(
+            console, filename, fn_pgrgs
+        )
+        for page_range in page_ranges
+    ]
+
+
+def parse_filepaths_and_pagerange_groups(
+    console: Console, filename: Path | None, fn_pgrgs: list[str] | None
+) -> list[tuple[Path, list[PageRange]]]:
+    """
+    Parse filenames, each followed by the page ranges referring to it.
+
+    A file named again starts a new group of page ranges.
+    """
     fn_pgrgs_l = list(fn_pgrgs) if fn_pgrgs else []
-    fn_pgrgs_l.insert(0, str(filename))
+    if filename is not None:
+        fn_pgrgs_l.insert(0, str(filename))
+    groups: list[tuple[str, list[PageRange]]] = []
+    for arg in fn_pgrgs_l:
+        if groups and PageRange.valid(arg):
+            groups[-1][1].append(PageRange(arg))
+        else:
+            groups.append((arg, []))
     filename_page_ranges, invalid_filepaths = [], []
-    for filepath, page_range in parse_filename_page_ranges(fn_pgrgs_l):  # type: ignore
+    for filepath, page_ranges in groups:
         if Path(filepath).is_file():
-            filename_page_ranges.append((Path(filepath), page_range))
+            filename_page_ranges.append(
+                (Path(filepath), page_ranges or [PageRange(":")])
+            )
         else:
-            invalid_filepaths.append(str(filepath))
+            invalid_filepaths.append(filepath)
     if invalid_filepaths:
         console.print(
             f"[red]Error: invalid file path or page range provided: {' '.join(invalid_filepaths)}"
@@ -15,10 +15,14 @@ from pathlib import Path
 import typer
 from endesive import pdf
 
+from pdfly._stats import count_read
+
 
 def main(filename: Path, pem: Path, verbose: bool | None) -> None:
     x509_certificates = [pem.read_bytes()]
-    results = pdf.verify(filename.read_bytes(), x509_certificates)
+    pdf_data = filename.read_bytes()
+    count_read(len(pdf_data))
+    results = pdf.verify(pdf_data, x509_certificates)
 
     if len(results) == 0:
         raise typer.BadParameter("Signature missing")
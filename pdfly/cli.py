@@ -2,36 +2,54 @@
 Define how the CLI should behave.
 
 Subcommands are added here.
+
+Subcommand modules are only imported when the corresponding command runs,
+so that e.g. ``pdfly --help`` or ``pdfly cat`` do not pay for importing
+the dependencies of ``pdfly sign`` or ``pdfly x2pdf``.
 """
 
+import ast
+import importlib.util
+import os
+import tokenize
+from importlib.metadata import version as package_version
 from pathlib import Path
 from typing import Annotated
 
 import typer
 
-import pdfly.booklet
-import pdfly.cat
-import pdfly.check_sign
-import pdfly.compress
-import pdfly.extract_annotated_pages
-import pdfly.extract_images
-import pdfly.metadata
-import pdfly.pagemeta
-import pdfly.rm
-import pdfly.rotate
-import pdfly.sign
-import pdfly.uncompress
-import pdfly.up2
-import pdfly.update_offsets
-import pdfly.x2pdf
+import pdfly
+from pdfly._utils import OutputOptions
+
+
+def module_doc(module_name: str) -> str | None:
+    """
+    Return the docstring of a module, without importing it.
+
+    Only the first string token of the source file is evaluated.
+    """
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or spec.origin is None:
+        return None
+    with tokenize.open(spec.origin) as source:
+        for token in tokenize.generate_tokens(source.readline):
+            if token.type == tokenize.STRING:
+                docstring = ast.literal_eval(token.string)
+                return docstring if isinstance(docstring, str) else None
+            if token.type not in (
+                tokenize.COMMENT,
+                tokenize.NL,
+                tokenize.NEWLINE,
+                tokenize.ENCODING,
+            ):
+                return None
+    return None
 
 
 def version_callback(value: bool) -> None:
-    import pypdf
-
     if value:
         typer.echo(f"pdfly {pdfly.__version__}")
-        typer.echo(f"  using pypdf=={pypdf.__version__}")
+        typer.echo(f"  using pypdf=={package_version('pypdf')}")
         raise typer.Exit
 
 
@@ -47,12 +65,105 @@ entry_point = typer.Typer(
 @entry_point.callback()  # type: ignore[misc]
 def common(
     ctx: typer.Context,
-    version: bool = typer.Option(None, "--version", callback=version_callback),
+    version: bool = typer.Option(  # noqa: ARG001
+        None, "--version", callback=version_callback
+    ),
+    *,
+    profile: Annotated[
+        Path | None,
+        typer.Option(
+            dir_okay=False,
+            metavar="PATH",
+            help=(
+                "Profile the command, and write the profiles to PATH.pstats "
+                "and to PATH.speedscope.json (https://www.speedscope.app)."
+            ),
+        ),
+    ] = None,
+    profile_sampling: Annotated[
+        bool,
+        typer.Option(
+            "--profile-sampling",
+            help=(
+                "Profile by sampling the call stack at regular intervals, "
+                "with a low overhead suited for long runs. "
+                "Only PATH.speedscope.json is written."
+            ),
+        ),
+    ] = False,
+    stats: Annotated[
+        bool,
+        typer.Option(
+            "--stats",
+            help=(
+                "Write performance statistics of the command as JSON "
+                "to stderr: time per phase, peak memory "
+                "and bytes read & written."
+            ),
+        ),
+    ] = False,
+    stats_file: Annotated[
+        Path | None,
+        typer.Option(
+            dir_okay=False,
+            metavar="PATH",
+            help="Write the --stats JSON document to PATH instead of stderr.",
+        ),
+    ] = None,
+    stats_memory: Annotated[
+        bool,
+        typer.Option(
+            "--stats-memory/--no-stats-memory",
+            help=(
+                "Trace the peak memory for --stats, "
+                "which slows the command down."
+            ),
+        ),
+    ] = True,
+) -> None:
+    if stats or stats_file is not None:
+        collect_stats(ctx, stats_file, stats_memory)
+    if profile is not None:
+        start_profiler(ctx, profile, profile_sampling)
+    elif profile_sampling:
+        raise typer.BadParameter("--profile-sampling requires --profile")
+
+
+def start_profiler(ctx: typer.Context, path: Path, sampling: bool) -> None:
+    from pdfly._profiling import Profiler, SamplingProfiler
+
+    profiler = SamplingProfiler(path) if sampling else Profiler(path)
+
+    def write_profile() -> None:
+        for profile_path in profiler.stop():
+            typer.echo(f"Profile written to {profile_path}", err=True)
+
+    profiler.start()
+    ctx.call_on_close(write_profile)
+
+
+def collect_stats(
+    ctx: typer.Context, stats_file: Path | None, trace_memory: bool = True
 ) -> None:
-    pass
+    import json
+    import sys
+
+    from pdfly._stats import Stats
 
+    collector = Stats(ctx.invoked_subcommand, trace_memory)
 
-@entry_point.command(name="2-up", help=pdfly.up2.__doc__)  # type: ignore[misc]
+    def write_stats() -> None:
+        document = json.dumps(collector.stop())
+        if stats_file is None:
+            print(document, file=sys.stderr)
+        else:
+            stats_file.write_text(document + "\n", encoding="utf-8")
+
+    collector.start()
+    ctx.call_on_close(write_stats)
+
+
+@entry_point.command(name="2-up", help=module_doc("pdfly.up2"))  # type: ignore[misc]
 def up2(
     pdf: Annotated[
         Path,
@@ -64,10 +175,48 @@ def up2(
     ],
     out: Path,
 ) -> None:
+    import pdfly.up2
+
     pdfly.up2.main(pdf, out)
 
 
-@entry_point.command(name="booklet", help=pdfly.booklet.__doc__)  # type: ignore[misc]
+@entry_point.command(name="batch", help=module_doc("pdfly.batch"))  # type: ignore[misc]
+def batch(
+    manifest: Annotated[
+        Path,
+        typer.Argument(
+            dir_okay=False,
+            allow_dash=True,
+            help="JSON Lines file describing the jobs, or - for stdin.",
+        ),
+    ],
+    jobs: Annotated[
+        int | None,
+        typer.Option(
+            "--jobs",
+            "-j",
+            min=1,
+            help="Number of processes. Defaults to the number of CPUs.",
+        ),
+    ] = None,
+    output: Annotated[
+        Path | None,
+        typer.Option(
+            "--output",
+            "-o",
+            dir_okay=False,
+            help="JSON Lines file receiving the job results. Defaults to stdout.",
+        ),
+    ] = None,
+) -> None:
+    import pdfly.batch
+
+    failures = pdfly.batch.main(manifest, jobs or os.cpu_count() or 1, output)
+    if failures:
+        raise typer.Exit(code=1)
+
+
+@entry_point.command(name="booklet", help=module_doc("pdfly.booklet"))  # type: ignore[misc]
 def booklet(
     filename: Annotated[
         Path,
@@ -108,19 +257,21 @@ def booklet(
         ),
     ] = None,
 ) -> None:
+    import pdfly.booklet
+
     pdfly.booklet.main(filename, output, blank_page, centerfold)
 
 
-@entry_point.command(name="cat", help=pdfly.cat.__doc__)  # type: ignore[misc]
+@entry_point.command(name="cat", help=module_doc("pdfly.cat"))  # type: ignore[misc]
 def cat(
     filename: Annotated[
-        Path,
+        Path | None,
         typer.Argument(
             dir_okay=False,
             exists=True,
             resolve_path=True,
         ),
-    ],
+    ] = None,
     fn_pgrgs: list[str] | None = typer.Argument(  # noqa: B008
         None, allow_dash=True, help="filenames and/or page ranges"
     ),
@@ -131,13 +282,112 @@ def cat(
     verbose: bool = typer.Option(
         False, help="show page ranges as they are being read"
     ),
+    *,
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help=(
+            "Write the pages of each file as soon as they are read, "
+            "using an amount of memory independent of the number of files."
+        ),
+    ),
+    jobs: int = typer.Option(
+        1,
+        "--jobs",
+        "-j",
+        min=1,
+        help=(
+            "Number of processes parsing the files ahead of the output. "
+            "Implies --stream."
+        ),
+    ),
+    dedup: bool = typer.Option(
+        False,
+        "--dedup",
+        help=(
+            "Write identical objects, like the fonts & images "
+            "common to several files, only once."
+        ),
+    ),
+    from_list: Annotated[
+        Path | None,
+        typer.Option(
+            "--from-list",
+            dir_okay=False,
+            allow_dash=True,
+            help=(
+                "File listing filenames and/or page ranges, one per line, "
+                "after those of the command line. Use - for stdin."
+            ),
+        ),
+    ] = None,
+    max_open_files: int | None = typer.Option(
+        None,
+        "--max-open-files",
+        min=1,
+        help=(
+            "Maximum number of input files kept open at once. "
+            "Defaults to 256."
+        ),
+    ),
+    prefetch: int = typer.Option(
+        0,
+        "--prefetch",
+        min=0,
+        help="Number of input files read ahead in background threads.",
+    ),
+    prefetch_memory: int = typer.Option(
+        256,
+        "--prefetch-memory",
+        min=1,
+        help="Maximum size of the files read ahead, in MiB.",
+    ),
+    append: bool = typer.Option(
+        False,
+        "--append",
+        help=(
+            "Append the pages to the existing output file, "
+            "as an incremental update, instead of replacing it. "
+            "Implies --stream."
+        ),
+    ),
+    raw: bool = typer.Option(
+        False,
+        "--raw",
+        help=(
+            "Copy the objects used by the pages, like images & fonts, "
+            "from the bytes of the input files instead of parsing them. "
+            "Implies --stream."
+        ),
+    ),
 ) -> None:
+    if filename is None and from_list is None:
+        raise typer.BadParameter("A file or --from-list is required.")
+    if append and not output.is_file():
+        raise typer.BadParameter(
+            f"The output file {output} must exist to append pages to it."
+        )
+    import pdfly.cat
+
     pdfly.cat.main(
-        filename, fn_pgrgs, output=output, verbose=verbose, password=password
+        filename,
+        fn_pgrgs,
+        output=output,
+        verbose=verbose,
+        password=password,
+        stream=stream,
+        jobs=jobs,
+        dedup=dedup,
+        from_list=from_list,
+        max_open_files=max_open_files or pdfly.cat.DEFAULT_MAX_OPEN_FILES,
+        prefetch=prefetch,
+        prefetch_memory=prefetch_memory * 1024 * 1024,
+        append=append,
+        raw=raw,
     )
 
 
-@entry_point.command(name="check-sign", help=pdfly.check_sign.__doc__)
+@entry_point.command(name="check-sign", help=module_doc("pdfly.check_sign"))
 def check_sign(
     filename: Annotated[
         Path,
@@ -157,10 +407,12 @@ def check_sign(
         False, help="Show signature verification details."
     ),
 ) -> None:
+    import pdfly.check_sign
+
     pdfly.check_sign.main(filename, pem, verbose)
 
 
-@entry_point.command(name="compress", help=pdfly.compress.__doc__)  # type: ignore[misc]
+@entry_point.command(name="compress", help=module_doc("pdfly.compress"))  # type: ignore[misc]
 def compress(
     pdf: Annotated[
         Path,
@@ -176,11 +428,121 @@ def compress(
             writable=True,
         ),
     ],
+    *,
+    jobs: int = typer.Option(
+        1,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Number of threads compressing the streams & the images.",
+    ),
+    level: int = typer.Option(
+        6,
+        "--level",
+        "-l",
+        min=0,
+        max=9,
+        help=(
+            "zlib compression level of the content streams, "
+            "from 0 (fastest) to 9 (smallest)."
+        ),
+    ),
+    best: bool = typer.Option(
+        False,
+        "--best",
+        help=(
+            "Try several zlib strategies, and PNG predictors for images, "
+            "on every stream, keeping the smallest. Slow."
+        ),
+    ),
+    image_quality: int | None = typer.Option(
+        None,
+        "--image-quality",
+        min=1,
+        max=95,
+        help="Encode the JPEG images again at this quality, when smaller.",
+    ),
+    photos_to_jpeg: bool = typer.Option(
+        False,
+        "--photos-to-jpeg",
+        help=(
+            "Convert the images compressed without loss that look like "
+            "photos to JPEG, when smaller. Line art, screenshots & scans "
+            "of text are kept lossless."
+        ),
+    ),
+    max_dpi: float | None = typer.Option(
+        None,
+        "--max-dpi",
+        min=1,
+        help=(
+            "Downsample the images drawn on the pages at a higher "
+            "resolution, in pixels per inch."
+        ),
+    ),
+    object_streams: bool = typer.Option(
+        False,
+        "--object-streams",
+        help=(
+            "Pack the objects other than streams into compressed object "
+            "streams, with a cross-reference stream (PDF 1.5)."
+        ),
+    ),
+    objects_per_stream: int | None = typer.Option(
+        None,
+        "--objects-per-stream",
+        min=1,
+        help=(
+            "Number of objects in each object stream, 100 by default. "
+            "Implies --object-streams."
+        ),
+    ),
 ) -> None:
-    pdfly.compress.main(pdf, output)
+    import pdfly.compress
+    from pdfly._images import ImageOptions
+    from pdfly._object_streams import DEFAULT_OBJECTS_PER_STREAM
+
+    # --objects-per-stream implies --object-streams
+    if object_streams and objects_per_stream is None:
+        objects_per_stream = DEFAULT_OBJECTS_PER_STREAM
+    pdfly.compress.main(
+        pdf,
+        output,
+        jobs=jobs,
+        level=level,
+        best=best,
+        images=ImageOptions(image_quality, max_dpi, photos_to_jpeg),
+        objects_per_stream=objects_per_stream,
+    )
 
 
-@entry_point.command(name="extract-annotated-pages", help=pdfly.extract_annotated_pages.__doc__)  # type: ignore[misc]
+@entry_point.command(name="daemon", help=module_doc("pdfly.daemon"))  # type: ignore[misc]
+def daemon(
+    socket_path: Annotated[
+        Path,
+        typer.Option(
+            "--socket",
+            envvar="PDFLY_DAEMON_SOCKET",
+            dir_okay=False,
+            help="Path of the Unix domain socket to listen on.",
+        ),
+    ],
+    workers: Annotated[
+        int | None,
+        typer.Option(
+            "--workers",
+            "-w",
+            min=1,
+            help="Number of worker processes. Defaults to the number of CPUs.",
+        ),
+    ] = None,
+) -> None:
+    import pdfly.daemon
+
+    pdfly.daemon.main(socket_path, workers or os.cpu_count() or 1)
+
+
+@entry_point.command(name="extract-annotated-pages", help=module_doc("pdfly.extract_annotated_pages"))  # type: ignore[misc]
 def extract_annotated_pages(
     input_pdf: Annotated[
         Path,
@@ -201,10 +563,12 @@ def extract_annotated_pages(
         ),
     ] = None,
 ) -> None:
+    import pdfly.extract_annotated_pages
+
     pdfly.extract_annotated_pages.main(input_pdf, output_pdf)
 
 
-@entry_point.command(name="extract-images", help=pdfly.extract_images.__doc__)  # type: ignore[misc]
+@entry_point.command(name="extract-images", help=module_doc("pdfly.extract_images"))  # type: ignore[misc]
 def extract_images(
     pdf: Annotated[
         Path,
@@ -215,6 +579,8 @@ def extract_images(
         ),
     ],
 ) -> None:
+    import pdfly.extract_images
+
     pdfly.extract_images.main(pdf)
 
 
@@ -237,7 +603,7 @@ def extract_text(
         typer.echo(page.extract_text())
 
 
-@entry_point.command(name="meta", help=pdfly.metadata.__doc__)  # type: ignore[misc]
+@entry_point.command(name="meta", help=module_doc("pdfly.metadata"))  # type: ignore[misc]
 def metadata(
     pdf: Annotated[
         Path,
@@ -247,18 +613,20 @@ def metadata(
             resolve_path=True,
         ),
     ],
-    output: pdfly.metadata.OutputOptions = typer.Option(  # noqa
-        pdfly.metadata.OutputOptions.text.value,
+    output: OutputOptions = typer.Option(  # noqa
+        OutputOptions.text.value,
         "--output",
         "-o",
         help="output format",
         show_default=True,
     ),
 ) -> None:
+    import pdfly.metadata
+
     pdfly.metadata.main(pdf, output)
 
 
-@entry_point.command(name="pagemeta", help=pdfly.pagemeta.__doc__)  # type: ignore[misc]
+@entry_point.command(name="pagemeta", help=module_doc("pdfly.pagemeta"))  # type: ignore[misc]
 def pagemeta(
     pdf: Annotated[
         Path,
@@ -269,14 +637,16 @@ def pagemeta(
         ),
     ],
     page_index: int,
-    output: pdfly.metadata.OutputOptions = typer.Option(  # noqa
-        pdfly.metadata.OutputOptions.text.value,
+    output: OutputOptions = typer.Option(  # noqa
+        OutputOptions.text.value,
         "--output",
         "-o",
         help="output format",
         show_default=True,
     ),
 ) -> None:
+    import pdfly.pagemeta
+
     pdfly.pagemeta.main(
         pdf,
         page_index,
@@ -284,7 +654,22 @@ def pagemeta(
     )
 
 
-@entry_point.command(name="rm", help=pdfly.rm.__doc__)
+@entry_point.command(name="pipe", help=module_doc("pdfly.pipe"))  # type: ignore[misc]
+def pipe(
+    stages: list[str] = typer.Argument(  # noqa: B008
+        ..., help="stages, separated by +"
+    ),
+    output: Path = typer.Option(..., "-o", "--output"),  # noqa
+    password: str = typer.Option(
+        None, help="Input documents user or owner password."
+    ),
+) -> None:
+    import pdfly.pipe
+
+    pdfly.pipe.main(stages, output, password)
+
+
+@entry_point.command(name="rm", help=module_doc("pdfly.rm"))
 def rm(
     filename: Annotated[
         Path,
@@ -301,11 +686,22 @@ def rm(
     verbose: bool = typer.Option(
         False, help="show page ranges as they are being read"
     ),
+    *,
+    raw: bool = typer.Option(
+        False,
+        "--raw",
+        help=(
+            "Copy the objects used by the pages, like images & fonts, "
+            "from the bytes of the input files instead of parsing them."
+        ),
+    ),
 ) -> None:
-    pdfly.rm.main(filename, fn_pgrgs, output, verbose)
+    import pdfly.rm
+
+    pdfly.rm.main(filename, fn_pgrgs, output, verbose, raw=raw)
 
 
-@entry_point.command(name="rotate", help=pdfly.rotate.__doc__)  # type: ignore[misc]
+@entry_point.command(name="rotate", help=module_doc("pdfly.rotate"))  # type: ignore[misc]
 def rotate(
     filename: Annotated[
         Path,
@@ -315,14 +711,60 @@ def rotate(
             resolve_path=True,
         ),
     ],
-    degrees: Annotated[int, typer.Argument(..., help="degrees to rotate")],
-    pgrgs: Annotated[str, typer.Argument(..., help="page range")] = ":",
-    output: Path = typer.Option(..., "-o", "--output"),  # noqa
+    rotations: Annotated[
+        list[str],
+        typer.Argument(
+            help="degrees to rotate and page range, or DEGREES:PAGE_RANGE..."
+        ),
+    ],
+    output: Annotated[Path | None, typer.Option("--output", "-o")] = None,
+    *,
+    in_place: bool = typer.Option(
+        False,
+        "--in-place",
+        "-i",
+        help="Update the file itself, as with --incremental.",
+    ),
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help=(
+            "Append the rotated pages to a copy of the file, "
+            "as an incremental update, instead of rewriting the document."
+        ),
+    ),
+    raw: bool = typer.Option(
+        False,
+        "--raw",
+        help=(
+            "Copy the objects used by the pages, like images & fonts, "
+            "from the bytes of the input file instead of parsing them."
+        ),
+    ),
 ) -> None:
-    pdfly.rotate.main(filename, output, degrees, pgrgs)
+    if in_place == (output is not None):
+        raise typer.BadParameter(
+            "One of the options --output or --in-place is required."
+        )
+    import pdfly.rotate
+
+    try:
+        parsed_rotations = pdfly.rotate.parse_rotations(rotations)
+    except ValueError as error:
+        raise typer.BadParameter(str(error)) from error
+    (degrees, page_range), *more_rotations = parsed_rotations
+    pdfly.rotate.main(
+        filename,
+        output or filename,
+        degrees,
+        page_range,
+        rotations=more_rotations,
+        raw=raw,
+        incremental=incremental or in_place,
+    )
 
 
-@entry_point.command(name="sign", help=pdfly.sign.__doc__)
+@entry_point.command(name="sign", help=module_doc("pdfly.sign"))
 def sign(
     filename: Annotated[
         Path,
@@ -349,10 +791,12 @@ def sign(
         ),
     ] = None,
 ) -> None:
+    import pdfly.sign
+
     pdfly.sign.main(filename, output, in_place, p12, p12_password)
 
 
-@entry_point.command(name="uncompress", help=pdfly.uncompress.__doc__)  # type: ignore[misc]
+@entry_point.command(name="uncompress", help=module_doc("pdfly.uncompress"))  # type: ignore[misc]
 def uncompress(
     pdf: Annotated[
         Path,
@@ -369,10 +813,12 @@ def uncompress(
         ),
     ],
 ) -> None:
+    import pdfly.uncompress
+
     pdfly.uncompress.main(pdf, output)
 
 
-@entry_point.command(name="update-offsets", help=pdfly.update_offsets.__doc__)  # type: ignore[misc]
+@entry_point.command(name="update-offsets", help=module_doc("pdfly.update_offsets"))  # type: ignore[misc]
 def update_offsets(
     file_in: Annotated[
         Path,
@@ -393,10 +839,12 @@ def update_offsets(
         False, help="Show progress while processing."
     ),
 ) -> None:
+    import pdfly.update_offsets
+
     pdfly.update_offsets.main(file_in, file_out, encoding, verbose)
 
 
-@entry_point.command(name="x2pdf", help=pdfly.x2pdf.__doc__)  # type: ignore[misc]
+@entry_point.command(name="x2pdf", help=module_doc("pdfly.x2pdf"))  # type: ignore[misc]
 def x2pdf(
     x: list[
         Annotated[
@@ -417,6 +865,8 @@ def x2pdf(
         ),
     ],
 ) -> None:
+    import pdfly.x2pdf
+
     exit_code = pdfly.x2pdf.main(x, output)
     if exit_code:
         raise typer.Exit(code=exit_code)
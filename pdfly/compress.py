@@ -1,48 +1,341 @@
 """Compress a PDF."""
 
+import os
 import shutil
+import stat
+import struct
+import tempfile
+import zlib
+from collections.abc import Callable, Container, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
 from pathlib import Path
+from typing import Any
 
+from PIL import Image
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ContentStream,
+    DictionaryObject,
+    EncodedStreamObject,
+    NameObject,
+    NumberObject,
+    StreamObject,
+)
 
+from pdfly._images import ImageOptions, optimize_images
+from pdfly._object_streams import write_object_streams
+from pdfly._stats import count_written, phase
 
-def main(pdf: Path, output: Path) -> None:
-    reader = PdfReader(pdf)
-    writer = PdfWriter()
-    for page in reader.pages:
-        writer.add_page(page)
+# zlib strategies tried by --best at the highest level
+_BEST_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED, zlib.Z_RLE)
+# Pillow modes of the colour spaces of images that PNG predictors apply to
+_PNG_MODES = {"/DeviceGray": "L", "/DeviceRGB": "RGB"}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
 
-    if reader.metadata:
-        writer.add_metadata(reader.metadata)
 
-    for page in writer.pages:
-        page.compress_content_streams()
+def main(
+    pdf: Path,
+    output: Path,
+    *,
+    jobs: int = 1,
+    level: int = -1,
+    best: bool = False,
+    images: ImageOptions | None = None,
+    objects_per_stream: int | None = None,
+) -> None:
+    """
+    With objects_per_stream, the objects other than streams are packed
+    into object streams, followed by a cross-reference stream.
+    """
+    reader = PdfReader(pdf)
+    writer = compressed_writer(
+        reader, jobs=jobs, level=level, best=best, images=images
+    )
 
-    # PDF to memory buffer first
-    compressed_buffer = BytesIO()
-    writer.write(compressed_buffer)
-    compressed_data = compressed_buffer.getvalue()
-    comp_size = len(compressed_data)
+    # The compressed PDF is written to a temporary file next to the output,
+    # so that it is not held in memory, and renamed over the output if it is
+    # smaller than the original
+    with tempfile.NamedTemporaryFile(
+        dir=output.resolve().parent,
+        prefix=f".{output.name}.",
+        suffix=".tmp",
+        delete=False,
+    ) as compressed_file:
+        temporary = Path(compressed_file.name)
+        try:
+            if objects_per_stream is None:
+                writer.write(compressed_file)
+            else:
+                with phase("write"):
+                    write_object_streams(
+                        writer, compressed_file, objects_per_stream, level
+                    )
+                count_written(compressed_file.tell())
+        except BaseException:
+            compressed_file.close()
+            temporary.unlink()
+            raise
+        comp_size = compressed_file.tell()
 
     orig_size = pdf.stat().st_size
 
     # If compressed size is larger than original, use original file
     if comp_size >= orig_size:
+        temporary.unlink()
         print(
             f"Compression resulted in larger file ({comp_size:,} >= {orig_size:,} bytes)"
         )
         print("Keeping original file as compressed version would be larger")
-        shutil.copy2(pdf, output)
+        if not (output.exists() and output.samefile(pdf)):
+            shutil.copy2(pdf, output)
+            count_written(orig_size)
         final_size = orig_size
         ratio = 100.0
         status = "No compression applied (would increase size)"
     else:
-        with open(output, "wb") as fp:
-            fp.write(compressed_data)
+        # Temporary files are only readable by their owner
+        temporary.chmod(_output_mode(output))
+        temporary.replace(output)
         final_size = comp_size
         ratio = (comp_size / orig_size) * 100
         status = f"Compressed ({ratio:.1f}% of original)"
 
     print(f"Original Size  : {orig_size:,}")
     print(f"Final Size     : {final_size:,} ({status})")
+
+
+def _output_mode(output: Path) -> int:
+    """
+    Return the permissions of an existing output file, or those of a new
+    file, given the umask.
+    """
+    try:
+        return stat.S_IMODE(output.stat().st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def compressed_writer(
+    reader: PdfReader,
+    *,
+    jobs: int = 1,
+    level: int = -1,
+    best: bool = False,
+    images: ImageOptions | None = None,
+) -> PdfWriter:
+    """Return a writer holding the pages of a reader, compressed."""
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+
+    if reader.metadata:
+        writer.add_metadata(reader.metadata)
+
+    compress_pages(writer, jobs=jobs, level=level, best=best, images=images)
+    return writer
+
+
+def compress_pages(
+    writer: PdfWriter,
+    *,
+    jobs: int = 1,
+    level: int = -1,
+    best: bool = False,
+    images: ImageOptions | None = None,
+) -> None:
+    """
+    Compress the content streams of all the pages of a writer,
+    at a zlib level.
+
+    With image options, the images are first recompressed & downsampled,
+    see optimize_images().
+
+    With best, the smallest of several zlib strategies is kept for each
+    content stream, and the other streams are compressed again the same way,
+    see _recompress_streams().
+
+    With several jobs, the streams are deflated, and the images processed,
+    in a pool of threads, zlib & Pillow releasing the GIL. The contents of
+    all the pages are read before any is replaced, so that the output does
+    not depend on the number of jobs, and a content stream shared by several
+    pages is deflated once instead of being deflated again for the next
+    pages.
+    """
+    page_contents = [
+        (page, content)
+        for page in writer.pages
+        if (content := page.get_contents()) is not None
+    ]
+    with ThreadPoolExecutor(
+        max_workers=jobs, thread_name_prefix="pdfly-compress"
+    ) as pool:
+        run = pool.map if jobs > 1 else map
+        if images is not None and images != ImageOptions():
+            optimize_images(writer, images, run)
+        encoded = list(
+            run(
+                partial(_flate_encode, level=level, best=best),
+                [content for _page, content in page_contents],
+            )
+        )
+        for (page, _content), encoded_content in zip(
+            page_contents, encoded, strict=True
+        ):
+            page.replace_contents(encoded_content)
+        if best:
+            _recompress_streams(
+                writer,
+                level,
+                run,
+                skipped={id(encoded_content) for encoded_content in encoded},
+            )
+
+
+def _recompress_streams(
+    writer: PdfWriter,
+    level: int,
+    run: Callable[..., Iterable[Any]],
+    skipped: Container[int],
+) -> None:
+    """
+    Compress the streams of a writer but the skipped ones, given by id(),
+    with the smallest of several zlib strategies, and of PNG predictors
+    for images, see best_deflate(). The work is done by run, a map().
+
+    Streams that are not compressed, or compressed with FlateDecode only,
+    are replaced if the result is smaller. XMP metadata streams are left
+    uncompressed.
+    """
+    streams = [
+        (number, stream)
+        for number, stream in enumerate(writer._objects, 1)
+        if isinstance(stream, StreamObject)
+        and id(stream) not in skipped
+        and _is_recompressible(stream)
+    ]
+    results = run(
+        partial(_best_stream_deflate, level=level),
+        [stream for _number, stream in streams],
+    )
+    for (number, stream), (data, decode_parms) in zip(
+        streams, results, strict=True
+    ):
+        if len(data) >= len(stream._data):
+            continue
+        encoded = EncodedStreamObject()
+        encoded.update(stream)
+        encoded[NameObject("/Filter")] = NameObject("/FlateDecode")
+        if decode_parms is None:
+            encoded.pop("/DecodeParms", None)
+        else:
+            encoded[NameObject("/DecodeParms")] = decode_parms
+        encoded._data = data
+        writer._replace_object(number, encoded)
+
+
+def best_deflate(
+    data: bytes,
+    level: int = -1,
+    image_mode: tuple[str, int, int] | None = None,
+) -> tuple[bytes, DictionaryObject | None]:
+    """
+    Deflate data at a zlib level, and at the highest level with each of the
+    _BEST_STRATEGIES, keeping the smallest result, the first one on a tie.
+
+    With an image mode, the image data deflated with a PNG predictor chosen
+    per row by Pillow is tried too, and returned with its /DecodeParms.
+    """
+    candidates: list[tuple[bytes, DictionaryObject | None]] = [
+        (zlib.compress(data, level), None)
+    ]
+    for strategy in _BEST_STRATEGIES:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidates.append(
+            (compressor.compress(data) + compressor.flush(), None)
+        )
+    if image_mode is not None:
+        png = _png_deflate(data, *image_mode)
+        if png is not None:
+            candidates.append(png)
+    return min(candidates, key=lambda candidate: len(candidate[0]))
+
+
+def _flate_encode(
+    content: ContentStream, level: int, best: bool
+) -> EncodedStreamObject:
+    if not best:
+        return content.flate_encode(level)
+    encoded = content.flate_encode(0)  # only its dictionary is kept
+    encoded._data, _decode_parms = best_deflate(content.get_data(), level)
+    return encoded
+
+
+def _best_stream_deflate(
+    stream: StreamObject, level: int
+) -> tuple[bytes, DictionaryObject | None]:
+    return best_deflate(stream.get_data(), level, _image_mode(stream))
+
+
+def _is_recompressible(stream: StreamObject) -> bool:
+    filters = stream.get("/Filter")
+    if filters is None:
+        return stream.get("/Type") != "/Metadata"
+    return filters in ("/FlateDecode", ["/FlateDecode"])
+
+
+def _image_mode(stream: StreamObject) -> tuple[str, int, int] | None:
+    """
+    Return the Pillow mode & the size of an image with 8 bits per component
+    in a colour space of _PNG_MODES, or None.
+    """
+    if stream.get("/Subtype") != "/Image" or stream.get("/ImageMask"):
+        return None
+    mode = _PNG_MODES.get(str(stream.get("/ColorSpace")))
+    width, height = stream.get("/Width"), stream.get("/Height")
+    if (
+        mode is None
+        or stream.get("/BitsPerComponent") != 8
+        or not isinstance(width, int)
+        or not isinstance(height, int)
+    ):
+        return None
+    return mode, width, height
+
+
+def _png_deflate(
+    data: bytes, mode: str, width: int, height: int
+) -> tuple[bytes, DictionaryObject] | None:
+    """
+    Deflate image data with a PNG predictor: the image data of a PNG file,
+    with a filter byte before each row, is the data of a FlateDecode stream
+    with the /Predictor 15 of these /DecodeParms.
+    """
+    colors = len(mode)
+    if len(data) != width * height * colors:
+        return None
+    png = BytesIO()
+    Image.frombytes(mode, (width, height), data).save(
+        png, "PNG", compress_level=9
+    )
+    png_data = png.getbuffer()
+    idat = []
+    position = len(_PNG_SIGNATURE)
+    while position < len(png_data):
+        (length,) = struct.unpack_from(">I", png_data, position)
+        chunk_type = bytes(png_data[position + 4 : position + 8])
+        if chunk_type == b"IDAT":
+            idat.append(bytes(png_data[position + 8 : position + 8 + length]))
+        position += 12 + length
+    decode_parms = DictionaryObject(
+        {
+            NameObject("/Predictor"): NumberObject(15),
+            NameObject("/Colors"): NumberObject(colors),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+            NameObject("/Columns"): NumberObject(width),
+        }
+    )
+    return b"".join(idat), decode_parms
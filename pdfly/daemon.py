@@ -0,0 +1,245 @@
+"""
+Serve pdfly commands from a pool of warm worker processes.
+
+The daemon imports every pdfly subcommand once, then listens on a Unix
+domain socket. When the PDFLY_DAEMON_SOCKET environment variable points to
+the socket of a running daemon, the pdfly command forwards its arguments,
+working directory and standard streams to a worker, and exits with the
+exit code of the command. Environment variables are not forwarded.
+
+Each command runs in a process forked from a worker, so commands do not
+share any state, but do not pay for the interpreter startup and imports.
+
+Examples
+    pdfly daemon --socket /tmp/pdfly.sock --workers 4 &
+
+        Start a daemon with 4 workers in the background.
+
+    PDFLY_DAEMON_SOCKET=/tmp/pdfly.sock pdfly cat -o out.pdf in.pdf 0:3
+
+        Run a command in the daemon.
+
+"""
+
+import contextlib
+import json
+import os
+import pkgutil
+import signal
+import socket
+import struct
+import sys
+import traceback
+from importlib import import_module
+from pathlib import Path
+from typing import Any
+
+SOCKET_ENV_VAR = "PDFLY_DAEMON_SOCKET"
+
+# A request is a length-prefixed JSON document, sent along with the
+# client stdin, stdout & stderr file descriptors.
+# The reply is the exit code of the command.
+_HEADER = struct.Struct("!I")
+_EXIT_CODE = struct.Struct("!i")
+_MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+
+def is_supported() -> bool:
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def forward(argv: list[str], socket_path: str | None = None) -> int | None:
+    """
+    Run a pdfly command in a daemon worker.
+
+    Returns the exit code of the command,
+    or None if no daemon could be reached and the command was not run.
+    """
+    if socket_path is None:
+        socket_path = os.environ.get(SOCKET_ENV_VAR)
+    if not socket_path or not is_supported() or argv[:1] == ["daemon"]:
+        return None
+    if not os.path.exists(socket_path):
+        return None
+    request = json.dumps({"argv": argv, "cwd": str(Path.cwd())}).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+            socket.send_fds(
+                client,
+                [_HEADER.pack(len(request)) + request],
+                [0, 1, 2],
+            )
+        except OSError:
+            return None
+        # From now on, the command may have started:
+        # it must not be run a second time locally.
+        try:
+            reply = _recv_exactly(client, _EXIT_CODE.size)
+        except OSError as error:
+            reply = b""
+            print(f"pdfly daemon: {error}", file=sys.stderr)
+    if len(reply) != _EXIT_CODE.size:
+        print("pdfly daemon: the worker exited unexpectedly", file=sys.stderr)
+        return 1
+    exit_code = _EXIT_CODE.unpack(reply)[0]
+    if exit_code < 0:  # killed by a signal, reported the way shells do
+        return 128 - exit_code
+    return exit_code
+
+
+def main(socket_path: Path, workers: int) -> None:
+    import typer
+
+    if not is_supported():
+        raise typer.BadParameter(
+            "The daemon requires Unix domain sockets and os.fork()."
+        )
+    if socket_path.exists():
+        if is_listening(socket_path):
+            raise typer.BadParameter(
+                f"A daemon is already listening on {socket_path}"
+            )
+        socket_path.unlink()  # left over by a daemon that was killed
+
+    preload_subcommands()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)  # only our user may submit commands
+    try:
+        listener.bind(str(socket_path))
+    finally:
+        os.umask(umask)
+    listener.listen(128)
+
+    def terminate(_signum: int, _frame: object) -> None:
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    worker_pids: set[int] = set()
+    try:
+        for _ in range(workers):
+            worker_pids.add(_spawn_worker(listener))
+        print(
+            f"pdfly daemon listening on {socket_path} with {workers} workers"
+        )
+        sys.stdout.flush()
+        while True:
+            pid, _status = os.wait()
+            if pid in worker_pids:  # a worker died: replace it
+                worker_pids.remove(pid)
+                worker_pids.add(_spawn_worker(listener))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in worker_pids:
+            with contextlib.suppress(OSError):
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+        listener.close()
+        socket_path.unlink(missing_ok=True)
+
+
+def is_listening(socket_path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def preload_subcommands() -> None:
+    """Import the CLI and all the pdfly subcommand modules."""
+    import pdfly
+    import pdfly.cli
+
+    for module in pkgutil.iter_modules(pdfly.__path__):
+        if not module.name.startswith("_"):
+            import_module(f"pdfly.{module.name}")
+
+
+def _spawn_worker(listener: socket.socket) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        while True:
+            connection, _ = listener.accept()
+            with connection:
+                _handle(listener, connection)
+    finally:
+        os._exit(1)
+
+
+def _handle(listener: socket.socket, connection: socket.socket) -> None:
+    message, fds, _flags, _address = socket.recv_fds(
+        connection, 65536, maxfds=3
+    )
+    try:
+        if len(fds) != 3 or len(message) < _HEADER.size:
+            return
+        size = _HEADER.unpack(message[: _HEADER.size])[0]
+        if size > _MAX_REQUEST_SIZE:
+            return
+        payload = message[_HEADER.size :]
+        payload += _recv_exactly(connection, size - len(payload))
+        try:
+            request = json.loads(payload)
+        except ValueError:
+            return
+        pid = os.fork()
+        if pid == 0:
+            listener.close()
+            connection.close()
+            os._exit(_run_command(request, fds))
+    finally:
+        for fd in fds:
+            os.close(fd)
+    _pid, status = os.waitpid(pid, 0)
+    exit_code = os.waitstatus_to_exitcode(status)
+    try:
+        connection.sendall(_EXIT_CODE.pack(exit_code))
+    except OSError:  # the client went away
+        pass
+
+
+def _run_command(request: dict[str, Any], fds: list[int]) -> int:
+    """Run a command in a forked process, and return its exit code."""
+    for target_fd, fd in enumerate(fds):
+        os.dup2(fd, target_fd)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    from pdfly.cli import entry_point
+
+    exit_code = 0
+    try:
+        os.chdir(request["cwd"])
+        entry_point(request["argv"], prog_name="pdfly")
+    except SystemExit as error:
+        if error.code is None:
+            exit_code = 0
+        elif isinstance(error.code, int):
+            exit_code = error.code
+        else:
+            print(error.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return exit_code
+
+
+def _recv_exactly(connection: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = connection.recv(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
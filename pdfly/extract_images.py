@@ -9,6 +9,8 @@ from pathlib import Path
 
 from pypdf import PdfReader
 
+from pdfly._stats import count_written
+
 
 def main(pdf: Path) -> None:
     reader = PdfReader(str(pdf))
@@ -18,6 +20,7 @@ def main(pdf: Path) -> None:
             path = f"{page_index:04d}-{image_file_object.name}"
             with open(path, "wb") as fp:
                 fp.write(image_file_object.data)
+            count_written(len(image_file_object.data))
             extracted_images.append(path)
 
     if len(extracted_images) == 0:
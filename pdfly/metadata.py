@@ -35,70 +35,18 @@ class MetaInfo(BaseModel):
     subject: str | None = None
     title: str | None = None
 
-    # OS Information
-    file_permissions: str
-    file_size: int  # in bytes
-    creation_time: datetime
-    modification_time: datetime
-    access_time: datetime
+    # OS Information, only available for files
+    file_permissions: str | None = None
+    file_size: int | None = None  # in bytes
+    creation_time: datetime | None = None
+    modification_time: datetime | None = None
+    access_time: datetime | None = None
 
 
 def main(pdf: Path, output: OutputOptions) -> None:
     reader = PdfReader(str(pdf))
-    if reader.is_encrypted:
-        pdf_stat = pdf.stat()
-        meta = MetaInfo(
-            encryption=(
-                EncryptionData(
-                    v_value=reader._encryption.V,
-                    revision=reader._encryption.R,
-                )
-                if reader._encryption
-                else None
-            ),
-            pdf_file_version=reader.stream.read(8).decode("utf-8"),
-            # OS Info
-            file_permissions=f"{stat.filemode(pdf_stat.st_mode)}",
-            file_size=pdf_stat.st_size,
-            creation_time=datetime.fromtimestamp(pdf_stat.st_ctime),
-            modification_time=datetime.fromtimestamp(pdf_stat.st_mtime),
-            access_time=datetime.fromtimestamp(pdf_stat.st_atime),
-        )
-    else:
-        info = reader.metadata
-        reader.stream.seek(0)
-        pdf_file_version = reader.stream.read(8).decode("utf-8")
-        pdf_stat = pdf.stat()
-        pdf_id = reader.trailer.get("/ID")
-        meta = MetaInfo(
-            pages=len(reader.pages),
-            page_mode=reader.page_mode,
-            pdf_file_version=pdf_file_version,
-            page_layout=reader.page_layout,
-            attachments=str(list(reader.attachments.keys())),
-            id1=pdf_id[0] if pdf_id is not None else None,
-            id2=pdf_id[1] if pdf_id is not None and len(pdf_id) >= 2 else None,
-            # OS Info
-            file_permissions=f"{stat.filemode(pdf_stat.st_mode)}",
-            file_size=pdf_stat.st_size,
-            creation_time=datetime.fromtimestamp(pdf_stat.st_ctime),
-            modification_time=datetime.fromtimestamp(pdf_stat.st_mtime),
-            access_time=datetime.fromtimestamp(pdf_stat.st_atime),
-            images=[
-                len(image.data)
-                for page in reader.pages
-                for image in page.images
-            ],
-        )
-        if info is not None:
-            meta.author = info.author
-            meta.creation_date = info.creation_date
-            meta.creator = info.creator
-            # Pending https://github.com/py-pdf/pypdf/pull/2939 to be able to access .keywords:
-            meta.keywords = info.get("/Keywords")
-            meta.producer = info.producer
-            meta.subject = info.subject
-            meta.title = info.title
+    meta = get_meta_info(reader)
+    add_os_info(meta, pdf)
 
     if output == OutputOptions.json:
         print(meta.json())
@@ -187,3 +135,54 @@ def main(pdf: Path, output: OutputOptions) -> None:
         console.print(
             "Use the 'pagemeta' subcommand to get details about a single page"
         )
+
+
+def get_meta_info(reader: PdfReader) -> MetaInfo:
+    """Collect the metadata of a document, without OS information."""
+    reader.stream.seek(0)
+    pdf_file_version = reader.stream.read(8).decode("utf-8")
+    if reader.is_encrypted:
+        return MetaInfo(
+            encryption=(
+                EncryptionData(
+                    v_value=reader._encryption.V,
+                    revision=reader._encryption.R,
+                )
+                if reader._encryption
+                else None
+            ),
+            pdf_file_version=pdf_file_version,
+        )
+    info = reader.metadata
+    pdf_id = reader.trailer.get("/ID")
+    meta = MetaInfo(
+        pages=len(reader.pages),
+        page_mode=reader.page_mode,
+        pdf_file_version=pdf_file_version,
+        page_layout=reader.page_layout,
+        attachments=str(list(reader.attachments.keys())),
+        id1=pdf_id[0] if pdf_id is not None else None,
+        id2=pdf_id[1] if pdf_id is not None and len(pdf_id) >= 2 else None,
+        images=[
+            len(image.data) for page in reader.pages for image in page.images
+        ],
+    )
+    if info is not None:
+        meta.author = info.author
+        meta.creation_date = info.creation_date
+        meta.creator = info.creator
+        # Pending https://github.com/py-pdf/pypdf/pull/2939 to be able to access .keywords:
+        meta.keywords = info.get("/Keywords")
+        meta.producer = info.producer
+        meta.subject = info.subject
+        meta.title = info.title
+    return meta
+
+
+def add_os_info(meta: MetaInfo, pdf: Path) -> None:
+    pdf_stat = pdf.stat()
+    meta.file_permissions = f"{stat.filemode(pdf_stat.st_mode)}"
+    meta.file_size = pdf_stat.st_size
+    meta.creation_time = datetime.fromtimestamp(pdf_stat.st_ctime)
+    meta.modification_time = datetime.fromtimestamp(pdf_stat.st_mtime)
+    meta.access_time = datetime.fromtimestamp(pdf_stat.st_atime)
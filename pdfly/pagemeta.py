@@ -3,7 +3,7 @@
 from pathlib import Path
 
 from pydantic import BaseModel
-from pypdf import PdfReader
+from pypdf import PageObject, PdfReader
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.table import Table
@@ -32,14 +32,7 @@ class PageMeta(BaseModel):
 def main(pdf: Path, page_index: int, output: OutputOptions) -> None:
     reader = PdfReader(pdf)
     page = reader.pages[page_index]
-    meta = PageMeta(
-        mediabox=page.mediabox,
-        cropbox=page.cropbox,
-        artbox=page.artbox,
-        bleedbox=page.bleedbox,
-        annotations=len(page.annotations) if page.annotations else 0,
-        rotation=page.rotation,
-    )
+    meta = get_page_meta(page)
 
     if output == OutputOptions.json:
         print(meta.json())
@@ -83,6 +76,17 @@ def main(pdf: Path, page_index: int, output: OutputOptions) -> None:
                 console.print(f"{i}. {obj['/Subtype']} at {obj['/Rect']}")
 
 
+def get_page_meta(page: PageObject) -> PageMeta:
+    return PageMeta(
+        mediabox=page.mediabox,
+        cropbox=page.cropbox,
+        artbox=page.artbox,
+        bleedbox=page.bleedbox,
+        annotations=len(page.annotations) if page.annotations else 0,
+        rotation=page.rotation,
+    )
+
+
 def find_known_format(width: float, height: float) -> str:
     known_format = KNOWN_PAGE_FORMATS.get((width, height))
     if known_format:
@@ -0,0 +1,109 @@
+"""
+Chain several operations, writing the resulting PDF only once.
+
+The pages are kept in memory from one stage to the next,
+instead of being written to an intermediate PDF file and parsed again.
+Stages are separated by a + argument, and are applied in order:
+
+    cat FILE [PAGE_RANGE]... [FILE [PAGE_RANGE]...]...
+        Append the selected pages of the files, like pdfly cat.
+
+    rotate DEGREES [PAGE_RANGE]
+        Rotate the selected pages of the document, like pdfly rotate.
+
+    compress
+        Compress the content streams of all pages, like pdfly compress.
+
+When using page ranges or degrees that start with a negative value,
+a two-hyphen symbol -- must be used to separate them from the command line options.
+
+Examples
+    pdfly pipe -o out.pdf cat head.pdf content.pdf 3: + rotate 90 3:7 + compress
+
+        Concatenate head.pdf and content.pdf without its first 3 pages,
+        rotate pages 3 to 6 of the result, compress it, and write out.pdf.
+
+"""
+
+from collections.abc import Sequence
+from pathlib import Path
+
+import typer
+from pypdf import PageRange, PdfReader, PdfWriter
+from rich.console import Console
+
+from pdfly.cat import add_pages, parse_filepaths_and_pagerange_args
+from pdfly.compress import compress_pages
+from pdfly.rotate import rotate_pages
+
+STAGE_SEPARATOR = "+"
+
+
+def main(args: list[str], output: Path, password: str | None = None) -> None:
+    stages = split_stages(args)
+    console = Console()
+    writer = PdfWriter()
+    readers: dict[Path, PdfReader] = {}
+    try:
+        for stage in stages:
+            apply_stage(writer, stage, readers, console, password)
+        with open(output, "wb") as output_fh:
+            writer.write(output_fh)
+    finally:
+        for reader in readers.values():
+            reader.stream.close()
+
+
+def split_stages(args: Sequence[str]) -> list[list[str]]:
+    stages: list[list[str]] = [[]]
+    for arg in args:
+        if arg == STAGE_SEPARATOR:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+    if not all(stages):
+        raise typer.BadParameter("Empty stage in pipeline.")
+    return stages
+
+
+def apply_stage(
+    writer: PdfWriter,
+    stage: Sequence[str],
+    readers: dict[Path, PdfReader],
+    console: Console,
+    password: str | None = None,
+) -> None:
+    """Apply a stage, given as a command name followed by its arguments."""
+    name, *args = stage
+    if name == "cat":
+        if not args:
+            raise typer.BadParameter("The cat stage requires a file.")
+        filename_page_ranges = parse_filepaths_and_pagerange_args(
+            console, Path(args[0]), args[1:]
+        )
+        add_pages(
+            writer, filename_page_ranges, readers, console, password=password
+        )
+    elif name == "rotate":
+        if len(args) not in (1, 2):
+            raise typer.BadParameter(
+                "The rotate stage requires degrees and an optional page range."
+            )
+        try:
+            degrees = int(args[0])
+        except ValueError:
+            raise typer.BadParameter(f"Invalid degrees: {args[0]}")
+        if degrees % 90:
+            raise typer.BadParameter(
+                f"The rotation angle must be a multiple of 90: {degrees}"
+            )
+        page_range = args[1] if len(args) == 2 else ":"
+        if not PageRange.valid(page_range):
+            raise typer.BadParameter(f"Invalid page range: {page_range}")
+        rotate_pages(writer, degrees, page_range)
+    elif name == "compress":
+        if args:
+            raise typer.BadParameter("The compress stage takes no argument.")
+        compress_pages(writer)
+    else:
+        raise typer.BadParameter(f"Unknown stage: {name}")
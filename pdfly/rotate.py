@@ -11,8 +11,23 @@ Example:
     pdfly rotate --output output.pdf input.pdf 90 -- -1
         Rotate last page by 90 degrees (clockwise)
 
+    pdfly rotate --output output.pdf input.pdf -- 90:0:5 180:7 270:-1
+        Rotate the first five pages by 90 degrees, the eighth page by 180
+        degrees and the last page by 270 degrees, in a single pass
+
+    pdfly rotate --in-place input.pdf 180 5
+        Rotate the sixth page by 180 degrees, appending it to input.pdf
+        as an incremental update instead of rewriting the file
+
 A file not followed by a page range (PGRGS) means all the pages of the file.
 
+Several rotations are given as DEGREES:PAGE_RANGE arguments, DEGREES::
+meaning all the pages. A page in the page ranges of several rotations is
+rotated by the last of them. A DEGREES argument, followed or not by a
+PAGE_RANGE argument, is a single rotation: 90 180:7 rotates the pages 180:7
+by 90 degrees, while 90:: 180:7 are two rotations. A rotation selecting no
+pages is reported.
+
 PAGE RANGES are like Python slices.
 
         Remember, page indices start with zero.
@@ -38,6 +53,10 @@ PAGE RANGES are like Python slices.
 
 """
 
+import re
+import shutil
+import sys
+from collections.abc import Iterable, Sequence
 from pathlib import Path
 
 from pypdf import (
@@ -47,27 +66,49 @@ from pypdf import (
 )
 from rich.console import Console
 
+from pdfly._stats import count_written
+from pdfly._streaming import (
+    IncrementalUpdate,
+    StreamingPdfWriter,
+    iter_page_objects,
+)
+
+_DEGREES = re.compile(r"-?\d+")
+_ROTATION = re.compile(r"(-?\d+)(?::(.+))?")
+
 
 def main(
     filename: Path,
     output: Path,
     degrees: int,
-    page_range: str,
+    page_range: str = ":",
+    *,
+    rotations: Sequence[tuple[int, str]] = (),
+    raw: bool = False,
+    incremental: bool = False,
 ) -> None:
+    """
+    Rotate the pages in the page range by degrees, then apply the other
+    rotations, each a number of degrees and a page range.
+    """
+    rotations = [(degrees, page_range), *rotations]
     try:
+        if incremental:
+            rotate_incremental(filename, output, rotations)
+            return
+        if raw:
+            rotate_raw(filename, output, rotations)
+            return
         # set up the streams
         reader = PdfReader(filename)
-        pages = list(reader.pages)
         writer = PdfWriter()
-
-        # Convert the page range into a set of page numbers
-        pages_to_rotate = convert_range_to_pages(page_range, len(pages))
-
-        for page_index, page in enumerate(pages):
-            if page_index in pages_to_rotate:
-                page = page.rotate(degrees)
+        for page in reader.pages:
             writer.add_page(page)
 
+        angles = rotation_angles(rotations, len(writer.pages))
+        for page_index, angle in angles.items():
+            writer.pages[page_index].rotate(angle)
+
         # Everything looks good! Write the output file.
         with open(output, "wb") as output_fh:
             writer.write(output_fh)
@@ -78,6 +119,135 @@ def main(
         raise error
 
 
+def rotate_pages(writer: PdfWriter, degrees: int, page_range: str) -> None:
+    """Rotate the pages of a writer that are in the page range."""
+    pages_to_rotate = convert_range_to_pages(page_range, len(writer.pages))
+    for page_index in sorted(pages_to_rotate):
+        writer.pages[page_index].rotate(degrees)
+
+
+def rotate_raw(
+    filename: Path, output: Path, rotations: Sequence[tuple[int, str]]
+) -> None:
+    """
+    Rotate the pages of a file, copying the objects used by the pages
+    from the bytes of the file.
+
+    Only the page dictionaries are parsed and serialized again.
+    """
+    with open(filename, "rb") as input_fh:
+        reader = PdfReader(input_fh)
+        num_pages = len(reader.pages)
+        angles = rotation_angles(rotations, num_pages)
+        for page_index, angle in angles.items():
+            reader.pages[page_index].rotate(angle)
+        with open(output, "wb") as output_fh:
+            writer = StreamingPdfWriter(output_fh)
+            writer.write_objects(
+                iter_page_objects(reader, range(num_pages), raw=True), {}
+            )
+            writer.close()
+
+
+def rotate_incremental(
+    filename: Path, output: Path, rotations: Sequence[tuple[int, str]]
+) -> None:
+    """
+    Rotate the pages of a file, appending their updated dictionaries
+    to the output as an incremental update.
+
+    The output is a copy of the file, or the file itself,
+    which is then updated in place.
+    """
+    copy = output.resolve() != filename.resolve()
+    if copy:
+        shutil.copyfile(filename, output)
+    try:
+        with open(output, "r+b") as output_fh:
+            update = IncrementalUpdate(output_fh)
+            pages = update.reader.pages
+            angles = rotation_angles(rotations, len(pages))
+            rotated = []
+            for page_index, angle in angles.items():
+                page = pages[page_index]
+                page.rotate(angle)
+                reference = page.indirect_reference
+                assert reference is not None
+                rotated.append(((reference.idnum, reference.generation), page))
+            try:
+                count_written(update.replace_objects(rotated))
+            except Exception:
+                update.abort()
+                raise
+    except BaseException:
+        if copy:  # e.g. of an encrypted file, which cannot be updated
+            output.unlink(missing_ok=True)
+        raise
+
+
+def rotation_angles(
+    rotations: Iterable[tuple[int, str]], num_pages: int
+) -> dict[int, int]:
+    """
+    Map the index of each page to rotate to its angle, in page order.
+
+    A page in the page ranges of several rotations is rotated
+    by the last of them.
+    """
+    angles: dict[int, int] = {}
+    for degrees, page_range in rotations:
+        pages_to_rotate = convert_range_to_pages(page_range, num_pages)
+        if not pages_to_rotate:
+            print(
+                f"WARNING: Page range {page_range} selects none of the "
+                f"{num_pages} pages",
+                file=sys.stderr,
+            )
+        for page_index in pages_to_rotate:
+            angles[page_index] = degrees
+    return dict(sorted(angles.items()))
+
+
+def parse_rotations(args: Sequence[str]) -> list[tuple[int, str]]:
+    """
+    Parse rotations given as DEGREES:PAGE_RANGE arguments,
+    or as the DEGREES [PAGE_RANGE] arguments of a single rotation.
+
+    A DEGREES argument, alone or followed by one other argument, is always
+    the single rotation DEGREES [PAGE_RANGE]. Otherwise all the arguments
+    must be DEGREES:PAGE_RANGE rotations.
+
+    Raises ValueError for invalid rotations.
+    """
+    if 0 < len(args) <= 2 and _DEGREES.fullmatch(args[0]):
+        rotations = [(args[0], args[1] if len(args) == 2 else ":")]
+    else:
+        rotations = []
+        for arg in args:
+            match = _ROTATION.fullmatch(arg)
+            if match is None:
+                raise ValueError(f"invalid rotation: {arg}")
+            rotations.append((match[1], match[2]))
+        if len(rotations) > 1:
+            for degrees, page_range in rotations:
+                if page_range is None:
+                    raise ValueError(
+                        f"invalid rotation: {degrees}, "
+                        "expected DEGREES:PAGE_RANGE"
+                    )
+        rotations = [
+            (degrees, page_range or ":") for degrees, page_range in rotations
+        ]
+    for degrees, page_range in rotations:
+        if int(degrees) % 90:
+            raise ValueError(
+                f"the rotation angle must be a multiple of 90: {degrees}"
+            )
+        if not PageRange.valid(page_range):
+            raise ValueError(f"invalid page range: {page_range}")
+    return [(int(degrees), page_range) for degrees, page_range in rotations]
+
+
 def convert_range_to_pages(page_range: str, num_pages: int) -> set[int]:
     pages_to_rotate = {*range(*PageRange(page_range).indices(num_pages))}
     return pages_to_rotate
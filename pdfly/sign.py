@@ -17,7 +17,7 @@ import tempfile
 from collections.abc import Generator
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Union
+from typing import IO, Union
 
 import fpdf.sign
 import typer
@@ -27,6 +27,8 @@ from fpdf import FPDF, get_scale_factor
 from pypdf import PageObject, PdfReader, PdfWriter
 from pypdf.generic import DictionaryObject, PdfObject
 
+from pdfly._stats import count_written
+
 
 def main(
     filename: Path,
@@ -50,7 +52,9 @@ def main(
         output = Path(output_file.name)
 
     try:
-        _sign_pdf_contents(pdf_reader, output_file, p12, p12_password)
+        _sign_pdf_contents(
+            pdf_reader, output_file, p12.read_bytes(), p12_password
+        )
     finally:
         output_file.close()
 
@@ -86,21 +90,20 @@ def is_signature(annotation: PdfObject) -> bool:
 
 def _sign_pdf_contents(
     pdf_reader: PdfReader,
-    output_file: Union[io.BufferedWriter, tempfile._TemporaryFileWrapper],
-    p12: Path,
+    output_file: IO[bytes],
+    p12_data: bytes,
     p12_password: str | None,
 ) -> None:
     unsigned_output_buffer = io.BytesIO()
 
     with add_to_page(pdf_reader.pages[-1]) as pdf:
-        with p12.open("rb") as pkcs_file:
-            hashalgo = "sha256"
-            sign_time = pdf.creation_date
-
-            key, cert, extra_certs = pkcs12.load_key_and_certificates(
-                pkcs_file.read(),
-                (p12_password.encode() if p12_password is not None else None),
-            )
+        hashalgo = "sha256"
+        sign_time = pdf.creation_date
+
+        key, cert, extra_certs = pkcs12.load_key_and_certificates(
+            p12_data,
+            (p12_password.encode() if p12_password is not None else None),
+        )
         pdf.sign(
             key=key,
             cert=cert,  # type: ignore
@@ -141,6 +144,7 @@ def _sign_pdf_contents(
         sign_time,
     )
     output_file.write(signed_output_buffer)
+    count_written(len(signed_output_buffer))
 
 
 @contextmanager
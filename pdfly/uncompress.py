@@ -9,6 +9,22 @@ from pypdf.generic import IndirectObject, PdfObject
 
 def main(pdf: Path, output: Path) -> None:
     reader = PdfReader(pdf)
+    writer = uncompressed_writer(reader)
+
+    with open(output, "wb") as fp:
+        writer.write(fp)
+
+    orig_size = pdf.stat().st_size
+    uncomp_size = output.stat().st_size
+
+    print(f"Original Size  : {orig_size:,}")
+    print(
+        f"Uncompressed Size: {uncomp_size:,} ({(uncomp_size / orig_size) * 100:.1f}% of original)"
+    )
+
+
+def uncompressed_writer(reader: PdfReader) -> PdfWriter:
+    """Return a writer holding the pages of a reader, uncompressed."""
     writer = PdfWriter()
 
     for page in reader.pages:
@@ -24,17 +40,7 @@ def main(pdf: Path, output: Path) -> None:
                 elif isinstance(contents, IndirectObject):
                     decompress_content_stream(contents)
         writer.add_page(page)
-
-    with open(output, "wb") as fp:
-        writer.write(fp)
-
-    orig_size = pdf.stat().st_size
-    uncomp_size = output.stat().st_size
-
-    print(f"Original Size  : {orig_size:,}")
-    print(
-        f"Uncompressed Size: {uncomp_size:,} ({(uncomp_size / orig_size) * 100:.1f}% of original)"
-    )
+    return writer
 
 
 def decompress_content_stream(content: IndirectObject) -> None:
@@ -29,6 +29,8 @@ from pathlib import Path
 
 from rich.console import Console
 
+from pdfly._stats import count_read, count_written
+
 # Here, only simple regular expressions are used.
 # Beyond a certain level of complexity, switching to a proper PDF dictionary parser would be better.
 RE_OBJ = re.compile(r"^([0-9]+) ([0-9]+) obj *")
@@ -253,6 +255,7 @@ def read_binary_file(file_path: Path, encoding: str) -> list[str]:
             chunk = file.read(4096)  # Read in chunks of 4096 bytes
             if not chunk:
                 break  # End of file
+            count_read(len(chunk))
 
             buffer += chunk
 
@@ -286,5 +289,6 @@ def main(file_in: Path, file_out: Path, encoding: str, verbose: bool) -> None:
 
     with open(file_out, "wb") as f:
         f.writelines(line.encode(encoding) for line in lines_out)
+        count_written(f.tell())
 
     console.print(f"Wrote {file_out}", soft_wrap=True)
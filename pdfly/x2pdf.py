@@ -2,12 +2,15 @@
 
 from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO
 
 from fpdf import FPDF
 from PIL import Image
 from pypdf import PdfReader, PdfWriter
 from rich.console import Console
 
+from pdfly._stats import count_read
+
 
 def px_to_mm(px: float) -> float:
     px_in_inch = 72
@@ -17,9 +20,13 @@ def px_to_mm(px: float) -> float:
     return mm
 
 
-def image_to_pdf(filepath: Path) -> BytesIO:
+def image_to_pdf(filepath: Path | BinaryIO) -> BytesIO:
     with Image.open(filepath) as cover:
         w, h = cover.size
+    if isinstance(filepath, Path):
+        count_read(filepath.stat().st_size)
+    else:
+        filepath.seek(0)
     width, height = px_to_mm(w), px_to_mm(h)
     pdf = FPDF(unit="mm")
     pdf.add_page(format=(width, height))  # type: ignore
@@ -33,13 +40,10 @@ def main(in_filepaths: list[Path], out_filepath: Path) -> int:
     writer = PdfWriter()
     for filepath in in_filepaths:
         if filepath.name.endswith(".pdf"):
-            for page in PdfReader(filepath).pages:
-                writer.insert_page(page)
+            insert_pdf(writer, filepath)
             continue
         try:
-            pdf_bytes = image_to_pdf(filepath)
-            new_page = PdfReader(pdf_bytes).pages[0]
-            writer.insert_page(new_page)
+            insert_image(writer, filepath)
         except Exception:
             console.print(
                 f"[red]Error: Could not convert '{filepath}' to a PDF."
@@ -48,3 +52,14 @@ def main(in_filepaths: list[Path], out_filepath: Path) -> int:
             exit_code += 1
     writer.write(out_filepath)
     return exit_code
+
+
+def insert_pdf(writer: PdfWriter, pdf: Path | BinaryIO) -> None:
+    for page in PdfReader(pdf).pages:
+        writer.insert_page(page)
+
+
+def insert_image(writer: PdfWriter, image: Path | BinaryIO) -> None:
+    pdf_bytes = image_to_pdf(image)
+    new_page = PdfReader(pdf_bytes).pages[0]
+    writer.insert_page(new_page)
@@ -3,10 +3,11 @@
 import os
 from collections.abc import Iterator
 from pathlib import Path
-from typing import Union
+from typing import Any, Union
 
 import pytest
 from fpdf import FPDF
+from pypdf import PdfReader
 
 from pdfly.cli import entry_point
 
@@ -39,6 +40,33 @@ def run_cli(args: list[str]) -> Union[None, int, str]:
         return error.code
 
 
+def extract_embedded_images(pdf_filepath: Path) -> list[Any]:
+    reader = PdfReader(pdf_filepath)
+    return [page.images for page in reader.pages]
+
+
+def write_xref_stream_pdf(path: Path) -> None:
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [ 3 0 R ] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [ 0 0 200 200 ] >>",
+    ]
+    data = b"%PDF-1.5\n"
+    entries = [b"\x00\x00\x00\xff\xff"]
+    for number, body in enumerate(objects, 1):
+        entries.append(b"\x01" + len(data).to_bytes(2, "big") + b"\x00\x00")
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    entries.append(b"\x01" + len(data).to_bytes(2, "big") + b"\x00\x00")
+    xref = b"".join(entries)
+    startxref = len(data)
+    data += (
+        b"4 0 obj\n<< /Type /XRef /Size 5 /W [ 1 2 2 ] /Root 1 0 R "
+        b"/Length %d >>\nstream\n%s\nendstream\nendobj\n"
+        b"startxref\n%d\n%%%%EOF\n" % (len(xref), xref, startxref)
+    )
+    path.write_bytes(data)
+
+
 @pytest.fixture
 def two_pages_pdf_filepath(tmp_path: Path) -> Path:
     """A PDF with 2 pages, and a different image on each page"""
@@ -0,0 +1,73 @@
+"""Tests for the `pdfly.aio` functions."""
+
+import asyncio
+from collections.abc import Iterator
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+from pypdf.errors import PdfReadError
+
+from pdfly import aio
+
+from .conftest import RESOURCES_ROOT
+
+# The asyncio event loop uses a socket pair to wake itself up
+pytestmark = pytest.mark.enable_socket
+
+
+@pytest.fixture
+def pool() -> Iterator[None]:
+    aio.configure(max_workers=1, max_pending=1)
+    try:
+        yield
+    finally:
+        aio.shutdown()
+
+
+@pytest.mark.usefixtures("pool")
+def test_operations_run_concurrently(pdf_file_100: Path) -> None:
+    pdf_stream = BytesIO(pdf_file_100.read_bytes())
+
+    async def run() -> list[int]:
+        results = await asyncio.gather(
+            aio.rm(pdf_stream, ["1:"]),
+            aio.cat([(pdf_file_100, "0:3"), RESOURCES_ROOT / "box.pdf"]),
+            aio.rotate(PdfReader(pdf_file_100), 90, ":2"),
+        )
+        return [result.pages for result in results]
+
+    assert asyncio.run(run()) == [1, 4, 100]
+
+
+@pytest.mark.usefixtures("pool")
+def test_errors_are_raised_to_the_caller() -> None:
+    with pytest.raises(PdfReadError):
+        asyncio.run(aio.compress(b"not a PDF"))
+
+
+@pytest.mark.usefixtures("pool")
+def test_timeout_releases_slot_on_completion(pdf_file_100: Path) -> None:
+    async def run() -> int:
+        with pytest.raises(asyncio.TimeoutError):
+            await aio.uncompress(pdf_file_100, timeout=0)
+        # With a single slot, this waits for the abandoned operation
+        result = await aio.meta(pdf_file_100, timeout=30)
+        assert result.pages is not None
+        return result.pages
+
+    assert asyncio.run(run()) == 100
+
+
+def test_configure_while_running(pdf_file_100: Path) -> None:
+    with pytest.raises(ValueError, match="max_workers"):
+        aio.configure(max_workers=0)
+    aio.configure(max_workers=1)
+    try:
+        asyncio.run(aio.pagemeta(pdf_file_100, 0))
+        with pytest.raises(RuntimeError, match="already running"):
+            aio.configure(max_workers=2)
+    finally:
+        aio.shutdown()
+    aio.configure()
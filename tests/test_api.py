@@ -0,0 +1,138 @@
+"""Tests for the `pdfly.api` functions."""
+
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+
+from pdfly import api
+
+from .conftest import RESOURCES_ROOT
+
+
+def test_cat_mixes_input_types(pdf_file_100: Path) -> None:
+    box_pdf = RESOURCES_ROOT / "box.pdf"
+    result = api.cat(
+        [
+            (pdf_file_100.read_bytes(), "0:3"),
+            box_pdf,
+            (PdfReader(pdf_file_100), "-1"),
+            (BytesIO(box_pdf.read_bytes()), "5"),
+        ]
+    )
+
+    assert result.pages == 5
+    assert result.data is not None
+    assert result.size == len(result.data)
+    assert result.warnings == ["Page range 5 is out of bounds"]
+    reader = PdfReader(BytesIO(result.data))
+    assert [page.extract_text() for page in reader.pages[:3]] == [
+        "0",
+        "1",
+        "2",
+    ]
+    assert reader.pages[4].extract_text() == "99"
+
+
+@pytest.mark.parametrize("prefix", [b"", b"header"])
+def test_write_into_output_stream(prefix: bytes, pdf_file_100: Path) -> None:
+    output = BytesIO()
+    output.write(prefix)
+
+    result = api.rm(pdf_file_100.read_bytes(), ["::2", "1:10"], output)
+
+    assert result.data is None
+    assert result.size == len(output.getvalue()) - len(prefix)
+    reader = PdfReader(BytesIO(output.getvalue()[len(prefix) :]))
+    assert [page.extract_text() for page in reader.pages[:3]] == [
+        "11",
+        "13",
+        "15",
+    ]
+
+
+def test_rotate() -> None:
+    result = api.rotate(RESOURCES_ROOT / "input8.pdf", 90, ":2")
+    assert result.data is not None
+    rotations = [
+        page.rotation for page in PdfReader(BytesIO(result.data)).pages
+    ]
+    assert rotations == [90, 90] + [0] * 6
+
+
+def test_compress() -> None:
+    original = RESOURCES_ROOT / "GeoBase_NHNC1_Data_Model_UML_EN.pdf"
+    result = api.compress(BytesIO(original.read_bytes()))
+    assert result.compressed
+    assert result.original_size == original.stat().st_size
+    assert result.size < result.original_size
+
+
+def test_compress_keeps_smaller_original(pdf_file_100: Path) -> None:
+    # The content streams of these pages are too short to be compressed
+    original = api.uncompress(pdf_file_100).data
+    assert original is not None
+    output = BytesIO()
+
+    result = api.compress(PdfReader(BytesIO(original)), output)
+
+    assert not result.compressed
+    assert result.size == len(original)
+    assert output.getvalue() == original
+
+
+def test_uncompress(pdf_file_100: Path) -> None:
+    result = api.uncompress(pdf_file_100)
+    assert result.pages == 100
+    assert result.size > pdf_file_100.stat().st_size
+
+
+def test_x2pdf() -> None:
+    result = api.x2pdf(
+        [
+            (RESOURCES_ROOT / "pythonknight.png").read_bytes(),
+            (RESOURCES_ROOT / "box.pdf").read_bytes(),
+            b"not an image",
+        ]
+    )
+    assert result.pages == 2
+    assert len(result.errors) == 1
+    assert result.errors[0].startswith("Input 2: ")
+
+
+def test_meta_and_pagemeta() -> None:
+    box_pdf = RESOURCES_ROOT / "box.pdf"
+
+    meta = api.meta(box_pdf.read_bytes())
+    assert meta.pages == 1
+    assert meta.pdf_file_version.startswith("%PDF-")
+    assert meta.file_size is None
+    assert api.meta(box_pdf).file_size == box_pdf.stat().st_size
+
+    page_meta = api.pagemeta(BytesIO(box_pdf.read_bytes()), 0)
+    assert page_meta.rotation == 0
+
+
+def test_sign_already_signed_pdf() -> None:
+    with pytest.raises(ValueError, match="already signed"):
+        api.sign(
+            (RESOURCES_ROOT / "sign_pkcs12.pdf").read_bytes(),
+            (RESOURCES_ROOT / "signing-certificate.p12").read_bytes(),
+            "fpdf2",
+        )
+
+
+def test_sign(two_pages_pdf_filepath: Path) -> None:
+    result = api.sign(
+        two_pages_pdf_filepath.read_bytes(),
+        (RESOURCES_ROOT / "signing-certificate.p12").read_bytes(),
+        "fpdf2",
+    )
+    assert result.pages == 2
+    assert result.data is not None
+    reader = PdfReader(BytesIO(result.data))
+    assert any(
+        annot.get_object().get("/FT") == "/Sig"
+        for annot in reader.pages[-1].get("/Annots", [])
+    )
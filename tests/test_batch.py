@@ -0,0 +1,154 @@
+"""Tests for the `batch` command."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+
+import pdfly.batch
+from pdfly.batch import Job, input_size
+
+from .conftest import RESOURCES_ROOT, run_cli
+
+
+def write_manifest(path: Path, jobs: list[object]) -> Path:
+    path.write_text(
+        "\n".join(
+            job if isinstance(job, str) else json.dumps(job) for job in jobs
+        )
+        + "\n"
+    )
+    return path
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_batch_runs_all_jobs(
+    capsys: pytest.CaptureFixture, tmp_path: Path, jobs: str
+) -> None:
+    manifest = write_manifest(
+        tmp_path / "jobs.jsonl",
+        [
+            {
+                "id": "rotate",
+                "command": "rotate",
+                "args": {
+                    "filename": str(RESOURCES_ROOT / "input8.pdf"),
+                    "output": str(tmp_path / "rotated.pdf"),
+                    "degrees": 90,
+                    "page_range": ":2",
+                },
+            },
+            {
+                "id": "cat",
+                "command": "cat",
+                "args": {
+                    "filename": str(RESOURCES_ROOT / "input8.pdf"),
+                    "fn_pgrgs": ["0:3"],
+                    "output": str(tmp_path / "cat.pdf"),
+                },
+            },
+            {
+                "id": "meta",
+                "command": "meta",
+                "args": {
+                    "pdf": str(RESOURCES_ROOT / "box.pdf"),
+                    "output": "json",
+                },
+            },
+        ],
+    )
+
+    exit_code = run_cli(["batch", str(manifest), "--jobs", jobs])
+
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+    results = {
+        result["id"]: result
+        for result in map(json.loads, captured.out.splitlines())
+    }
+    assert {result["status"] for result in results.values()} == {"ok"}
+    assert results["rotate"]["output_size"] == (
+        (tmp_path / "rotated.pdf").stat().st_size
+    )
+    assert len(PdfReader(tmp_path / "cat.pdf").pages) == 3
+    assert json.loads(results["meta"]["stdout"])["pages"] == 1
+
+
+def test_batch_reports_failed_jobs(tmp_path: Path) -> None:
+    manifest = write_manifest(
+        tmp_path / "jobs.jsonl",
+        [
+            "not JSON",
+            {"command": "unknown"},
+            {"command": "compress", "args": {"pdf": "missing.pdf"}},
+            {
+                "command": "compress",
+                "args": {
+                    "pdf": str(tmp_path / "missing.pdf"),
+                    "output": str(tmp_path / "out.pdf"),
+                },
+            },
+        ],
+    )
+    results_path = tmp_path / "results.jsonl"
+
+    exit_code = run_cli(
+        ["batch", str(manifest), "-j", "1", "-o", str(results_path)]
+    )
+
+    assert exit_code == 1
+    results = [
+        json.loads(line) for line in results_path.read_text().splitlines()
+    ]
+    assert [result["status"] for result in results] == ["error"] * 4
+    assert "missing argument: output" in results[2]["error"]
+    assert "FileNotFoundError" in results[3]["error"]
+
+
+def crash(job: Job) -> dict[str, object]:
+    raise BrokenProcessPool(f"a worker died running {job.id}")
+
+
+def test_batch_reports_crashed_workers(
+    capsys: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(pdfly.batch, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(pdfly.batch, "run_job", crash)
+    manifest = write_manifest(
+        tmp_path / "jobs.jsonl",
+        [
+            {
+                "id": job_id,
+                "command": "meta",
+                "args": {"pdf": str(RESOURCES_ROOT / "box.pdf")},
+            }
+            for job_id in ("first", "second")
+        ],
+    )
+
+    exit_code = run_cli(["batch", str(manifest), "--jobs", "2"])
+
+    assert exit_code == 1
+    results = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    assert sorted(result["id"] for result in results) == ["first", "second"]
+    for result in results:
+        assert result["status"] == "error"
+        assert result["command"] == "meta"
+        assert "BrokenProcessPool: a worker died" in result["error"]
+
+
+def test_input_size_ignores_output() -> None:
+    box_pdf = RESOURCES_ROOT / "box.pdf"
+    job = Job(
+        1,
+        "cat",
+        {"filename": str(box_pdf), "fn_pgrgs": ["0"], "output": str(box_pdf)},
+    )
+    assert input_size(job) == box_pdf.stat().st_size
@@ -1,15 +1,16 @@
+from io import BytesIO, StringIO
 from pathlib import Path
-from typing import Any
 
 import pytest
-from pypdf import PdfReader
-
-from .conftest import RESOURCES_ROOT, chdir, run_cli
-
-
-def extract_embedded_images(pdf_filepath: Path) -> list[Any]:
-    reader = PdfReader(pdf_filepath)
-    return [page.images for page in reader.pages]
+from pypdf import PdfReader, PdfWriter
+
+from .conftest import (
+    RESOURCES_ROOT,
+    chdir,
+    extract_embedded_images,
+    run_cli,
+    write_xref_stream_pdf,
+)
 
 
 def extract_text_pages(pdf_filepath: Path) -> list[str]:
@@ -285,3 +286,393 @@ def test_cat_decrypt_with_password_ko(
     captured = capsys.readouterr()
     assert exit_code == 1, captured
     assert "Error: the decrypting password provided is invalid" in captured.out
+
+
+@pytest.mark.parametrize("options", [[], ["--stream"]])
+def test_cat_same_file_shares_resources(
+    capsys: pytest.CaptureFixture, tmp_path: Path, options: list[str]
+) -> None:
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    for _ in range(3):
+        pdf.add_page()
+        pdf.image(RESOURCES_ROOT / "baleines.jpg", x=10, y=10, w=50)
+    input_pdf = tmp_path / "input.pdf"
+    pdf.output(str(input_pdf))
+    output_pdf = tmp_path / "out.pdf"
+
+    exit_code = run_cli(
+        [
+            "cat",
+            str(input_pdf),
+            "2",
+            str(input_pdf),
+            "0",
+            str(input_pdf),
+            "1",
+            "--output",
+            str(output_pdf),
+            *options,
+        ]
+    )
+
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+    reader = PdfReader(output_pdf)
+    assert len(reader.pages) == 3
+    image_refs = {
+        xobject.idnum
+        for page in reader.pages
+        for xobject in page["/Resources"]["/XObject"].values()
+    }
+    assert len(image_refs) == 1
+    assert output_pdf.stat().st_size < 2 * input_pdf.stat().st_size
+
+
+def test_cat_stream_same_output_pages(
+    capsys: pytest.CaptureFixture, tmp_path: Path, pdf_file_100: Path
+) -> None:
+    args = [
+        "cat",
+        str(pdf_file_100),
+        "::10",
+        str(RESOURCES_ROOT / "input8.pdf"),
+        str(pdf_file_100),
+        "99:",
+        str(RESOURCES_ROOT / "box.pdf"),
+        "5",
+    ]
+    output_pdf = tmp_path / "out.pdf"
+    stream_pdf = tmp_path / "stream.pdf"
+
+    assert run_cli([*args, "--output", str(output_pdf)]) == 0
+    assert run_cli([*args, "--output", str(stream_pdf), "--stream"]) == 0
+
+    captured = capsys.readouterr()
+    assert captured.err.count("is out of bounds") == 2
+    reader = PdfReader(stream_pdf, strict=True)
+    assert len(reader.pages) == 10 + 8 + 1
+    assert extract_text_pages(stream_pdf) == extract_text_pages(output_pdf)
+    assert [page.rotation for page in reader.pages] == [
+        page.rotation for page in PdfReader(output_pdf).pages
+    ]
+
+
+def test_cat_jobs_same_output_as_stream(
+    capsys: pytest.CaptureFixture, tmp_path: Path, pdf_file_100: Path
+) -> None:
+    args = [
+        "cat",
+        str(pdf_file_100),
+        "::3",
+        str(RESOURCES_ROOT / "input8.pdf"),
+        str(RESOURCES_ROOT / "box.pdf"),
+        "5",
+        str(pdf_file_100),
+        "1::3",
+        str(RESOURCES_ROOT / "jpeg.pdf"),
+    ]
+    stream_pdf = tmp_path / "stream.pdf"
+    jobs_pdf = tmp_path / "jobs.pdf"
+
+    assert run_cli([*args, "--output", str(stream_pdf), "--stream"]) == 0
+    assert run_cli([*args, "--output", str(jobs_pdf), "--jobs", "2"]) == 0
+
+    captured = capsys.readouterr()
+    assert captured.err.count("is out of bounds") == 2
+    assert jobs_pdf.read_bytes() == stream_pdf.read_bytes()
+    assert len(PdfReader(jobs_pdf, strict=True).pages) == 34 + 8 + 33 + 1
+
+
+@pytest.mark.parametrize(
+    "options", [["--dedup"], ["--dedup", "--stream"], ["--dedup", "-j", "2"]]
+)
+def test_cat_dedup_identical_objects_across_files(
+    capsys: pytest.CaptureFixture, tmp_path: Path, options: list[str]
+) -> None:
+    from fpdf import FPDF
+
+    inputs = []
+    for index in range(3):
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.image(RESOURCES_ROOT / "baleines.jpg", x=10, y=10, w=50)
+        pdf.set_font("helvetica")
+        pdf.text(10, 100, f"Invoice {index}")
+        inputs.append(tmp_path / f"invoice{index}.pdf")
+        pdf.output(str(inputs[-1]))
+    output_pdf = tmp_path / "out.pdf"
+
+    exit_code = run_cli(
+        ["cat", *map(str, inputs), "--output", str(output_pdf), *options]
+    )
+
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+    assert extract_text_pages(output_pdf) == [
+        "Invoice 0",
+        "Invoice 1",
+        "Invoice 2",
+    ]
+    reader = PdfReader(output_pdf)
+    image_refs = {
+        xobject.idnum
+        for page in reader.pages
+        for xobject in page["/Resources"]["/XObject"].values()
+    }
+    assert len(image_refs) == 1
+    assert output_pdf.stat().st_size < 1.5 * inputs[0].stat().st_size
+
+
+def test_cat_from_list(
+    capsys: pytest.CaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    pdf_file_100: Path,
+) -> None:
+    list_file = tmp_path / "list.txt"
+    list_file.write_text(f"{pdf_file_100}\n-1\n\n{pdf_file_100}\n:2\n")
+    monkeypatch.setattr("sys.stdin", StringIO(f"{pdf_file_100}\n5\n"))
+    output_pdf = tmp_path / "out.pdf"
+
+    exit_code = run_cli(
+        [
+            "cat",
+            "--from-list",
+            str(list_file),
+            "--output",
+            str(output_pdf),
+        ]
+    )
+    assert exit_code == 0, capsys.readouterr()
+    assert extract_text_pages(output_pdf) == ["99", "0", "1"]
+
+    exit_code = run_cli(
+        [
+            "cat",
+            str(RESOURCES_ROOT / "box.pdf"),
+            "--from-list",
+            "-",
+            "--output",
+            str(output_pdf),
+        ]
+    )
+    assert exit_code == 0, capsys.readouterr()
+    assert extract_text_pages(output_pdf)[1:] == ["5"]
+
+
+def test_cat_without_input(
+    capsys: pytest.CaptureFixture, tmp_path: Path
+) -> None:
+    exit_code = run_cli(["cat", "--output", str(tmp_path / "out.pdf")])
+    assert exit_code == 2
+    assert "--from-list" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("options", [[], ["--stream"]])
+def test_cat_max_open_files(
+    tmp_path: Path,
+    pdf_file_100: Path,
+    options: list[str],
+) -> None:
+    args = ["cat"]
+    for start in range(3):
+        args += [str(pdf_file_100), f"{start}::3"]
+        args += [str(RESOURCES_ROOT / "input8.pdf"), str(start)]
+    output_pdf = tmp_path / "out.pdf"
+    limited_pdf = tmp_path / "limited.pdf"
+
+    assert run_cli([*args, "-o", str(output_pdf), *options]) == 0
+    assert (
+        run_cli(
+            [*args, "-o", str(limited_pdf), "--max-open-files", "1", *options]
+        )
+        == 0
+    )
+
+    assert extract_text_pages(limited_pdf) == extract_text_pages(output_pdf)
+    if options:
+        assert limited_pdf.read_bytes() == output_pdf.read_bytes()
+
+
+@pytest.mark.parametrize("options", [[], ["--stream"]])
+def test_cat_prefetch(
+    tmp_path: Path,
+    pdf_file_100: Path,
+    options: list[str],
+) -> None:
+    args = [
+        "cat",
+        str(RESOURCES_ROOT / "input8.pdf"),
+        str(pdf_file_100),
+        "::10",
+        str(RESOURCES_ROOT / "box.pdf"),
+        str(pdf_file_100),
+        "5",
+        str(RESOURCES_ROOT / "jpeg.pdf"),
+    ]
+    output_pdf = tmp_path / "out.pdf"
+    prefetched_pdf = tmp_path / "prefetched.pdf"
+
+    assert run_cli([*args, "-o", str(output_pdf), *options]) == 0
+    assert (
+        run_cli(
+            [*args, "-o", str(prefetched_pdf), "--prefetch", "2", *options]
+        )
+        == 0
+    )
+
+    assert extract_text_pages(prefetched_pdf) == extract_text_pages(output_pdf)
+    if options:
+        assert prefetched_pdf.read_bytes() == output_pdf.read_bytes()
+
+
+def test_prefetcher_memory_budget(tmp_path: Path) -> None:
+    from pdfly._prefetch import Prefetcher
+
+    filepaths = []
+    for index, size in enumerate([10, 30, 10, 50, 10]):
+        filepaths.append(tmp_path / f"file{index}")
+        filepaths[-1].write_bytes(bytes([index]) * size)
+    prefetcher = Prefetcher(filepaths, count=3, max_bytes=40)
+    try:
+        # file3 is larger than the budget, file2 waits for file0 to be used
+        assert set(prefetcher._pending) == {filepaths[0], filepaths[1]}
+        streams = [prefetcher.open(filepath) for filepath in filepaths]
+        assert streams[3] is None
+        assert [stream.read() for stream in streams if stream is not None] == [
+            filepath.read_bytes()
+            for index, filepath in enumerate(filepaths)
+            if index != 3
+        ]
+    finally:
+        prefetcher.close()
+
+
+@pytest.mark.parametrize("in_memory", [False, True])
+def test_open_reader_not_prefetched(in_memory: bool) -> None:
+    from rich.console import Console
+
+    from pdfly._prefetch import Prefetcher
+    from pdfly.cat import open_reader
+
+    input_pdf = RESOURCES_ROOT / "input8.pdf"
+    # Larger than the memory budget, the file is not read ahead
+    prefetcher = Prefetcher([input_pdf], count=1, max_bytes=1)
+    try:
+        reader = open_reader(
+            input_pdf, Console(), in_memory=in_memory, prefetcher=prefetcher
+        )
+    finally:
+        prefetcher.close()
+
+    # Beyond --max-open-files, files are read in memory and closed
+    assert isinstance(reader.stream, BytesIO) == in_memory
+    if not in_memory:
+        reader.stream.close()
+
+
+def test_cat_append(pdf_file_100: Path) -> None:
+    original = pdf_file_100.read_bytes()
+
+    exit_code = run_cli(
+        [
+            "cat",
+            str(RESOURCES_ROOT / "input8.pdf"),
+            ":2",
+            "--output",
+            str(pdf_file_100),
+            "--append",
+        ]
+    )
+
+    assert exit_code == 0
+    updated = pdf_file_100.read_bytes()
+    assert updated.startswith(original)
+    assert updated.count(b"%%EOF") == original.count(b"%%EOF") + 1
+    texts = extract_text_pages(pdf_file_100)
+    assert texts[:100] == [str(index) for index in range(100)]
+    assert texts[100:] == ["1", "2"]
+    assert len(PdfReader(pdf_file_100, strict=True).pages) == 102
+
+
+def test_cat_append_rejects_output_among_inputs(
+    capsys: pytest.CaptureFixture, pdf_file_100: Path
+) -> None:
+    original = pdf_file_100.read_bytes()
+
+    with chdir(pdf_file_100.parent):
+        exit_code = run_cli(
+            [
+                "cat",
+                pdf_file_100.name,
+                "0",
+                str(RESOURCES_ROOT / "input8.pdf"),
+                "--output",
+                str(pdf_file_100),
+                "--append",
+            ]
+        )
+
+    assert exit_code == 2
+    assert "is also an input" in capsys.readouterr().out
+    assert pdf_file_100.read_bytes() == original
+
+
+def test_cat_append_invalid_password_leaves_output_unchanged(
+    capsys: pytest.CaptureFixture, pdf_file_100: Path, tmp_path: Path
+) -> None:
+    inputs = []
+    for password in ("right", "other"):
+        writer = PdfWriter(clone_from=RESOURCES_ROOT / "input8.pdf")
+        writer.encrypt(password, algorithm="RC4-128")
+        inputs.append(tmp_path / f"{password}.pdf")
+        writer.write(inputs[-1])
+    original = pdf_file_100.read_bytes()
+
+    exit_code = run_cli(
+        [
+            "cat",
+            "--password",
+            "right",
+            *map(str, inputs),
+            "--output",
+            str(pdf_file_100),
+            "--append",
+        ]
+    )
+
+    assert exit_code == 1
+    assert "password provided is invalid" in capsys.readouterr().out
+    # The pages of the first input, already written, were removed
+    assert pdf_file_100.read_bytes() == original
+
+
+def test_cat_append_to_xref_stream(tmp_path: Path) -> None:
+    output_pdf = tmp_path / "out.pdf"
+    write_xref_stream_pdf(output_pdf)
+    assert len(PdfReader(output_pdf, strict=True).pages) == 1
+
+    for _ in range(2):
+        exit_code = run_cli(
+            [
+                "cat",
+                str(RESOURCES_ROOT / "input8.pdf"),
+                "::4",
+                "--output",
+                str(output_pdf),
+                "--append",
+            ]
+        )
+        assert exit_code == 0
+
+    assert output_pdf.read_bytes().count(b"/Type /XRef") == 3
+    reader = PdfReader(output_pdf, strict=True)
+    assert [page.extract_text() for page in reader.pages] == [
+        "",
+        "1",
+        "5",
+        "1",
+        "5",
+    ]
@@ -1,10 +1,14 @@
+import json
+import pstats
+import subprocess
 import sys
+from pathlib import Path
 from subprocess import check_output
 
 import pytest
 from pypdf import __version__ as pypdf_version
 
-from .conftest import run_cli
+from .conftest import RESOURCES_ROOT, run_cli
 
 
 def test_pypdf_cli_can_be_invoked_as_a_module() -> None:
@@ -24,3 +28,166 @@ def test_pypdf_cli_version(capsys: pytest.CaptureFixture) -> None:
     assert not captured.err
     assert pypdf_version in captured.out
     assert exit_code == 0
+
+
+# Dependencies only needed by some subcommands, that must not be imported
+# when running unrelated commands:
+HEAVY_MODULES = ("endesive", "fpdf", "pydantic", "asn1crypto")
+
+LIST_IMPORTED_MODULES = """
+import sys
+from pdfly.cli import entry_point
+try:
+    entry_point(sys.argv[1:])
+except SystemExit:
+    pass
+sys.stderr.write(" ".join(sorted(sys.modules)))
+"""
+
+
+def imported_top_level_modules(args: list[str]) -> set[str]:
+    stderr = check_output(  # noqa: S603
+        [sys.executable, "-c", LIST_IMPORTED_MODULES, *args],
+        stderr=subprocess.STDOUT,
+    ).decode()
+    modules = stderr.splitlines()[-1].split()
+    return {module.split(".")[0] for module in modules}
+
+
+def test_help_does_not_import_subcommand_dependencies() -> None:
+    modules = imported_top_level_modules(["--help"])
+    for module in (*HEAVY_MODULES, "pypdf", "cryptography", "PIL"):
+        assert module not in modules
+
+
+def test_cat_does_not_import_unrelated_dependencies(tmp_path: Path) -> None:
+    modules = imported_top_level_modules(
+        [
+            "cat",
+            str(RESOURCES_ROOT / "box.pdf"),
+            "--output",
+            str(tmp_path / "out.pdf"),
+        ]
+    )
+    assert "pypdf" in modules
+    for module in HEAVY_MODULES:
+        assert module not in modules
+
+
+@pytest.mark.parametrize("sampling", [False, True])
+def test_profile(
+    capsys: pytest.CaptureFixture, tmp_path: Path, sampling: bool
+) -> None:
+    profile = tmp_path / "compress"
+    exit_code = run_cli(
+        [
+            "--profile",
+            str(profile),
+            *(["--profile-sampling"] if sampling else []),
+            "compress",
+            str(RESOURCES_ROOT / "GeoBase_NHNC1_Data_Model_UML_EN.pdf"),
+            str(tmp_path / "out.pdf"),
+        ]
+    )
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+
+    speedscope = json.loads(
+        (tmp_path / "compress.speedscope.json").read_text()
+    )
+    frames = speedscope["shared"]["frames"]
+    (profile_data,) = speedscope["profiles"]
+    assert len(profile_data["samples"]) == len(profile_data["weights"])
+    for stack in profile_data["samples"]:
+        assert all(0 <= index < len(frames) for index in stack)
+    if sampling:
+        assert not (tmp_path / "compress.pstats").exists()
+    else:
+        stats = pstats.Stats(str(tmp_path / "compress.pstats"))
+        assert any(
+            name == "compress_pages"
+            for _filename, _line, name in stats.stats  # type: ignore[attr-defined]
+        )
+        assert any(frame["name"] == "compress_pages" for frame in frames)
+    assert "Profile written to" in captured.err
+
+
+def test_profile_sampling_requires_profile(
+    capsys: pytest.CaptureFixture,
+) -> None:
+    exit_code = run_cli(["--profile-sampling", "meta", "missing.pdf"])
+    assert exit_code == 2
+    assert "--profile-sampling requires --profile" in capsys.readouterr().err
+
+
+def test_stats(capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    output = tmp_path / "out.pdf"
+    exit_code = run_cli(
+        [
+            "--stats",
+            "cat",
+            str(RESOURCES_ROOT / "input8.pdf"),
+            "0:3",
+            "--output",
+            str(output),
+        ]
+    )
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+
+    stats = json.loads(captured.err)
+    assert stats["command"] == "cat"
+    assert (
+        stats["bytes_read"] == (RESOURCES_ROOT / "input8.pdf").stat().st_size
+    )
+    assert stats["bytes_written"] == output.stat().st_size
+    assert stats["peak_memory"] > 0
+    assert {"parse", "transform", "write"} <= stats["phases"].keys()
+    assert sum(stats["phases"].values()) == pytest.approx(
+        stats["duration"], abs=1e-3
+    )
+
+
+def test_stats_file(capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    stats_file = tmp_path / "stats.json"
+    exit_code = run_cli(
+        [
+            "--stats-file",
+            str(stats_file),
+            "compress",
+            str(RESOURCES_ROOT / "GeoBase_NHNC1_Data_Model_UML_EN.pdf"),
+            str(tmp_path / "out.pdf"),
+        ]
+    )
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+    assert not captured.err
+
+    stats = json.loads(stats_file.read_text())
+    assert stats["command"] == "compress"
+    assert stats["bytes_written"] == (tmp_path / "out.pdf").stat().st_size
+
+
+def test_stats_threads_without_memory(
+    capsys: pytest.CaptureFixture, tmp_path: Path
+) -> None:
+    exit_code = run_cli(
+        [
+            "--stats",
+            "--no-stats-memory",
+            "compress",
+            str(RESOURCES_ROOT / "GeoBase_NHNC1_Data_Model_UML_EN.pdf"),
+            str(tmp_path / "out.pdf"),
+            "--jobs",
+            "4",
+        ]
+    )
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+
+    stats = json.loads(captured.err)
+    assert stats["peak_memory"] is None
+    # The worker threads do not move the main thread between phases
+    assert sum(stats["phases"].values()) == pytest.approx(
+        stats["duration"], abs=1e-3
+    )
@@ -1,12 +1,27 @@
 """Tests for the `compress` command."""
 
+import os
+import stat
+import zlib
+from io import BytesIO
 from pathlib import Path
 
 import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    FloatObject,
+    NameObject,
+    NumberObject,
+    StreamObject,
+)
 from typer.testing import CliRunner
 
 from pdfly.cli import entry_point
 
+from .conftest import RESOURCES_ROOT
+
 runner = CliRunner()
 
 
@@ -235,3 +250,481 @@ def test_compress_preserves_metadata(tmp_path: Path) -> None:
     assert metadata.get("/Title") == "Test Title"
     assert metadata.get("/Author") == "Test Author"
     assert metadata.get("/Subject") == "Test Subject"
+
+
+def test_compress_leaves_no_temporary_file(tmp_path: Path) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    output_pdf.write_bytes(b"replaced")
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    content = StreamObject()
+    content.set_data(b"0 0 m 100 100 l S\n" * 1000)
+    page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(input_pdf)
+
+    result = runner.invoke(
+        entry_point, ["compress", str(input_pdf), str(output_pdf)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Compressed" in result.output
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "in.pdf",
+        "out.pdf",
+    ]
+    assert output_pdf.stat().st_size < input_pdf.stat().st_size
+    assert len(PdfReader(output_pdf).pages) == 1
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+@pytest.mark.parametrize("existing", [True, False])
+def test_compress_output_permissions(tmp_path: Path, existing: bool) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    content = StreamObject()
+    content.set_data(b"0 0 m 100 100 l S\n" * 1000)
+    page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(input_pdf)
+    if existing:
+        output_pdf.write_bytes(b"replaced")
+        output_pdf.chmod(0o640)
+    umask = os.umask(0o022)
+    try:
+        result = runner.invoke(
+            entry_point, ["compress", str(input_pdf), str(output_pdf)]
+        )
+    finally:
+        os.umask(umask)
+
+    assert result.exit_code == 0, result.output
+    assert "Compressed" in result.output
+    assert stat.S_IMODE(output_pdf.stat().st_mode) == (
+        0o640 if existing else 0o644
+    )
+
+
+def test_compress_removes_temporary_file_on_error(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    writer = PdfWriter()
+    writer.add_blank_page(100, 100)
+    writer.write(input_pdf)
+
+    def fail(*_args: object) -> None:
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(PdfWriter, "write", fail)
+    result = runner.invoke(
+        entry_point, ["compress", str(input_pdf), str(tmp_path / "out.pdf")]
+    )
+
+    assert isinstance(result.exception, OSError)
+    assert [path.name for path in tmp_path.iterdir()] == ["in.pdf"]
+
+
+def test_compress_jobs(tmp_path: Path) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    writer = PdfWriter()
+    for index in range(12):
+        page = writer.add_blank_page(100, 100)
+        content = StreamObject()
+        content.set_data(b"BT (page %d) Tj ET\n" % index * 100)
+        page[NameObject("/Contents")] = writer._add_object(content)
+    # The last page shares the content stream of the one before it
+    writer.pages[-1][NameObject("/Contents")] = writer.pages[-2].raw_get(
+        "/Contents"
+    )
+    writer.write(input_pdf)
+
+    outputs = []
+    for jobs in ["1", "4"]:
+        output_pdf = tmp_path / f"out{jobs}.pdf"
+        result = runner.invoke(
+            entry_point,
+            ["compress", str(input_pdf), str(output_pdf), "--jobs", jobs],
+        )
+        assert result.exit_code == 0, result.output
+        outputs.append(output_pdf.read_bytes())
+
+    assert outputs[0] == outputs[1]
+    reader = PdfReader(tmp_path / "out4.pdf")
+    assert [page.get_contents().get_data() for page in reader.pages] == [
+        b"BT (page %d) Tj ET\n" % index * 100 for index in [*range(11), 10]
+    ]
+
+
+@pytest.mark.parametrize(
+    ("options", "expected_level"), [(["--level", "1"], 1), (["-l", "9"], 9)]
+)
+def test_compress_level(
+    tmp_path: Path, options: list[str], expected_level: int
+) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    data = b"".join(b"%d 0 m %d 100 l S\n" % (i, i * 7) for i in range(3000))
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    content = StreamObject()
+    content.set_data(data)
+    page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(input_pdf)
+
+    result = runner.invoke(
+        entry_point, ["compress", str(input_pdf), str(output_pdf), *options]
+    )
+
+    assert result.exit_code == 0, result.output
+    contents = PdfReader(output_pdf).pages[0]["/Contents"].get_object()
+    assert contents._data == zlib.compress(data, expected_level)
+
+
+def test_compress_best(tmp_path: Path) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    # A gradient, much smaller when deflated with a PNG predictor
+    pixels = bytes(
+        (x + y) % 256 for y in range(64) for x in range(64) for _ in range(3)
+    )
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    image = StreamObject()
+    image.set_data(pixels)
+    image.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(64),
+            NameObject("/Height"): NumberObject(64),
+            NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        }
+    )
+    page[NameObject("/Resources")] = DictionaryObject(
+        {
+            NameObject("/XObject"): DictionaryObject(
+                {NameObject("/Im0"): writer._add_object(image)}
+            )
+        }
+    )
+    content = StreamObject()
+    content.set_data(b"q 100 0 0 100 0 0 cm /Im0 Do Q\n" * 100)
+    page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(input_pdf)
+
+    result = runner.invoke(
+        entry_point, ["compress", str(input_pdf), str(output_pdf), "--best"]
+    )
+
+    assert result.exit_code == 0, result.output
+    page = PdfReader(output_pdf).pages[0]
+    image = page["/Resources"]["/XObject"]["/Im0"].get_object()
+    assert image["/Filter"] == "/FlateDecode"
+    assert image["/DecodeParms"]["/Predictor"] == 15
+    assert len(image._data) < len(zlib.compress(pixels, 9))
+    assert image.get_data() == pixels
+    assert page.get_contents().get_data() == content.get_data()
+
+
+def write_photos_pdf(path: Path, jpeg_quality: int = 95) -> None:
+    """
+    Write a page drawing a JPEG photo of 1200x800 pixels in a box of 240x160
+    points, i.e. at 360 pixels per inch, and an RGB photo deflated without
+    loss, of 400x400 pixels, scaled by a form XObject with indirect
+    /Resources in a box of 100x100 points, at 288 pixels per inch.
+    """
+    from PIL import Image
+
+    photo = Image.open(RESOURCES_ROOT / "baleines.jpg").resize((1200, 800))
+    jpeg = BytesIO()
+    photo.save(jpeg, "JPEG", quality=jpeg_quality)
+    writer = PdfWriter()
+    page = writer.add_blank_page(600, 600)
+
+    def image_stream(
+        width: int, height: int, data: bytes, image_filter: str
+    ) -> StreamObject:
+        image = StreamObject()
+        image._data = data
+        image.update(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(width),
+                NameObject("/Height"): NumberObject(height),
+                NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+                NameObject("/Filter"): NameObject(image_filter),
+            }
+        )
+        return image
+
+    jpeg_image = image_stream(1200, 800, jpeg.getvalue(), "/DCTDecode")
+    flate_image = image_stream(
+        400,
+        400,
+        zlib.compress(photo.crop((0, 0, 400, 400)).tobytes()),
+        "/FlateDecode",
+    )
+    form = StreamObject()
+    form.set_data(b"q 200 0 0 200 0 0 cm /Im1 Do Q")
+    form.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject(
+                [NumberObject(0), NumberObject(0)]
+                + [NumberObject(200), NumberObject(200)]
+            ),
+            NameObject("/Matrix"): ArrayObject(
+                [FloatObject(0.5), NumberObject(0), NumberObject(0)]
+                + [FloatObject(0.5), NumberObject(0), NumberObject(0)]
+            ),
+            NameObject("/Resources"): writer._add_object(
+                DictionaryObject(
+                    {
+                        NameObject("/XObject"): DictionaryObject(
+                            {
+                                NameObject("/Im1"): writer._add_object(
+                                    flate_image
+                                )
+                            }
+                        )
+                    }
+                )
+            ),
+        }
+    )
+    page[NameObject("/Resources")] = DictionaryObject(
+        {
+            NameObject("/XObject"): DictionaryObject(
+                {
+                    NameObject("/Im0"): writer._add_object(jpeg_image),
+                    NameObject("/Fm0"): writer._add_object(form),
+                }
+            )
+        }
+    )
+    content = StreamObject()
+    content.set_data(
+        b"q 240 0 0 160 10 10 cm /Im0 Do Q q 1 0 0 1 300 300 cm /Fm0 Do Q"
+    )
+    page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(path)
+
+
+@pytest.mark.parametrize(
+    ("options", "flate_filter"),
+    [([], "/FlateDecode"), (["--photos-to-jpeg"], "/DCTDecode")],
+)
+def test_compress_images(
+    tmp_path: Path, options: list[str], flate_filter: str
+) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    write_photos_pdf(input_pdf)
+
+    result = runner.invoke(
+        entry_point,
+        [
+            "compress",
+            str(input_pdf),
+            str(output_pdf),
+            "--max-dpi",
+            "144",
+            "--image-quality",
+            "60",
+            "--jobs",
+            "2",
+            *options,
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert output_pdf.stat().st_size < input_pdf.stat().st_size / 2
+    page = PdfReader(output_pdf).pages[0]
+    jpeg_image = page["/Resources"]["/XObject"]["/Im0"]
+    assert (jpeg_image["/Width"], jpeg_image["/Height"]) == (480, 320)
+    assert jpeg_image["/Filter"] == "/DCTDecode"
+    form = page["/Resources"]["/XObject"]["/Fm0"]
+    flate_image = form["/Resources"]["/XObject"]["/Im1"]
+    assert (flate_image["/Width"], flate_image["/Height"]) == (200, 200)
+    assert flate_image["/Filter"] == flate_filter
+    assert [image.image.size for image in page.images] == [
+        (480, 320),
+        (200, 200),
+    ]
+
+
+def test_compress_images_indirect_resources(tmp_path: Path) -> None:
+    from fpdf import FPDF
+
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    # fpdf2 writes the /Resources of pages as indirect objects
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.image(RESOURCES_ROOT / "baleines.jpg", w=50)  # at about 206 dpi
+    pdf.output(input_pdf)
+
+    result = runner.invoke(
+        entry_point,
+        ["compress", str(input_pdf), str(output_pdf), "--max-dpi", "103"],
+    )
+
+    assert result.exit_code == 0, result.output
+    images = PdfReader(output_pdf).pages[0].images
+    assert [image.image.size for image in images] == [(203, 270)]
+
+
+def test_compress_images_kept_when_larger(tmp_path: Path) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    write_photos_pdf(input_pdf, jpeg_quality=20)
+    input_jpeg = PdfReader(input_pdf).pages[0].images[0].data
+
+    result = runner.invoke(
+        entry_point,
+        [
+            "compress",
+            str(input_pdf),
+            str(output_pdf),
+            "--image-quality",
+            "95",
+            "--max-dpi",
+            "1200",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert PdfReader(output_pdf).pages[0].images[0].data == input_jpeg
+
+
+def test_compress_photos_to_jpeg_keeps_line_art(tmp_path: Path) -> None:
+    from PIL import Image, ImageDraw
+
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    # Scanned line art, on a noisy background that JPEG would make smaller
+    drawing = Image.merge(
+        "RGB",
+        [
+            Image.effect_noise((400, 400), 8).point(lambda v: v + 100)
+            for _ in range(3)
+        ],
+    )
+    draw = ImageDraw.Draw(drawing)
+    for offset in range(0, 400, 20):
+        draw.line((0, offset, 400 - offset, 400), fill=(0, 0, 128), width=3)
+        draw.text((offset, offset), "label", fill=(0, 0, 0))
+    pixels = drawing.tobytes()
+    writer = PdfWriter()
+    page = writer.add_blank_page(400, 400)
+    image = StreamObject()
+    image._data = zlib.compress(pixels)
+    image.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(400),
+            NameObject("/Height"): NumberObject(400),
+            NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+        }
+    )
+    page[NameObject("/Resources")] = DictionaryObject(
+        {
+            NameObject("/XObject"): DictionaryObject(
+                {NameObject("/Im0"): writer._add_object(image)}
+            )
+        }
+    )
+    content = StreamObject()
+    content.set_data(b"q 400 0 0 400 0 0 cm /Im0 Do Q")
+    page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(input_pdf)
+
+    result = runner.invoke(
+        entry_point,
+        [
+            "compress",
+            str(input_pdf),
+            str(output_pdf),
+            "--photos-to-jpeg",
+            "--image-quality",
+            "30",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    image = PdfReader(output_pdf).pages[0]["/Resources"]["/XObject"]["/Im0"]
+    assert image["/Filter"] == "/FlateDecode"
+    assert image.get_data() == pixels
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--object-streams", "--objects-per-stream", "3"],
+        ["--objects-per-stream", "3"],
+    ],
+)
+def test_compress_object_streams(tmp_path: Path, options: list[str]) -> None:
+    input_pdf = RESOURCES_ROOT / "input8.pdf"
+    output_pdf = tmp_path / "out.pdf"
+
+    result = runner.invoke(
+        entry_point,
+        [
+            "compress",
+            str(input_pdf),
+            str(output_pdf),
+            *options,
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    reader = PdfReader(output_pdf, strict=True)
+    assert reader.pdf_header == "%PDF-1.5"
+    file_id = reader.trailer["/ID"]
+    assert len(file_id) == 2
+    assert file_id[0] == file_id[1]
+    data = output_pdf.read_bytes()
+    assert b"/Type /XRef" in data
+    assert b"\nxref\n" not in data
+    object_streams = {number for number, _index in reader.xref_objStm.values()}
+    assert len(reader.xref_objStm) > 3
+    assert len(object_streams) == -(-len(reader.xref_objStm) // 3)
+    input_reader = PdfReader(input_pdf)
+    assert [page.extract_text() for page in reader.pages] == [
+        page.extract_text() for page in input_reader.pages
+    ]
+    compressed_pdf = tmp_path / "compressed.pdf"
+    runner.invoke(
+        entry_point, ["compress", str(input_pdf), str(compressed_pdf)]
+    )
+    assert output_pdf.stat().st_size < compressed_pdf.stat().st_size
+
+
+def test_compress_object_streams_unsupported_pypdf(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delattr(PdfWriter, "_resolve_links")
+
+    result = runner.invoke(
+        entry_point,
+        [
+            "compress",
+            str(RESOURCES_ROOT / "input8.pdf"),
+            str(tmp_path / "out.pdf"),
+            "--object-streams",
+        ],
+    )
+
+    assert isinstance(result.exception, RuntimeError)
+    assert "PdfWriter has no _resolve_links" in str(result.exception)
+    assert list(tmp_path.iterdir()) == []
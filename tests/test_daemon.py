@@ -0,0 +1,76 @@
+"""Tests for the `daemon` command."""
+
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+
+from pdfly.daemon import forward, is_supported
+
+from .conftest import RESOURCES_ROOT, chdir
+
+pytestmark = [
+    pytest.mark.skipif(not is_supported(), reason="requires os.fork()"),
+    pytest.mark.enable_socket,
+]
+
+
+@pytest.fixture
+def daemon_socket(tmp_path: Path) -> Iterator[Path]:
+    socket_path = tmp_path / "pdfly.sock"
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "pdfly",
+            "daemon",
+            "--socket",
+            str(socket_path),
+            "--workers",
+            "1",
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            if socket_path.exists():
+                break
+            time.sleep(0.1)
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    assert not socket_path.exists()
+
+
+def test_forward_without_daemon(tmp_path: Path) -> None:
+    assert forward(["--version"], str(tmp_path / "missing.sock")) is None
+
+
+def test_forward_runs_command_in_daemon(
+    daemon_socket: Path, tmp_path: Path
+) -> None:
+    with chdir(tmp_path):
+        exit_code = forward(
+            ["cat", str(RESOURCES_ROOT / "box.pdf"), "-o", "out.pdf"],
+            str(daemon_socket),
+        )
+    assert exit_code == 0
+    assert len(PdfReader(tmp_path / "out.pdf").pages) == 1
+
+
+def test_forward_returns_exit_code(daemon_socket: Path) -> None:
+    exit_code = forward(["rotate"], str(daemon_socket))
+    assert exit_code == 2
+
+
+def test_client_forwards_stdout(daemon_socket: Path) -> None:
+    stdout = subprocess.check_output(
+        [sys.executable, "-m", "pdfly", "--version"],
+        env={"PDFLY_DAEMON_SOCKET": str(daemon_socket)},
+    ).decode()
+    assert stdout.startswith("pdfly ")
@@ -13,8 +13,12 @@ def test_extract_annotated_pages_input8(
             [
                 "extract-annotated-pages",
                 str(RESOURCES_ROOT / "input8.pdf"),
+                "--output",
+                str(tmp_path / "input8_annotated.pdf"),
             ]
         )
     captured = capsys.readouterr()
     assert not captured.err
     assert "Extracted 1 pages with annotations" in captured.out
+    assert (tmp_path / "input8_annotated.pdf").exists()
+    assert not (RESOURCES_ROOT / "input8_annotated.pdf").exists()
@@ -0,0 +1,75 @@
+"""Tests for the `pipe` command."""
+
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+
+from .conftest import RESOURCES_ROOT, run_cli
+
+
+def test_pipe_cat_rotate_compress(
+    capsys: pytest.CaptureFixture, pdf_file_100: Path, tmp_path: Path
+) -> None:
+    output = tmp_path / "out.pdf"
+    exit_code = run_cli(
+        [
+            "pipe",
+            "-o",
+            str(output),
+            "cat",
+            str(pdf_file_100),
+            "0:10",
+            str(RESOURCES_ROOT / "box.pdf"),
+            "+",
+            "rotate",
+            "90",
+            "3:7",
+            "+",
+            "compress",
+        ]
+    )
+    captured = capsys.readouterr()
+    assert exit_code == 0, captured
+
+    reader = PdfReader(output)
+    expected_rotations = [0, 0, 0, 90, 90, 90, 90, 0, 0, 0, 0]
+    assert [page.rotation for page in reader.pages] == expected_rotations
+    assert [page.extract_text() for page in reader.pages[:10]] == [
+        str(i) for i in range(10)
+    ]
+    for page in reader.pages:
+        assert page["/Contents"].get_object()["/Filter"] == "/FlateDecode"
+
+
+@pytest.mark.parametrize(
+    ("stages", "error"),
+    [
+        (["cat"], "The cat stage requires a file."),
+        (["cat", "{box}", "+"], "Empty stage in pipeline."),
+        (["cat", "{box}", "+", "rotate"], "The rotate stage requires"),
+        (["cat", "{box}", "+", "rotate", "ninety"], "Invalid degrees"),
+        (["cat", "{box}", "+", "rotate", "45"], "multiple of 90: 45"),
+        (["cat", "{box}", "+", "rotate", "90", "1:2:3:4"], "Invalid page"),
+        (["cat", "{box}", "+", "compress", "now"], "takes no argument"),
+        (["cat", "{box}", "+", "explode"], "Unknown stage: explode"),
+    ],
+)
+def test_pipe_invalid_stages(
+    capsys: pytest.CaptureFixture,
+    tmp_path: Path,
+    stages: list[str],
+    error: str,
+) -> None:
+    box = str(RESOURCES_ROOT / "box.pdf")
+    exit_code = run_cli(
+        [
+            "pipe",
+            "-o",
+            str(tmp_path / "out.pdf"),
+            *(stage.format(box=box) for stage in stages),
+        ]
+    )
+    captured = capsys.readouterr()
+    assert exit_code == 2
+    assert error in " ".join(captured.err.split())
@@ -0,0 +1,99 @@
+"""Tests for the copy of objects from the bytes of PDF files."""
+
+from pathlib import Path
+
+from pypdf import PdfReader
+from pypdf.generic import NullObject
+
+from pdfly._raw import RawObjectReader
+
+from .conftest import RESOURCES_ROOT, run_cli
+
+CONTENT = b"BT /F1 12 Tf 10 10 Td (Hello 1 0 R) Tj ET"
+
+
+def write_pdf(path: Path) -> None:
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [ 3 0 R ] /Count 1 >>",
+        (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [ 0 0 200 200 ]\n"
+            b"/Resources 4 0 R /Contents 5 0 R /Annots [ 6 0 R ] >>"
+        ),
+        (
+            b"<< /Font << /F1 7 0 R >> % not a reference: 8 0 R\n"
+            b"/ProcSet [ /PDF /Text ] >>"
+        ),
+        b"<< /Length 8 0 R >>\nstream\r\n%s\nendstream" % CONTENT,
+        (
+            b"<</Type/Annot/Subtype/Text/Rect[0 0 10 10]"
+            b"/Contents(a \\) 2 0 R (nested 3 0 R))/P 3 0 R/Root 1 0 R>>"
+        ),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"%d" % len(CONTENT),
+    ]
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    startxref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += (
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, startxref)
+    )
+    path.write_bytes(data)
+
+
+def test_raw_object_reader_locates_references(tmp_path: Path) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    write_pdf(input_pdf)
+    raw_reader = RawObjectReader(PdfReader(input_pdf))
+
+    resources = raw_reader.read((4, 0))
+    assert resources is not None
+    assert resources.refs == [(7, 0)]
+    assert resources.stream is None
+
+    annotation = raw_reader.read((6, 0))
+    assert annotation is not None
+    assert annotation.type == "/Annot"
+    assert annotation.refs == [(3, 0), (1, 0)]
+    assert b"(a \\) 2 0 R (nested 3 0 R))" in annotation.chunks[0]
+
+    content = raw_reader.read((5, 0))
+    assert content is not None
+    assert content.refs == [(8, 0)]
+    assert content.chunks[-1] == b" >>"
+    assert raw_reader.stream_data(content) == CONTENT
+
+
+def test_raw_object_reader_leaves_compressed_objects_to_pypdf() -> None:
+    reader = PdfReader(RESOURCES_ROOT / "GeoBase_NHNC1_Data_Model_UML_EN.pdf")
+    raw_reader = RawObjectReader(reader)
+    number = next(iter(reader.xref_objStm))
+    assert raw_reader.read((number, 0)) is None
+    assert raw_reader.read((1, 0)) is not None
+
+
+def test_cat_raw(tmp_path: Path) -> None:
+    input_pdf = tmp_path / "in.pdf"
+    output_pdf = tmp_path / "out.pdf"
+    write_pdf(input_pdf)
+
+    exit_code = run_cli(
+        ["cat", str(input_pdf), str(input_pdf), "-o", str(output_pdf), "--raw"]
+    )
+
+    assert exit_code == 0
+    reader = PdfReader(output_pdf, strict=True)
+    assert [page.extract_text() for page in reader.pages] == [
+        "Hello 1 0 R",
+        "Hello 1 0 R",
+    ]
+    annotation = reader.pages[0]["/Annots"][0].get_object()
+    assert annotation["/Contents"] == "a ) 2 0 R (nested 3 0 R)"
+    assert annotation.raw_get("/P") == reader.pages[0].indirect_reference
+    assert isinstance(annotation["/Root"], NullObject)
@@ -4,10 +4,23 @@ from pathlib import Path
 
 import pytest
 from _pytest.capture import CaptureFixture
-from pypdf import PdfReader
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+    TextStringObject,
+)
 
-from .conftest import RESOURCES_ROOT, chdir, run_cli
-from .test_cat import extract_embedded_images
+from .conftest import (
+    RESOURCES_ROOT,
+    chdir,
+    extract_embedded_images,
+    run_cli,
+)
 
 
 def test_rm_incorrect_number_of_args(
@@ -33,7 +46,12 @@ def test_rm_subset_ok(capsys: CaptureFixture, tmp_path: Path) -> None:
         )
     captured = capsys.readouterr()
     assert exit_code == 0, captured
-    assert not captured.err
+    # Only the report of the link to a removed page dropped
+    assert captured.err.endswith(
+        "dropped 1 annotation(s) and 0 reference(s) to removed pages, "
+        "reclaiming 7581 bytes\n"
+    )
+    assert captured.err.count("\n") == 1
     inp_reader = PdfReader(
         RESOURCES_ROOT / "GeoBase_NHNC1_Data_Model_UML_EN.pdf"
     )
@@ -225,3 +243,166 @@ def test_rm_commands(
 
         # Compare the extracted text
         assert extracted_pages == expected
+
+
+@pytest.mark.parametrize(
+    ("page_ranges", "expected"),
+    [
+        (["0:3", "10:"], [str(el) for el in range(3, 10)]),
+        ([":6", "7:"], ["6"]),
+        (["::2", "1::2"], []),
+        (["5", "5", "--", "-1"], [str(el) for el in range(99) if el != 5]),
+    ],
+)
+def test_rm_several_page_ranges_of_a_file(
+    pdf_file_100: Path,
+    tmp_path: Path,
+    page_ranges: list[str],
+    expected: list[str],
+) -> None:
+    output_pdf_path = tmp_path / "out.pdf"
+
+    exit_code = run_cli(
+        [
+            "rm",
+            "--output",
+            str(output_pdf_path),
+            str(pdf_file_100),
+            *page_ranges,
+        ]
+    )
+
+    assert exit_code == 0
+    reader = PdfReader(output_pdf_path)
+    assert [page.extract_text() for page in reader.pages] == expected
+
+
+def test_rm_raw(tmp_path: Path) -> None:
+    input_pdf_path = RESOURCES_ROOT / "GeoBase_NHNC1_Data_Model_UML_EN.pdf"
+    output_pdf_path = tmp_path / "out.pdf"
+    raw_pdf_path = tmp_path / "raw.pdf"
+    args = ["rm", str(input_pdf_path), "1:3"]
+
+    assert run_cli([*args, "--output", str(output_pdf_path)]) == 0
+    assert run_cli([*args, "--output", str(raw_pdf_path), "--raw"]) == 0
+
+    reader = PdfReader(raw_pdf_path, strict=True)
+    assert len(reader.pages) == len(PdfReader(input_pdf_path).pages) - 2
+    assert [page.extract_text() for page in reader.pages[:3]] == [
+        page.extract_text() for page in PdfReader(output_pdf_path).pages[:3]
+    ]
+
+
+def write_linked_pdf(path: Path, indirect: bool = False) -> None:
+    """
+    Write 3 pages, each with an image. The first page links to the second,
+    and the widgets of a field are on the first & second pages.
+    If indirect, the /Annots of the first page and the action of the link
+    are indirect objects.
+    """
+    writer = PdfWriter()
+    pages = []
+    for index in range(3):
+        page = writer.add_blank_page(200, 200)
+        image = StreamObject()
+        image.set_data(bytes([index]) * 100_000)
+        image.update(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(100),
+                NameObject("/Height"): NumberObject(1000),
+                NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+            }
+        )
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/XObject"): DictionaryObject(
+                    {NameObject("/Im0"): writer._add_object(image)}
+                )
+            }
+        )
+        pages.append(page)
+    field = DictionaryObject(
+        {
+            NameObject("/FT"): NameObject("/Tx"),
+            NameObject("/T"): TextStringObject("name"),
+        }
+    )
+    field_ref = writer._add_object(field)
+    widgets = []
+    for page in pages[:2]:
+        widget = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Annot"),
+                NameObject("/Subtype"): NameObject("/Widget"),
+                NameObject("/Rect"): ArrayObject([NumberObject(0)] * 4),
+                NameObject("/Parent"): field_ref,
+                NameObject("/P"): page.indirect_reference,
+            }
+        )
+        widgets.append(writer._add_object(widget))
+        page[NameObject("/Annots")] = ArrayObject([widgets[-1]])
+    field[NameObject("/Kids")] = ArrayObject(widgets)
+    action: PdfObject = DictionaryObject(
+        {
+            NameObject("/S"): NameObject("/GoTo"),
+            NameObject("/D"): ArrayObject(
+                [pages[1].indirect_reference, NameObject("/Fit")]
+            ),
+        }
+    )
+    link = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Annot"),
+            NameObject("/Subtype"): NameObject("/Link"),
+            NameObject("/Rect"): ArrayObject([NumberObject(0)] * 4),
+            NameObject("/A"): (
+                writer._add_object(action) if indirect else action
+            ),
+        }
+    )
+    pages[0]["/Annots"].append(writer._add_object(link))
+    if indirect:
+        pages[0][NameObject("/Annots")] = writer._add_object(
+            pages[0]["/Annots"]
+        )
+    writer.write(path)
+
+
+@pytest.mark.parametrize("indirect", [False, True])
+@pytest.mark.parametrize("options", [[], ["--raw"]])
+def test_rm_prunes_references_to_removed_pages(
+    capsys: CaptureFixture, tmp_path: Path, options: list[str], indirect: bool
+) -> None:
+    input_pdf_path = tmp_path / "in.pdf"
+    output_pdf_path = tmp_path / "out.pdf"
+    write_linked_pdf(input_pdf_path, indirect)
+
+    exit_code = run_cli(
+        [
+            "rm",
+            "--output",
+            str(output_pdf_path),
+            str(input_pdf_path),
+            "1",
+            *options,
+        ]
+    )
+
+    assert exit_code == 0
+    captured = capsys.readouterr()
+    assert "dropped 2 annotation(s)" in captured.err
+    reader = PdfReader(output_pdf_path)
+    assert len(reader.pages) == 2
+    annotations = [
+        annotation.get_object() for annotation in reader.pages[0]["/Annots"]
+    ]
+    assert [annotation["/Subtype"] for annotation in annotations] == [
+        "/Widget"
+    ]
+    if options:  # pypdf does not copy the /Parent of annotations
+        assert len(annotations[0]["/Parent"]["/Kids"]) == 1
+    # The image of the removed page is not copied
+    assert output_pdf_path.stat().st_size < 2 * 100_000 + 10_000
@@ -1,9 +1,11 @@
 from pathlib import Path
 
 import pytest
-from pypdf import PdfReader
+from pypdf import PdfReader, PdfWriter
 
-from .conftest import RESOURCES_ROOT, chdir, run_cli
+from pdfly.rotate import parse_rotations
+
+from .conftest import RESOURCES_ROOT, chdir, run_cli, write_xref_stream_pdf
 
 
 def test_rotate_fewer_args(
@@ -37,7 +39,7 @@ def test_rotate_extra_args(
         )
     assert exit_code == 2
     captured = capsys.readouterr()
-    assert "unexpected extra argument" in captured.err
+    assert "invalid rotation: extra 1" in captured.err
 
 
 def get_page_rotations(fname: str) -> list[int]:
@@ -126,3 +128,192 @@ def test_rotate_slices(
         actual_diff = diff_rotations(in_rotations, out_rotations)
 
     assert not any(diff_rotations(actual_diff, expected_diff))
+
+
+def test_rotate_raw(tmp_path: Path) -> None:
+    in_fname = str(RESOURCES_ROOT / "input8.pdf")
+    out_fname = str(tmp_path / "output.pdf")
+
+    exit_code = run_cli(["rotate", "-o", out_fname, in_fname, "90", "::2"])
+    assert exit_code == 0
+    expected = get_page_rotations(out_fname)
+    exit_code = run_cli(
+        ["rotate", "-o", out_fname, in_fname, "90", "::2", "--raw"]
+    )
+
+    assert exit_code == 0
+    assert get_page_rotations(out_fname) == expected
+    reader = PdfReader(out_fname, strict=True)
+    assert [page.extract_text() for page in reader.pages] == [
+        page.extract_text() for page in PdfReader(in_fname).pages
+    ]
+
+
+def test_rotate_in_place(tmp_path: Path) -> None:
+    in_fname = tmp_path / "input8.pdf"
+    original = (RESOURCES_ROOT / "input8.pdf").read_bytes()
+    in_fname.write_bytes(original)
+    in_rotations = get_page_rotations(str(in_fname))
+
+    exit_code = run_cli(["rotate", "--in-place", str(in_fname), "90", "::3"])
+
+    assert exit_code == 0
+    updated = in_fname.read_bytes()
+    assert updated.startswith(original)
+    # Only the three rotated page dictionaries are appended
+    assert updated[len(original) :].count(b" obj\n") == 3
+    out_rotations = get_page_rotations(str(in_fname))
+    assert diff_rotations(in_rotations, out_rotations) == [
+        90 if index % 3 == 0 else 0 for index in range(8)
+    ]
+
+
+def test_rotate_incremental_output_is_input(tmp_path: Path) -> None:
+    in_fname = tmp_path / "input8.pdf"
+    original = (RESOURCES_ROOT / "input8.pdf").read_bytes()
+    in_fname.write_bytes(original)
+
+    with chdir(tmp_path):
+        exit_code = run_cli(
+            ["rotate", "--incremental", "-o", "input8.pdf", "input8.pdf"]
+            + ["90", "0"]
+        )
+
+    assert exit_code == 0
+    assert in_fname.read_bytes().startswith(original)
+    assert get_page_rotations(str(in_fname))[0] == 90
+
+
+def test_rotate_incremental_encrypted_leaves_no_output(
+    tmp_path: Path,
+) -> None:
+    in_fname = tmp_path / "encrypted.pdf"
+    out_fname = tmp_path / "out.pdf"
+    writer = PdfWriter(clone_from=RESOURCES_ROOT / "input8.pdf")
+    writer.encrypt("secret", algorithm="RC4-128")
+    writer.write(in_fname)
+
+    with pytest.raises(ValueError, match="encrypted PDF cannot be updated"):
+        run_cli(
+            ["rotate", "--incremental", "-o", str(out_fname), str(in_fname)]
+            + ["90"]
+        )
+
+    assert not out_fname.exists()
+
+
+def test_rotate_incremental_xref_stream(tmp_path: Path) -> None:
+    in_fname = tmp_path / "in.pdf"
+    out_fname = tmp_path / "out.pdf"
+    write_xref_stream_pdf(in_fname)
+    original = in_fname.read_bytes()
+
+    exit_code = run_cli(
+        ["rotate", "--incremental", "-o", str(out_fname), str(in_fname), "180"]
+    )
+
+    assert exit_code == 0
+    assert in_fname.read_bytes() == original
+    assert out_fname.read_bytes().count(b"/Type /XRef") == 2
+    assert get_page_rotations(str(out_fname)) == [180]
+    assert len(PdfReader(out_fname, strict=True).pages) == 1
+
+
+def test_rotate_output_or_in_place_required(
+    capsys: pytest.CaptureFixture,
+) -> None:
+    exit_code = run_cli(["rotate", str(RESOURCES_ROOT / "input8.pdf"), "90"])
+
+    assert exit_code == 2
+    assert "--output or --in-place" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    ("args", "expected"),
+    [
+        (["90"], [(90, ":")]),
+        (["90", "0:5"], [(90, "0:5")]),
+        (["-90", "-1"], [(-90, "-1")]),
+        (
+            ["90:0:5", "180:7", "270:-1"],
+            [(90, "0:5"), (180, "7"), (270, "-1")],
+        ),
+        (["90::2", "180:::2"], [(90, ":2"), (180, "::2")]),
+        (["90::", "180:7"], [(90, ":"), (180, "7")]),
+        (["90:0:5"], [(90, "0:5")]),
+        (["90", "45:7"], [(90, "45:7")]),
+        (["90", "180:7"], [(90, "180:7")]),
+        (["180", "180:360"], [(180, "180:360")]),
+        (["90", "-90:"], [(90, "-90:")]),
+    ],
+)
+def test_parse_rotations(
+    args: list[str], expected: list[tuple[int, str]]
+) -> None:
+    assert parse_rotations(args) == expected
+
+
+@pytest.mark.parametrize(
+    ("args", "message"),
+    [
+        (["45"], "multiple of 90"),
+        (["90:1:2:3:4"], "invalid page range"),
+        (["90:", "180"], "invalid rotation"),
+        (["90", "180", "x"], "invalid rotation"),
+        (
+            ["90", "180:7", "270:-1"],
+            "invalid rotation: 90, expected DEGREES:PAGE_RANGE",
+        ),
+        (["90:0:5", "180"], "invalid rotation: 180"),
+    ],
+)
+def test_parse_rotations_invalid(args: list[str], message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        parse_rotations(args)
+
+
+@pytest.mark.parametrize("options", [[], ["--raw"], ["--incremental"]])
+def test_rotate_several_rotations(tmp_path: Path, options: list[str]) -> None:
+    in_fname = str(RESOURCES_ROOT / "input8.pdf")
+    out_fname = str(tmp_path / "output.pdf")
+
+    exit_code = run_cli(
+        [
+            "rotate",
+            "-o",
+            out_fname,
+            in_fname,
+            *options,
+            "--",
+            "90:0:5",
+            "180:4",
+            "270:-1",
+        ]
+    )
+
+    assert exit_code == 0
+    in_rotations = get_page_rotations(in_fname)
+    out_rotations = get_page_rotations(out_fname)
+    expected = [90, 90, 90, 90, 180, 0, 0, 270]
+    assert diff_rotations(in_rotations, out_rotations) == expected
+
+
+def test_rotate_warns_about_empty_page_range(
+    capsys: pytest.CaptureFixture, tmp_path: Path
+) -> None:
+    exit_code = run_cli(
+        [
+            "rotate",
+            "-o",
+            str(tmp_path / "output.pdf"),
+            str(RESOURCES_ROOT / "input8.pdf"),
+            "90",
+            "180",
+        ]
+    )
+
+    assert exit_code == 0
+    assert (
+        "WARNING: Page range 180 selects none of the 8 pages"
+        in capsys.readouterr().err
+    )
@@ -0,0 +1,65 @@
+"""Tests for the selection of pages with page ranges."""
+
+import pytest
+from pypdf import PageRange
+
+from pdfly._selection import PageSet, select_pages, selected_by_all
+
+
+def page_set(num_pages: int, *page_ranges: str) -> PageSet:
+    return PageSet.from_ranges(
+        num_pages, [PageRange(page_range) for page_range in page_ranges]
+    )
+
+
+@pytest.mark.parametrize(
+    ("page_ranges", "expected"),
+    [
+        ([":"], list(range(10))),
+        (["::3"], [0, 3, 6, 9]),
+        (["3:0:-1"], [1, 2, 3]),
+        (["::-2"], [1, 3, 5, 7, 9]),
+        (["-1"], [9]),
+        (["5:2"], []),
+        (["0:3", "2:5", "-2:"], [0, 1, 2, 3, 4, 8, 9]),
+    ],
+)
+def test_page_set_from_ranges(
+    page_ranges: list[str], expected: list[int]
+) -> None:
+    pages = page_set(10, *page_ranges)
+    assert list(pages) == expected
+    assert len(pages) == len(expected)
+    assert all(page_num in pages for page_num in expected)
+
+
+def test_page_set_algebra() -> None:
+    evens = page_set(7, "::2")
+    first_half = page_set(7, ":4")
+    assert list(evens | first_half) == [0, 1, 2, 3, 4, 6]
+    assert list(evens & first_half) == [0, 2]
+    assert list(evens - first_half) == [4, 6]
+    assert list(~evens) == [1, 3, 5]
+    assert ~~evens == evens
+    assert list(~PageSet(0)) == []
+
+
+def test_select_pages() -> None:
+    ranges = [PageRange("0:3"), PageRange("1"), PageRange("20")]
+    assert select_pages(10, ranges) == ([0, 1, 2, 1], False)
+    assert select_pages(10, ranges, inverted_page_selection=True) == (
+        [3, 4, 5, 6, 7, 8, 9],
+        False,
+    )
+    assert select_pages(10, PageRange("1::4"), True) == (
+        [0, 2, 3, 4, 6, 7, 8],
+        True,
+    )
+
+
+def test_selected_by_all() -> None:
+    pages = selected_by_all(
+        10, [PageRange("2:8"), [PageRange("0:3"), PageRange("5:")]]
+    )
+    assert list(pages) == [2, 5, 6, 7]
+    assert list(selected_by_all(3, [])) == [0, 1, 2]